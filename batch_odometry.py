@@ -0,0 +1,170 @@
+# batch_odometry.py
+
+import argparse
+import math
+import time
+import numpy as np
+from estimators import ESTIMATORS, EncoderOdometry
+
+# Estimadores recalculados em lote: nome -> (contador esquerdo, contador direito).
+# Só os de encoder com o passo de Euler do registro, que é a conta de integrate_pose
+BATCH_ESTIMATORS = {
+    name: (params['left'], params['right'])
+    for name, (estimator_class, _, _, params) in ESTIMATORS.items()
+    if estimator_class is EncoderOdometry
+}
+
+
+def encoder_diffs(counts, previous=0, counter_bits=None):
+    """Diferenças entre amostras consecutivas, como no DataManager.
+
+    A primeira diferença é em relação a `previous` (0 no início de uma sessão).
+    Com counter_bits, o estouro do contador é desfeito levando cada diferença
+    para [-2^(n-1), 2^(n-1)).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    diffs = np.diff(counts, prepend=np.int64(previous))
+    if counter_bits:
+        modulus = np.int64(1 << counter_bits)
+        half = np.int64(1 << (counter_bits - 1))
+        diffs = (diffs + half) % modulus - half
+    return diffs
+
+
+def normalize_angles(angles):
+    """Versão vetorizada de DataManager.normalize_angle (intervalo [-pi, pi])"""
+    wrapped = np.remainder(angles + math.pi, 2 * math.pi) - math.pi
+    # Manter +pi como no caminho por amostra, que só subtrai acima de pi
+    return np.where((wrapped == -math.pi) & (angles > 0), math.pi, wrapped)
+
+
+def integrate_pose(left_diffs, right_diffs, counts_per_meter, wheel_base, pose=(0.0, 0.0, 0.0)):
+    """Trajetória (x, y, th) inteira a partir das diferenças dos encoders.
+
+    Mesma conta de calculate_odometry4/5: orientação acumulada primeiro e depois
+    x/y com o cosseno/seno da orientação já atualizada. np.cumsum soma na mesma
+    ordem que o laço por amostra; a única diferença é o arredondamento da
+    normalização do ângulo (diferenças de ~1e-9 em centenas de milhares de amostras).
+    """
+    x0, y0, th0 = pose
+    delta_left = np.asarray(left_diffs, dtype=np.float64) / counts_per_meter
+    delta_right = np.asarray(right_diffs, dtype=np.float64) / counts_per_meter
+    delta_s = (delta_left + delta_right) / 2
+    delta_theta = (delta_right - delta_left) / wheel_base
+    th = normalize_angles(th0 + np.cumsum(delta_theta))
+    x = x0 + np.cumsum(delta_s * np.cos(th))
+    y = y0 + np.cumsum(delta_s * np.sin(th))
+    return x, y, th
+
+
+def compute_odometry(columns, counts_per_meter, wheel_base, counter_bits=None, estimators=BATCH_ESTIMATORS):
+    """Trajetórias de todos os estimadores a partir das colunas de contadores"""
+    results = {}
+    for name, (left_key, right_key) in estimators.items():
+        left = encoder_diffs(columns[left_key], counter_bits=counter_bits)
+        right = encoder_diffs(columns[right_key], counter_bits=counter_bits)
+        results[name] = integrate_pose(left, right, counts_per_meter, wheel_base)
+    return results
+
+
+def compute_odometry_like(data_manager, columns):
+    """compute_odometry com os parâmetros de um DataManager"""
+    return compute_odometry(columns, data_manager.COUNTS_PER_METER, data_manager.WHEEL_BASE,
+                            data_manager.ENCODER_COUNTER_BITS)
+
+
+def columns_from_store(store, fields):
+    """Colunas de um TelemetryStore como arrays NumPy (uma cópia por coluna)"""
+    columns = {}
+    for name in fields:
+        segments = [np.frombuffer(view, dtype=np.int64 if view.format == 'q' else np.float64)
+                    for view in store.view(name)]
+        columns[name] = np.concatenate(segments) if segments else np.empty(0)
+    return columns
+
+
+def load_session_columns(path, fields, protocols=None, required=None):
+    """Lê só os campos pedidos de uma sessão gravada, como arrays NumPy.
+
+    Cada quadro é decodificado pelo layout do seu PROTOCOL_VERSION
+    (ProtocolRegistry), e os quadros que o DataManager ignora (número de campos
+    errado, valores inválidos, sem os contadores dos encoders em `required`)
+    são ignorados também. Por padrão usa os layouts e contadores do DataManager.
+    """
+    from recorder import SessionReader
+    if protocols is None:
+        from data_manager import DataManager
+        data_manager = DataManager(history_capacity=0)
+        protocols = data_manager.protocols
+        if required is None:
+            required = data_manager.diff_sources
+    required = frozenset(fields) | frozenset(required or ())
+    parse_line = protocols.parse_line
+    values = [[] for _ in fields]
+    timestamps = []
+    reader = SessionReader(path)
+    try:
+        for t_ns, line in reader.iter_frames():
+            try:
+                data = parse_line(line)
+            except ValueError:
+                continue
+            if not required <= data.keys():
+                continue
+            for column, name in zip(values, fields):
+                column.append(data[name])
+            timestamps.append(t_ns)
+    finally:
+        reader.close()
+    columns = {name: np.asarray(column) for name, column in zip(fields, values)}
+    columns['timestamp_ns'] = np.asarray(timestamps, dtype=np.int64)
+    return columns
+
+
+def session_fields(estimators=BATCH_ESTIMATORS):
+    return sorted({key for pair in estimators.values() for key in pair})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula a odometria de uma sessão gravada em lote")
+    parser.add_argument('session', help="arquivo da sessão gravada")
+    parser.add_argument('--counter-bits', type=int, default=None, help="largura dos contadores dos encoders")
+    parser.add_argument('--check', action='store_true', help="comparar com o cálculo por amostra do DataManager")
+    args = parser.parse_args()
+
+    from data_manager import DataManager
+    data_manager = DataManager(history_capacity=0)
+    data_manager.ENCODER_COUNTER_BITS = args.counter_bits
+
+    start = time.perf_counter()
+    columns = load_session_columns(args.session, session_fields())
+    loaded = time.perf_counter()
+    results = compute_odometry_like(data_manager, columns)
+    computed = time.perf_counter()
+    samples = len(columns['timestamp_ns'])
+    print(f"{samples} amostras: leitura {loaded - start:.2f} s, odometria {computed - loaded:.3f} s")
+    for name, (x, y, th) in results.items():
+        if samples:
+            print(f"{name}: x={x[-1]:.6f} y={y[-1]:.6f} th={th[-1]:.6f}")
+
+    if args.check:
+        from recorder import SessionReader
+        reader = SessionReader(args.session)
+        trajectories = {name: [] for name in results}
+        for _, line in reader.iter_frames():
+            data = data_manager.process_line(line)
+            if data is not None:
+                for name in results:
+                    trajectories[name].append((data[f'{name}_x'], data[f'{name}_y'], data[f'{name}_th']))
+        reader.close()
+        for name, (x, y, th) in results.items():
+            streaming = np.asarray(trajectories[name]).reshape(-1, 3)
+            error = np.abs(streaming - np.column_stack((x, y, th)))
+            # Ângulos perto de +-pi podem cair em lados opostos do corte
+            error[:, 2] = np.abs(normalize_angles(error[:, 2]))
+            error = error.max() if samples else 0.0
+            print(f"{name}: diferença máxima para o cálculo por amostra = {error:.3e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# benchmarks/bench_e2e.py
+#
+# Vazão e latência de ponta a ponta com o robô simulado (simulator.py):
+# pseudo-terminal → SerialReader → Pipeline → DataManager → consumidor de snapshots.
+#
+# getEllapsedTime de cada quadro é o relógio do simulador no instante da
+# escrita, então a latência fio → snapshot de um quadro é o timestamp com que
+# o DataManager o publicou menos esse instante. Ela é calculada para os
+# quadros que ainda estão no histórico do DataManager (os últimos
+# history_capacity). O consumidor lê o snapshot mais recente periodicamente,
+# como a GUI, e mede a idade do quadro que encontra.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_manager import DataManager
+from pipeline import Pipeline
+from serial_reader import SerialReader
+from simulator import RobotSimulator
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class SnapshotConsumer(threading.Thread):
+    """Lê o snapshot mais recente a cada `period` s e anota a idade do quadro"""
+
+    def __init__(self, data_manager, wire_start, period=0.005):
+        super().__init__(name='SnapshotConsumer', daemon=True)
+        self.data_manager = data_manager
+        self.wire_start = wire_start  # Instante monotônico do getEllapsedTime zero
+        self.period = period
+        self.ages = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        seq = 0
+        while not self.stop_event.wait(self.period):
+            snapshot = self.data_manager.get_snapshot(seq)
+            if snapshot is None or 'getEllapsedTime' not in snapshot.data:
+                continue
+            seq = snapshot.seq
+            self.ages.append(time.monotonic() - self.wire_start - snapshot.data['getEllapsedTime'])
+
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout=2)
+
+
+def wait_idle(data_manager, idle=0.3, timeout=10.0):
+    """Espera o processamento parar (fila do pipeline vazia) depois do fim do envio"""
+    deadline = time.monotonic() + timeout
+    seq = data_manager.get_snapshot().seq
+    last_change = time.monotonic()
+    while time.monotonic() < deadline and time.monotonic() - last_change < idle:
+        time.sleep(0.05)
+        current = data_manager.get_snapshot().seq
+        if current != seq:
+            seq = current
+            last_change = time.monotonic()
+
+
+def run_case(rate, baud=921600, duration=5.0, corrupt=0.0, split=0, direct=False,
+             poll=0.005, history_capacity=65536):
+    """Um período de envio contínuo a `rate` quadros/s (0 = o máximo, limitado pelo baud)"""
+    simulator = RobotSimulator(rate=rate, baud=baud, corrupt=corrupt, split=split, seed=1)
+    port = simulator.open()
+    data_manager = DataManager(history_capacity=history_capacity)
+    pipeline = None
+    if not direct:
+        pipeline = Pipeline(data_manager, raw_maxsize=8192, raw_policy='block')
+        pipeline.start()
+    reader = SerialReader(port, baud or 921600, data_manager, pipeline=pipeline)
+    reader.daemon = True
+    reader.start()
+    while reader.ser is None and reader.is_alive():
+        time.sleep(0.01)
+
+    simulator.start()
+    simulator.ready.wait()
+    consumer = SnapshotConsumer(data_manager, simulator.start_time, poll)
+    consumer.start()
+    time.sleep(duration)
+    simulator.pause()
+    sent_until = time.monotonic()
+    wait_idle(data_manager)
+    consumer.stop()
+    reader.stop()
+    if pipeline:
+        pipeline.stop()
+    simulator.stop()
+
+    sim_stats = simulator.stats()
+    last = data_manager.get_snapshot()
+    processed = last.seq
+    history = data_manager.history
+    published = history.values('timestamp')
+    wire = history.values('getEllapsedTime')
+    latencies = [t - simulator.start_time - w for t, w in zip(published, wire)]
+    elapsed = (last.timestamp if processed else sent_until) - simulator.start_time
+    sent = sim_stats['frames_sent']
+    return {
+        'rate': rate,
+        'baud': baud,
+        'frames_sent': sent,
+        'frames_processed': processed,
+        'frames_per_s': processed / elapsed if elapsed > 0 else 0.0,
+        'offered_per_s': sent / (sent_until - simulator.start_time),
+        'drop_rate': (sent - processed) / sent if sent else 0.0,
+        'overrun_frames': sim_stats['overrun_frames'],
+        'corrupted_frames': sim_stats['corrupted_frames'],
+        'invalid_frames': reader.extractor.invalid_frames,
+        'raw_queue_dropped': pipeline.raw_queue.dropped if pipeline else 0,
+        'latency_p50_s': percentile(latencies, 0.5),
+        'latency_p99_s': percentile(latencies, 0.99),
+        'latency_max_s': max(latencies, default=0.0),
+        'consumer_age_p50_s': percentile(consumer.ages, 0.5),
+        'consumer_age_p99_s': percentile(consumer.ages, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão e latência fio → snapshot com o robô simulado")
+    parser.add_argument('--rates', default='100,500,1000,0',
+                        help="taxas de quadros separadas por vírgula (0 = o máximo que o baud permite)")
+    parser.add_argument('--baud', type=int, default=921600, help="baud rate simulado (0 = sem limite)")
+    parser.add_argument('--duration', type=float, default=5.0, help="segundos de envio por taxa")
+    parser.add_argument('--corrupt', type=float, default=0.0, help="probabilidade de corromper cada quadro")
+    parser.add_argument('--split', type=int, default=0, help="partir as escritas em pedaços de até N bytes")
+    parser.add_argument('--direct', action='store_true', help="processar na thread do leitor, sem o Pipeline")
+    parser.add_argument('--poll', type=float, default=0.005, help="período do consumidor de snapshots (s)")
+    parser.add_argument('--output', help="salvar os resultados neste arquivo JSON")
+    args = parser.parse_args()
+
+    results = []
+    for rate in (float(value) for value in args.rates.split(',')):
+        result = run_case(rate, args.baud, args.duration, args.corrupt, args.split, args.direct, args.poll)
+        results.append(result)
+        print(f"taxa {rate or 'máx':>6} ofertado {result['offered_per_s']:8.0f}/s  processado "
+              f"{result['frames_per_s']:8.0f}/s  perda {result['drop_rate'] * 100:5.2f}%  "
+              f"latência p50 {result['latency_p50_s'] * 1000:7.2f} ms  p99 {result['latency_p99_s'] * 1000:7.2f} ms  "
+              f"consumidor p99 {result['consumer_age_p99_s'] * 1000:7.2f} ms")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
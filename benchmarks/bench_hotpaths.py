@@ -0,0 +1,269 @@
+# benchmarks/bench_hotpaths.py
+#
+# Microbenchmarks dos caminhos quentes: parse, odometria e desenho.
+# Cada caso mede o tempo por operação; a preparação de cada rodada (quadros,
+# rastros pré-carregados) fica fora da medição. Os casos 'render.*' precisam
+# de Tk com um display; run.py os executa sob Xvfb quando não há DISPLAY.
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_manager import DataManager
+from estimators import normalize_angle
+from simulator import RobotSimulator
+
+# Taxa dos quadros simulados e dos pontos dos rastros pré-carregados (Hz)
+FRAME_RATE = 50.0
+# Duração dos rastros dos casos de desenho do mapa: sufixo do nome -> segundos
+TRACE_DURATIONS = {'60s': 60.0, '1h': 3600.0, '4h': 4 * 3600.0}
+
+
+def simulated_frames(count, rate=FRAME_RATE, profile='random'):
+    """Quadros válidos do robô simulado, a `rate` Hz no tempo do simulador"""
+    simulator = RobotSimulator(rate=rate, baud=0, profile=profile, seed=1)
+    return [simulator.next_frame(i / rate).decode('ascii').strip() for i in range(count)]
+
+
+def timed_loop(function, items):
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return time.perf_counter() - start
+
+
+# Cada caso recebe o número de operações e retorna o tempo total medido (s)
+
+def case_process_line():
+    lines = simulated_frames(4096)
+    data_manager = DataManager()
+    position = 0
+
+    def run(number):
+        nonlocal position
+        batch = [lines[(position + i) % len(lines)] for i in range(number)]
+        position += number
+        return timed_loop(data_manager.process_line, batch)
+    return run
+
+
+def case_process_lines_batch(batch_size=64):
+    lines = simulated_frames(4096)
+    data_manager = DataManager()
+
+    def run(number):
+        batches = [lines[i:i + batch_size] for i in range(0, len(lines), batch_size)]
+        batches = [batches[i % len(batches)] for i in range(max(1, number // batch_size))]
+        return timed_loop(data_manager.process_lines, batches) * number / (len(batches) * batch_size)
+    return run
+
+
+def case_calculate_odometry(name):
+    data_manager = DataManager(history_capacity=0)
+    calculate = getattr(data_manager, f'calculate_odometry{name[-1]}')
+    inputs = data_manager.estimator(name).inputs
+    diffs = [{key: (i * 7 + j * 3) % 41 - 5 for j, key in enumerate(inputs)} for i in range(1024)]
+
+    def run(number):
+        return timed_loop(calculate, [diffs[i % len(diffs)] for i in range(number)])
+    return run
+
+
+def case_normalize_angle(magnitude):
+    """Ângulos de até `magnitude` rad: o laço while faz ~magnitude / 2pi voltas"""
+    angles = [magnitude * math.sin(i * 0.37) for i in range(1024)]
+
+    def run(number):
+        return timed_loop(normalize_angle, [angles[i % len(angles)] for i in range(number)])
+    return run
+
+
+_gui = None
+
+
+def render_gui():
+    """GUI real (uma por processo) com um robô; a janela não é mostrada"""
+    global _gui
+    if _gui is None:
+        import tkinter as tk
+        from gui import GUI
+        root = tk.Tk()
+        root.withdraw()
+        _gui = GUI(root, DataManager(), None)
+        root.update()
+    return _gui
+
+
+def case_update_gui():
+    gui = render_gui()
+    lines = simulated_frames(4096)
+    position = 0
+
+    def run(number):
+        nonlocal position
+        elapsed = 0.0
+        for _ in range(number):
+            # Um quadro novo por atualização, processado fora da medição
+            gui.data_manager.process_line(lines[position % len(lines)])
+            position += 1
+            start = time.perf_counter()
+            gui.update_gui()
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return run
+
+
+def prefilled_trace(gui, key, duration, recent=60.0, old_rate=5.0):
+    """Substitui o rastro `key` por um com `duration` s de pontos terminando agora.
+
+    O último minuto vem a FRAME_RATE; o resto, que de qualquer forma é
+    simplificado pelos níveis antigos, a old_rate para a preparação ser rápida.
+    """
+    from map_view import Trace
+    old = gui.traces[key]
+    trace = Trace(gui.canvas, f'{old.tag}_bench', old.color, gui.world_to_canvas)
+    now = time.monotonic()
+    t = now - duration
+    next_evict = t
+    while t < now:
+        trace.add_point(t, 20 * math.sin(t * 0.01), 15 * math.sin(t * 0.013))
+        if t >= next_evict:
+            trace.evict(t)
+            next_evict = t + 1.0
+        t += 1.0 / (FRAME_RATE if t >= now - recent else old_rate)
+    trace.evict(now)
+    old.clear()
+    gui.traces[key] = trace
+    return trace
+
+
+def map_key(gui):
+    return next(key for key in gui.traces if key[1] == 'odom4')
+
+
+def case_draw_robot(duration):
+    gui = render_gui()
+    key = map_key(gui)
+    prefilled_trace(gui, key, duration)
+
+    def run(number):
+        t = time.monotonic()
+        poses = [{'x': 20 * math.sin(t * 0.01) + i * 1e-3, 'y': 15 * math.sin(t * 0.013), 'th': i * 0.01}
+                 for i in range(number)]
+        return timed_loop(lambda robot: gui.draw_robot(key, robot), poses)
+    return run
+
+
+def case_draw_trace(duration):
+    gui = render_gui()
+    key = map_key(gui)
+    prefilled_trace(gui, key, duration)
+
+    def run(number):
+        return timed_loop(lambda _: gui.draw_trace(key), range(number))
+    return run
+
+
+def prefilled_raster(gui, duration):
+    """Mapa raster (raster_map.py) sobre o Canvas do mapa com um rastro de `duration` s a FRAME_RATE"""
+    from raster_map import RasterMap
+    raster = RasterMap(gui.canvas, gui.map_view)
+    trace = raster.trace('#FFB347')
+    t = time.monotonic() - duration
+    for i in range(int(duration * FRAME_RATE)):
+        trace.add_point(t, 20 * math.sin(t * 0.01), 15 * math.sin(t * 0.013))
+        t += 1.0 / FRAME_RATE
+    raster.redraw()
+    return raster, trace
+
+
+def case_raster_flush(duration):
+    raster, trace = prefilled_raster(render_gui(), duration)
+
+    def run(number):
+        # Um ponto novo por atualização, queimado e copiado para o PhotoImage
+        elapsed = 0.0
+        for _ in range(number):
+            t = time.monotonic()
+            trace.add_point(t, 20 * math.sin(t * 0.01), 15 * math.sin(t * 0.013))
+            start = time.perf_counter()
+            raster.flush()
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return run
+
+
+def case_raster_redraw(duration):
+    raster, _ = prefilled_raster(render_gui(), duration)
+
+    def run(number):
+        return timed_loop(lambda _: raster.redraw(), range(number))
+    return run
+
+
+# Nome -> (função que prepara o caso, operações por rodada)
+CASES = {
+    'parse.process_line': (case_process_line, 2000),
+    'parse.process_lines_64': (case_process_lines_batch, 4096),
+    'odometry.calculate_odometry4': (lambda: case_calculate_odometry('odom4'), 20000),
+    'odometry.calculate_odometry5': (lambda: case_calculate_odometry('odom5'), 20000),
+    'odometry.normalize_angle': (lambda: case_normalize_angle(3.0), 50000),
+    # Saltos grandes de orientação: o laço while dá dezenas a milhares de voltas
+    'odometry.normalize_angle_jump_100rad': (lambda: case_normalize_angle(100.0), 5000),
+    'odometry.normalize_angle_jump_10000rad': (lambda: case_normalize_angle(10000.0), 100),
+    'render.update_gui': (case_update_gui, 200),
+}
+for suffix, seconds in TRACE_DURATIONS.items():
+    CASES[f'render.draw_robot_{suffix}'] = (lambda seconds=seconds: case_draw_robot(seconds), 500)
+    CASES[f'render.draw_trace_{suffix}'] = (lambda seconds=seconds: case_draw_trace(seconds), 5)
+    CASES[f'render.raster_flush_{suffix}'] = (lambda seconds=seconds: case_raster_flush(seconds), 500)
+    CASES[f'render.raster_redraw_{suffix}'] = (lambda seconds=seconds: case_raster_redraw(seconds), 5)
+
+
+def select_cases(patterns=None):
+    """Casos cujo nome começa com algum dos padrões (todos sem padrões)"""
+    if not patterns:
+        return list(CASES)
+    return [name for name in CASES if any(name.startswith(pattern) for pattern in patterns)]
+
+
+def run(cases=None, repeat=5):
+    """Tempo por operação de cada caso: mediana e mínimo entre as rodadas (s)"""
+    results = {}
+    for name in cases or CASES:
+        setup, number = CASES[name]
+        measure = setup()
+        measure(max(1, number // 10))  # Aquecimento
+        times = [measure(number) / number for _ in range(repeat)]
+        results[name] = {
+            'median_s': statistics.median(times),
+            'min_s': min(times),
+            'number': number,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de parse, odometria e desenho")
+    parser.add_argument('--repeat', type=int, default=5, help="rodadas por caso")
+    parser.add_argument('--case', action='append', help="prefixo dos casos a rodar (padrão: todos)")
+    parser.add_argument('--output', help="salvar os resultados neste arquivo JSON")
+    args = parser.parse_args()
+
+    results = run(select_cases(args.case), args.repeat)
+    for name, result in results.items():
+        print(f"{name:40s} mediana {result['median_s'] * 1e6:10.2f} us  mínimo {result['min_s'] * 1e6:10.2f} us")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
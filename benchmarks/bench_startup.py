@@ -0,0 +1,126 @@
+# benchmarks/bench_startup.py
+#
+# Tempo de inicialização e memória (RSS máximo) de processos novos do programa.
+# Cada caso roda em um processo separado, várias vezes. O pico de RSS é lido
+# pelo próprio processo ao sair (VmHWM): o ru_maxrss de wait4 herda o tamanho
+# do processo pai de antes do exec.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Nome -> argumentos do Python; {session} é substituído pela sessão de teste
+CASES = {
+    'interpreter': ['-c', 'pass'],
+    'import_headless': ['-c', "import sys, main; assert 'tkinter' not in sys.modules"],
+    'import_gui': ['-c', 'import gui'],
+    'headless_replay': ['main.py', '--headless', '--replay', '{session}', '--speed', '0', '--status-interval', '0'],
+}
+
+
+# Executa o caso (script ou '-c código') e informa o pico de RSS em KiB no stderr
+WRAPPER = '''
+import atexit, os, resource, runpy, sys
+
+def report_peak():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            peak = next((int(line.split()[1]) for line in f if line.startswith('VmHWM:')), peak)
+    sys.stderr.write(f'\\nPEAK_RSS_KIB {peak}\\n')
+
+atexit.register(report_peak)
+args = sys.argv[1:]
+if args[0] == '-c':
+    sys.argv = ['-c', *args[2:]]
+    exec(compile(args[1], '<bench>', 'exec'), {'__name__': '__main__'})
+else:
+    sys.argv = args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args[0])))
+    runpy.run_path(args[0], run_name='__main__')
+'''
+
+
+def write_session(path, frames=1000, rate=1000.0):
+    """Sessão pequena e válida, gravada com o próprio SessionRecorder"""
+    from data_manager import DataManager
+    from pipeline import BoundedQueue
+    from recorder import SessionRecorder
+    fields = DataManager(history_capacity=0).protocols.default.fields
+    queue = BoundedQueue('bench', maxsize=frames + 1, policy='block')
+    start = time.monotonic()
+    for i in range(frames):
+        values = ['3' if kind == 'str' else str(i) for name, kind in fields]
+        queue.put((start + i / rate, 'BEGIN;' + ';'.join(values) + ';END'))
+    recorder = SessionRecorder(path, queue, flush_interval=0.05)
+    recorder.start()
+    while queue.depth():
+        time.sleep(0.01)
+    recorder.stop()
+
+
+def run_case(args, repeat):
+    """Lista de (segundos, RSS máximo em KiB) de cada execução"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, '-c', WRAPPER, *args], cwd=ROOT,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        if process.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} terminou com código {process.returncode}: "
+                               f"{(process.stderr.strip().splitlines() or [''])[-1]}")
+        peak = [line for line in process.stderr.splitlines() if line.startswith('PEAK_RSS_KIB ')]
+        runs.append((elapsed, int(peak[-1].split()[1]) if peak else 0))
+    return runs
+
+
+def run(cases=None, repeat=5):
+    """Resultados por caso: mediana e mínimo do tempo (s) e RSS máximo (KiB)"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        session = os.path.join(tmp, 'bench.odr')
+        write_session(session)
+        for name in cases or CASES:
+            args = [arg.format(session=session) for arg in CASES[name]]
+            try:
+                runs = run_case(args, repeat)
+            except RuntimeError as e:
+                # Ex.: import_gui sem tkinter instalado
+                print(f"{name}: ignorado ({e})")
+                continue
+            times = [t for t, _ in runs]
+            results[name] = {
+                'median_s': statistics.median(times),
+                'min_s': min(times),
+                'max_rss_kib': max(rss for _, rss in runs),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede tempo de inicialização e RSS do programa")
+    parser.add_argument('--repeat', type=int, default=5, help="execuções por caso")
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help="casos a rodar (padrão: todos)")
+    parser.add_argument('--output', help="salvar os resultados neste arquivo JSON")
+    args = parser.parse_args()
+
+    results = run(args.case, args.repeat)
+    for name, result in results.items():
+        print(f"{name:16s} mediana {result['median_s'] * 1000:7.1f} ms  mínimo {result['min_s'] * 1000:7.1f} ms  "
+              f"RSS {result['max_rss_kib'] / 1024:6.1f} MiB")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
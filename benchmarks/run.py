@@ -0,0 +1,162 @@
+# benchmarks/run.py
+#
+# Roda os microbenchmarks (bench_hotpaths.py) e, com --startup, o de
+# inicialização (bench_startup.py), e compara com a linha de base em JSON.
+# Termina com código 1 quando algum caso ficou mais lento que a linha de base
+# além do limite (--threshold, fração da mediana). Ex.:
+#
+#   python benchmarks/run.py --save-baseline     # gravar a linha de base desta máquina
+#   python benchmarks/run.py                     # comparar; falha se houver regressão
+#   python benchmarks/run.py --case odometry --threshold 0.1
+#
+# Os casos 'render.*' usam Tk: sem DISPLAY o script se executa de novo sob
+# xvfb-run (Tk offscreen); sem xvfb-run eles são pulados. Os de inicialização
+# também comparam o RSS máximo (--rss-threshold), não só o tempo.
+#
+# A linha de base versionada (benchmarks/baseline.json) vale só para a máquina
+# em que foi gravada (ver 'machine' e 'python' no arquivo): em outra máquina,
+# grave a sua com --save-baseline antes de comparar. Casos sem linha de base só
+# são reportados; com --require-baseline (ex.: na CI) eles, e também qualquer
+# caso pulado (render.* sem xvfb-run, import_gui sem tkinter), fazem o script falhar.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import bench_hotpaths
+import bench_startup
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+# Marca o processo já executado sob xvfb-run, para não repetir
+XVFB_ENV = 'ODOMETRY_BENCH_XVFB'
+
+
+def needs_display(cases):
+    return any(name.startswith('render.') for name in cases) and not os.environ.get('DISPLAY')
+
+
+def rerun_under_xvfb():
+    """Substitui o processo por ele mesmo sob xvfb-run; retorna se não for possível"""
+    xvfb_run = shutil.which('xvfb-run')
+    if xvfb_run is None or os.environ.get(XVFB_ENV):
+        return
+    os.environ[XVFB_ENV] = '1'
+    os.execv(xvfb_run, [xvfb_run, '-a', '-s', '-screen 0 1920x1080x24',
+                        sys.executable, os.path.abspath(__file__), *sys.argv[1:]])
+
+
+def run_all(cases, repeat, startup):
+    """Resultados por caso e nomes dos casos de inicialização que não rodaram"""
+    results = bench_hotpaths.run(cases, repeat)
+    skipped = []
+    if startup:
+        startup_results = bench_startup.run(repeat=repeat)
+        for name in bench_startup.CASES:
+            result = startup_results.get(name)
+            if result is None:
+                skipped.append(f'startup.{name}')
+                continue
+            results[f'startup.{name}'] = {'median_s': result['median_s'], 'min_s': result['min_s'],
+                                          'max_rss_kib': result['max_rss_kib'], 'number': 1}
+    return results, skipped
+
+
+def compare(results, baseline, threshold, rss_threshold):
+    """Linhas do relatório e nomes dos casos que regrediram (tempo ou RSS)"""
+    lines = []
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        text = f"{name:42s} {result['median_s'] * 1e6:12.2f} us"
+        if base:
+            change = result['median_s'] / base['median_s'] - 1
+            text += f"  base {base['median_s'] * 1e6:12.2f} us  {change * 100:+7.1f}%"
+            regressed = change > threshold
+            if 'max_rss_kib' in result and base.get('max_rss_kib'):
+                rss_change = result['max_rss_kib'] / base['max_rss_kib'] - 1
+                text += f"  RSS {result['max_rss_kib'] / 1024:6.1f} MiB {rss_change * 100:+6.1f}%"
+                regressed = regressed or rss_change > rss_threshold
+            if regressed:
+                text += "  REGRESSÃO"
+                regressions.append(name)
+        else:
+            text += "  (sem linha de base)"
+        lines.append(text)
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks com comparação contra a linha de base")
+    parser.add_argument('--case', action='append', help="prefixo dos casos a rodar (padrão: todos)")
+    parser.add_argument('--repeat', type=int, default=5, help="rodadas por caso")
+    parser.add_argument('--startup', action='store_true', help="incluir o benchmark de inicialização")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="arquivo JSON da linha de base")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="regressão máxima tolerada na mediana (0.25 = 25%% mais lento)")
+    parser.add_argument('--rss-threshold', type=float, default=0.1,
+                        help="aumento máximo tolerado no RSS máximo dos casos de inicialização (0.1 = 10%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="gravar os resultados como nova linha de base")
+    parser.add_argument('--output', help="salvar também os resultados desta execução neste arquivo JSON")
+    parser.add_argument('--require-baseline', action='store_true',
+                        help="falhar se algum caso for pulado ou não tiver linha de base")
+    args = parser.parse_args()
+
+    cases = bench_hotpaths.select_cases(args.case)
+    skipped = []
+    if needs_display(cases):
+        rerun_under_xvfb()
+        print("Sem DISPLAY nem xvfb-run: casos 'render.*' pulados.")
+        skipped = [name for name in cases if name.startswith('render.')]
+        cases = [name for name in cases if not name.startswith('render.')]
+
+    results, startup_skipped = run_all(cases, args.repeat, args.startup)
+    skipped += startup_skipped
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+    lines, regressions = compare(results, baseline, args.threshold, args.rss_threshold)
+    print('\n'.join(lines))
+
+    if args.save_baseline:
+        # Casos não rodados agora mantêm a linha de base anterior
+        report['results'] = {**baseline, **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Linha de base gravada em {args.baseline}")
+        return
+    failed = False
+    if regressions:
+        print(f"{len(regressions)} caso(s) acima do limite: {', '.join(regressions)}")
+        failed = True
+    if args.require_baseline:
+        if skipped:
+            print(f"{len(skipped)} caso(s) pulado(s): {', '.join(skipped)}")
+            failed = True
+        missing = [name for name in results if name not in baseline]
+        if missing:
+            print(f"{len(missing)} caso(s) sem linha de base em {args.baseline}: {', '.join(missing)}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# calibration.py
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from batch_odometry import BATCH_ESTIMATORS, encoder_diffs, integrate_pose, normalize_angles, load_session_columns
+
+# Odometria calculada pelo firmware, usada como referência: nome -> (x, y, th)
+REFERENCE_ESTIMATORS = {
+    'odom2': ('odom_x2', 'odom_y2', 'odom_th2'),
+    'odom3': ('odom_x3', 'odom_y3', 'odom_th3'),
+}
+
+# Dados das sessões em cada processo do pool (preenchido por init_worker)
+_worker_sessions = {}
+
+
+def parse_range(text):
+    """'min:max:n' (n valores igualmente espaçados) ou um valor fixo"""
+    parts = text.split(':')
+    if len(parts) == 1:
+        return [float(parts[0])]
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f"Faixa inválida: {text} (use min:max:n)")
+    low, high, count = float(parts[0]), float(parts[1]), int(parts[2])
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"Número de valores inválido: {text}")
+    return list(np.linspace(low, high, count))
+
+
+def parse_session(text):
+    """'ROBÔ=arquivo' ou só 'arquivo' (o robô é o nome do arquivo)"""
+    if '=' in text:
+        robot, path = text.split('=', 1)
+    else:
+        path = text
+        robot = os.path.splitext(os.path.basename(path))[0]
+    return robot, path
+
+
+def prepare_session(columns, estimator, reference, reference_degrees=False, counter_bits=None):
+    """Diferenças dos encoders e trajetória de referência de uma sessão.
+
+    A primeira diferença é zero e a pose inicial é a da referência, então só o
+    movimento dentro da sessão é comparado (o firmware pode começar em qualquer pose).
+    """
+    left_key, right_key = BATCH_ESTIMATORS[estimator]
+    x_key, y_key, th_key = REFERENCE_ESTIMATORS[reference]
+    left, right = columns[left_key], columns[right_key]
+    ref_th = np.asarray(columns[th_key], dtype=np.float64)
+    if reference_degrees:
+        ref_th = np.radians(ref_th)
+    return (
+        encoder_diffs(left, previous=left[0], counter_bits=counter_bits).astype(np.float64),
+        encoder_diffs(right, previous=right[0], counter_bits=counter_bits).astype(np.float64),
+        np.asarray(columns[x_key], dtype=np.float64),
+        np.asarray(columns[y_key], dtype=np.float64),
+        normalize_angles(ref_th),
+    )
+
+
+def trajectory_error(session, counts_per_meter, wheel_base, angle_weight):
+    """RMS do erro de posição (m) + angle_weight * RMS do erro de orientação (rad)"""
+    left, right, ref_x, ref_y, ref_th = session
+    x, y, th = integrate_pose(left, right, counts_per_meter, wheel_base, (ref_x[0], ref_y[0], ref_th[0]))
+    position = np.sqrt(np.mean((x - ref_x) ** 2 + (y - ref_y) ** 2))
+    angle = np.sqrt(np.mean(normalize_angles(th - ref_th) ** 2))
+    return position + angle_weight * angle
+
+
+def available_cores():
+    """Núcleos que este processo pode usar (respeita taskset/cgroups no Linux)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def init_worker(sessions):
+    global _worker_sessions
+    _worker_sessions = sessions
+
+
+def evaluate(robot, candidates, angle_weight):
+    """Pontua (raio, base, pulsos por volta) nas sessões de um robô; menor é melhor"""
+    sessions = _worker_sessions[robot]
+    scores = []
+    for radius, wheel_base, counts_per_rev in candidates:
+        counts_per_meter = counts_per_rev / (2 * math.pi * radius)
+        error = sum(trajectory_error(s, counts_per_meter, wheel_base, angle_weight) for s in sessions)
+        scores.append(error / len(sessions))
+    return scores
+
+
+class CalibrationSweep:
+    """Busca em grade de WHEEL_RADIUS / WHEEL_BASE / COUNTS_PER_REV por robô.
+
+    Cada processo do pool recebe as sessões uma única vez (initializer) e avalia
+    blocos de candidatos, então o tempo cai com o número de núcleos. Com
+    refine > 0 a grade é repetida em volta do melhor ponto de cada robô.
+
+    A odometria só depende de COUNTS_PER_REV / WHEEL_RADIUS: raio e pulsos por
+    volta não podem ser separados pelos dados, então fixe um deles.
+    """
+
+    def __init__(self, sessions, radii, bases, counts_per_rev, angle_weight=0.1, workers=None):
+        self.sessions = sessions  # robô -> lista de sessões preparadas
+        self.grid = (radii, bases, counts_per_rev)
+        self.angle_weight = angle_weight
+        self.workers = workers or available_cores()
+        self.evaluations = 0
+
+    def candidates(self, grid):
+        radii, bases, counts_per_rev = grid
+        return [(r, b, c) for r in radii for b in bases for c in counts_per_rev]
+
+    def run(self, refine=0):
+        """Retorna robô -> lista de (erro, raio, base, pulsos por volta), melhor primeiro"""
+        grids = {robot: self.grid for robot in self.sessions}
+        results = {robot: [] for robot in self.sessions}
+        evaluated = {robot: set() for robot in self.sessions}
+        with ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(self.sessions,)) as pool:
+            for _ in range(refine + 1):
+                jobs = []
+                for robot, grid in grids.items():
+                    # Pontos da grade anterior (o centro, por exemplo) não são avaliados de novo
+                    candidates = [c for c in self.candidates(grid) if c not in evaluated[robot]]
+                    evaluated[robot].update(candidates)
+                    size = max(1, math.ceil(len(candidates) / (self.workers * 4)))
+                    for i in range(0, len(candidates), size):
+                        chunk = candidates[i:i + size]
+                        jobs.append((robot, chunk, pool.submit(evaluate, robot, chunk, self.angle_weight)))
+                for robot, chunk, future in jobs:
+                    results[robot].extend((score, *candidate) for score, candidate in zip(future.result(), chunk))
+                    self.evaluations += len(chunk)
+                for robot in grids:
+                    results[robot].sort()
+                    grids[robot] = self.refined(grids[robot], results[robot][0][1:])
+        return results
+
+    @staticmethod
+    def refined(grid, best):
+        """Grade com o mesmo número de pontos em volta de best, um passo para cada lado"""
+        new_grid = []
+        for values, center in zip(grid, best):
+            if len(values) < 2:
+                new_grid.append(values)
+                continue
+            step = (max(values) - min(values)) / (len(values) - 1)
+            new_grid.append(list(np.linspace(max(center - step, step / 10), center + step, len(values))))
+        return tuple(new_grid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra raio, base e pulsos por volta contra a odometria do firmware")
+    parser.add_argument('sessions', nargs='+', help="sessões gravadas, como ROBÔ=arquivo (um robô pode ter várias)")
+    parser.add_argument('--radius', type=parse_range, default=parse_range('0.05:0.15:21'), help="WHEEL_RADIUS (m)")
+    parser.add_argument('--base', type=parse_range, default=parse_range('0.3:0.7:41'), help="WHEEL_BASE (m)")
+    parser.add_argument('--cpr', type=parse_range, default=parse_range('360'), help="COUNTS_PER_REV")
+    parser.add_argument('--estimator', choices=sorted(BATCH_ESTIMATORS), default='odom4',
+                        help="contadores usados na odometria calculada")
+    parser.add_argument('--reference', choices=sorted(REFERENCE_ESTIMATORS), default='odom2',
+                        help="odometria do firmware usada como referência")
+    parser.add_argument('--reference-degrees', action='store_true', help="orientação da referência em graus")
+    parser.add_argument('--angle-weight', type=float, default=0.1, help="peso do erro de orientação (m/rad)")
+    parser.add_argument('--counter-bits', type=int, default=None, help="largura dos contadores dos encoders")
+    parser.add_argument('--refine', type=int, default=2, help="rodadas de refinamento em volta do melhor ponto")
+    parser.add_argument('--workers', type=int, default=None, help="processos (padrão: número de núcleos)")
+    parser.add_argument('--top', type=int, default=5, help="melhores candidatos mostrados por robô")
+    args = parser.parse_args()
+
+    fields = list(BATCH_ESTIMATORS[args.estimator]) + list(REFERENCE_ESTIMATORS[args.reference])
+    sessions = {}
+    for text in args.sessions:
+        robot, path = parse_session(text)
+        columns = load_session_columns(path, fields)
+        samples = len(columns['timestamp_ns'])
+        if samples < 2:
+            print(f"Sessão sem amostras suficientes, ignorada: {path}")
+            continue
+        print(f"{robot}: {path} ({samples} amostras)")
+        sessions.setdefault(robot, []).append(
+            prepare_session(columns, args.estimator, args.reference, args.reference_degrees, args.counter_bits))
+    if not sessions:
+        return
+
+    sweep = CalibrationSweep(sessions, args.radius, args.base, args.cpr, args.angle_weight, args.workers)
+    start = time.perf_counter()
+    results = sweep.run(args.refine)
+    elapsed = time.perf_counter() - start
+    print(f"{sweep.evaluations} candidatos em {elapsed:.2f} s com {sweep.workers} processos")
+    for robot, ranking in results.items():
+        score, radius, wheel_base, counts_per_rev = ranking[0]
+        print(f"\n{robot}: WHEEL_RADIUS={radius:.5f} WHEEL_BASE={wheel_base:.5f} "
+              f"COUNTS_PER_REV={counts_per_rev:g} (erro {score:.4f})")
+        for score, radius, wheel_base, counts_per_rev in ranking[1:args.top]:
+            print(f"  raio={radius:.5f} base={wheel_base:.5f} cpr={counts_per_rev:g} erro={score:.4f}")
+
+
+if __name__ == '__main__':
+    main()
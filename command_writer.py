@@ -0,0 +1,103 @@
+# command_writer.py
+
+import threading
+import time
+import traceback
+from collections import deque
+from metrics import metrics, debug_log
+
+# Comandos em que só o mais recente importa: um novo substitui o pendente
+COALESCED_COMMANDS = ('speed', 'twist')
+
+
+def command_kind(command):
+    """'speed:10:10@' -> 'speed'"""
+    return command.split(':', 1)[0].rstrip('@')
+
+
+class CommandQueue:
+    """Comandos à espera de envio de uma porta, com coalescência.
+
+    Um 'speed' (ou 'twist') que chega enquanto outro do mesmo tipo ainda não
+    saiu substitui o texto do pendente, na mesma posição da fila; os demais
+    comandos são enviados todos, na ordem.
+    """
+
+    def __init__(self, coalesce=COALESCED_COMMANDS):
+        self.coalesce = frozenset(coalesce)
+        self.lock = threading.Lock()
+        self.pending = deque()  # [tipo, comando, instante do envio pedido]
+        self.slots = {}  # tipo coalescível -> entrada pendente
+        self.coalesced_counter = metrics.counter('commands.coalesced')
+
+    def put(self, command):
+        """Enfileira; retorna False se só substituiu um comando pendente"""
+        kind = command_kind(command)
+        now = time.perf_counter()
+        with self.lock:
+            entry = self.slots.get(kind)
+            if entry is not None:
+                entry[1] = command
+                entry[2] = now
+                self.coalesced_counter.inc()
+                return False
+            entry = [kind, command, now]
+            self.pending.append(entry)
+            if kind in self.coalesce:
+                self.slots[kind] = entry
+            return True
+
+    def take(self):
+        """Retira todos os pendentes, como lista de (comando, instante do pedido)"""
+        with self.lock:
+            entries = [(command, submitted) for _, command, submitted in self.pending]
+            self.pending.clear()
+            self.slots.clear()
+        return entries
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class CommandWriter(threading.Thread):
+    """Envia os comandos de uma porta serial numa thread própria.
+
+    Independente das leituras: não há lock compartilhado com o leitor, então um
+    comando sai assim que a thread acorda. A latência medida vai do pedido até
+    o fim do flush() (bytes entregues ao driver e transmitidos).
+    """
+
+    def __init__(self, ser, name='CommandWriter'):
+        super().__init__(name=name, daemon=True)
+        self.ser = ser
+        self.queue = CommandQueue()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.sent_counter = metrics.counter('commands.sent')
+        self.latency = metrics.histogram('commands.latency_s')
+
+    def send(self, command):
+        """Não bloqueia: o comando é escrito pela thread do writer"""
+        self.queue.put(command)
+        self.wakeup.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wakeup.wait()
+            self.wakeup.clear()
+            for command, submitted in self.queue.take():
+                try:
+                    self.ser.write(command.encode('utf-8'))
+                    self.ser.flush()
+                    self.latency.observe(time.perf_counter() - submitted)
+                    self.sent_counter.inc()
+                    debug_log.log(f"Comando enviado: {command}")
+                except Exception as e:
+                    print(f"Erro ao enviar comando: {e}")
+                    traceback.print_exc()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wakeup.set()
+        if self.is_alive():
+            self.join(timeout=2)
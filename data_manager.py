@@ -1,12 +1,17 @@
 # data_manager.py
 
-import threading
 import math
+import time
+import traceback
+from estimators import create_estimators, normalize_angle
+from frame_parser import ProtocolRegistry, FieldCountError, DEFAULT_SCHEMA_PATH
+from telemetry_store import TelemetryStore
+from metrics import metrics, debug_log
+from snapshot import SnapshotPublisher
 
 class DataManager:
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.data = {}
+    def __init__(self, schema_path=DEFAULT_SCHEMA_PATH, history_capacity=65536):
+        self.snapshots = SnapshotPublisher()
         self.previous_values = {
             'rightEncoderSensor1NbPulsesNow': 0,
             'leftEncoderSensor1NbPulsesNow': 0,
@@ -15,8 +20,10 @@ class DataManager:
             'shortLeftEncoderNbPulsesNow': 0,
             'shortRightEncoderNbPulsesNow': 0
         }
-        self.odometry4 = {'x': 0.0, 'y': 0.0, 'th': 0.0}
-        self.odometry5 = {'x': 0.0, 'y': 0.0, 'th': 0.0}
+        # Estimadores de odometria registrados em estimators.py; odometry4/5 são as poses deles
+        self.estimators = create_estimators()
+        self.odometry4 = self.estimator('odom4').pose
+        self.odometry5 = self.estimator('odom5').pose
         self.variable_names = [
             'BEGIN',
             'PROTOCOL_VERSION',
@@ -57,122 +64,197 @@ class DataManager:
             'END'
         ]
 
+        # Compilar os layouts do protocolo (arquivo de configuração sobrescreve a lista acima)
+        self.protocols = ProtocolRegistry.from_file(self.variable_names[1:-1], schema_path)
+        self.variable_names = ['BEGIN', *self.protocols.default.names, 'END']
+        self.diff_fields = tuple((key, key + '_diff') for key in self.previous_values)
+        self.diff_sources = frozenset(self.previous_values)
+        # Campos do quadro usados diretamente pelos estimadores (ex.: velocidades e intervalo)
+        diff_keys = {diff_key for _, diff_key in self.diff_fields}
+        self.frame_inputs = tuple(sorted({key for estimator in self.estimators for key in estimator.inputs
+                                          if key not in diff_keys}))
+
+        # Histórico colunar de todos os quadros processados (None ou 0 desativa)
+        self.history = None
+        if history_capacity:
+            self.history = TelemetryStore(self.output_fields(), history_capacity)
+
+        # Funções chamadas na thread de processamento a cada lote publicado:
+        # listener(snapshots, lines); devem só enfileirar, sem bloquear
+        self.listeners = []
+
         # Parâmetros para cálculo da odometria (substitua pelos valores reais do seu sistema)
         self.WHEEL_RADIUS = 0.1  # metros
         self.WHEEL_BASE = 0.5    # metros
         self.COUNTS_PER_REV = 360  # pulsos por revolução
         self.COUNTS_PER_METER = self.COUNTS_PER_REV / (2 * math.pi * self.WHEEL_RADIUS)
+        # Largura em bits dos contadores dos encoders para tratar o estouro (None desativa)
+        self.ENCODER_COUNTER_BITS = None
+
+        # Métricas do caminho crítico
+        self.frames_counter = metrics.counter('parse.frames')
+        self.wrong_count_counter = metrics.counter('parse.wrong_field_count')
+        self.invalid_values_counter = metrics.counter('parse.invalid_values')
+        self.history_errors_counter = metrics.counter('history.append_errors')
+        self.listener_errors_counter = metrics.counter('listeners.errors')
+        self.parse_time = metrics.histogram('parse.time_s')
+        self.odometry_time = metrics.histogram('odometry.time_s')
+
+    def reset(self):
+        # Voltar ao estado inicial (ex.: ao reiniciar ou voltar uma reprodução)
+        for key in self.previous_values:
+            self.previous_values[key] = 0
+        for estimator in self.estimators:
+            estimator.reset()
+        if self.history is not None:
+            self.history.clear()
+        self.snapshots.reset()
+
+    def process_lines(self, lines):
+        """Processa um lote de quadros; retorna os dicionários de dados de cada um.
+
+        As diferenças dos encoders são calculadas por coluna para o lote inteiro
+        e todos os estimadores são atualizados juntos a partir dessas colunas.
+        """
+        start = time.perf_counter()
+        frames = []
+        for line in lines:
+            data_dict = self.parse(line)
+            if data_dict is not None:
+                frames.append(data_dict)
+        if not frames:
+            return []
+        parsed = time.perf_counter()
+        self.parse_time.observe((parsed - start) / len(frames))
 
-    def process_line(self, line):
         try:
-            # Remover 'BEGIN;' do início e ';END' do final
-            line_content = line[len('BEGIN;'):-len(';END')]
-            # Dividir a linha por ';'
-            values = line_content.split(';')
-            # Remover valores vazios
-            values = [v for v in values if v]
-            # Verificar se o número de valores corresponde ao esperado
-            expected_values = len(self.variable_names) - 2  # Excluindo 'BEGIN' e 'END'
-            if len(values) == expected_values:
-                data_dict = dict(zip(self.variable_names[1:-1], values))
-                # Converter valores para os tipos apropriados
+            columns = self.batch_columns(frames)
+            outputs = [(diff_key, columns[diff_key]) for _, diff_key in self.diff_fields]
+            for estimator in self.estimators:
+                outputs += zip(estimator.outputs, estimator.update(columns, len(frames), self))
+            self.odometry_time.observe((time.perf_counter() - parsed) / len(frames))
+        except Exception as e:
+            print(f"Erro inesperado ao calcular a odometria: {e}")
+            traceback.print_exc()
+            return []
+
+        # Publicar um snapshot imutável por quadro (troca atômica de referência)
+        results = []
+        snapshots = [] if self.listeners else None
+        publish = self.snapshots.publish
+        history = self.history
+        for i, data in enumerate(frames):
+            for key, column in outputs:
+                data[key] = column[i]
+            # O snapshot publicado fica com uma cópia: o dicionário devolvido é do chamador
+            snapshot = publish(dict(data))
+            if history is not None:
+                try:
+                    history.append(data, snapshot.timestamp)
+                except Exception as e:
+                    self.history_errors_counter.inc()
+                    debug_log.warn(f"Erro ao gravar o quadro no histórico: {e}")
+            if snapshots is not None:
+                snapshots.append(snapshot)
+            results.append(data)
+        self.frames_counter.inc(len(results))
+        if snapshots is not None:
+            for listener in self.listeners:
+                # Um consumidor com erro não pode derrubar a thread de aquisição
                 try:
-                    for key in data_dict:
-                        if key in ['ChargerConnected', 'NumberOfReceivedConfigs']:
-                            data_dict[key] = int(data_dict[key])
-                        elif key.startswith('FixedValue') or 'Encoder' in key or 'PositionActual' in key or 'DeltaTimeOdometry' in key:
-                            data_dict[key] = int(data_dict[key])
-                        elif key.endswith('_mA') or key.endswith('Int'):
-                            data_dict[key] = int(data_dict[key])
-                        elif key == 'PROTOCOL_VERSION':
-                            # Manter como string
-                            pass
-                        else:
-                            data_dict[key] = float(data_dict[key])
-
-                    # Calcular diferenças dos encoders
-                    diffs = {
-                        'rightEncoderSensor1NbPulsesNow_diff': data_dict['rightEncoderSensor1NbPulsesNow'] - self.previous_values['rightEncoderSensor1NbPulsesNow'],
-                        'leftEncoderSensor1NbPulsesNow_diff': data_dict['leftEncoderSensor1NbPulsesNow'] - self.previous_values['leftEncoderSensor1NbPulsesNow'],
-                        'PositionActual1_diff': data_dict['PositionActual1'] - self.previous_values['PositionActual1'],
-                        'PositionActual2_diff': data_dict['PositionActual2'] - self.previous_values['PositionActual2'],
-                        'shortLeftEncoderNbPulsesNow_diff': data_dict['shortLeftEncoderNbPulsesNow'] - self.previous_values['shortLeftEncoderNbPulsesNow'],
-                        'shortRightEncoderNbPulsesNow_diff': data_dict['shortRightEncoderNbPulsesNow'] - self.previous_values['shortRightEncoderNbPulsesNow']
-                    }
-
-                    # Atualizar valores anteriores
-                    self.previous_values['rightEncoderSensor1NbPulsesNow'] = data_dict['rightEncoderSensor1NbPulsesNow']
-                    self.previous_values['leftEncoderSensor1NbPulsesNow'] = data_dict['leftEncoderSensor1NbPulsesNow']
-                    self.previous_values['PositionActual1'] = data_dict['PositionActual1']
-                    self.previous_values['PositionActual2'] = data_dict['PositionActual2']
-                    self.previous_values['shortLeftEncoderNbPulsesNow'] = data_dict['shortLeftEncoderNbPulsesNow']
-                    self.previous_values['shortRightEncoderNbPulsesNow'] = data_dict['shortRightEncoderNbPulsesNow']
-
-                    # Calcular odometria 4 e 5
-                    self.calculate_odometry4(diffs)
-                    self.calculate_odometry5(diffs)
-
-                    # Atualizar dados de forma thread-safe
-                    with self.lock:
-                        self.data = {**data_dict, **diffs,
-                                     'odom4_x': self.odometry4['x'],
-                                     'odom4_y': self.odometry4['y'],
-                                     'odom4_th': self.odometry4['th'],
-                                     'odom5_x': self.odometry5['x'],
-                                     'odom5_y': self.odometry5['y'],
-                                     'odom5_th': self.odometry5['th']}
-                except ValueError as ve:
-                    print(f"Erro ao converter os dados: {ve}")
-                    # Ignorar a linha e não atualizar os dados
-            else:
-                print(f"Linha com número de valores inesperado. Esperado: {expected_values}, Recebido: {len(values)}")
-                # Ignorar a linha
+                    listener(snapshots, lines)
+                except Exception as e:
+                    self.listener_errors_counter.inc()
+                    debug_log.warn(f"Erro em um consumidor dos quadros ({listener!r}): {e}")
+        return results
+
+    def process_line(self, line):
+        results = self.process_lines((line,))
+        return results[0] if results else None
+
+    def parse(self, line):
+        """Converte uma linha com o parser do PROTOCOL_VERSION dela; None se inválida"""
+        try:
+            data_dict = self.protocols.parse_line(line)
+        except FieldCountError as fe:
+            self.wrong_count_counter.inc()
+            debug_log.warn(f"Linha com número de valores inesperado. Esperado: {fe.expected}, Recebido: {fe.received}")
+            return None
+        except ValueError as ve:
+            self.invalid_values_counter.inc()
+            debug_log.warn(f"Erro ao converter os dados: {ve}")
+            return None
         except Exception as e:
             print(f"Erro inesperado ao processar a linha: {e}")
             # Ignorar a linha
+            return None
+        if not self.diff_sources <= data_dict.keys():
+            debug_log.warn(f"Linha sem os campos dos encoders ignorada (versão {data_dict.get('PROTOCOL_VERSION')})")
+            return None
+        return data_dict
 
-    def calculate_odometry4(self, diffs):
-        # Calcular distâncias percorridas por cada roda
-        delta_left = diffs['shortLeftEncoderNbPulsesNow_diff'] / self.COUNTS_PER_METER
-        delta_right = diffs['shortRightEncoderNbPulsesNow_diff'] / self.COUNTS_PER_METER
+    def batch_columns(self, frames):
+        """Colunas do lote: diferenças dos encoders e os campos lidos pelos estimadores"""
+        columns = {key: [frame.get(key, 0) for frame in frames] for key in self.frame_inputs}
+        previous = self.previous_values
+        bits = self.ENCODER_COUNTER_BITS
+        for key, diff_key in self.diff_fields:
+            last = previous[key]
+            column = []
+            for frame in frames:
+                value = frame[key]
+                column.append(value - last)
+                last = value
+            previous[key] = last
+            if bits:
+                # Estouro do contador: levar a diferença para [-2^(n-1), 2^(n-1))
+                modulus = 1 << bits
+                half = modulus >> 1
+                column = [(d + half) % modulus - half for d in column]
+            columns[diff_key] = column
+        return columns
 
-        # Calcular movimento
-        delta_s = (delta_left + delta_right) / 2
-        delta_theta = (delta_right - delta_left) / self.WHEEL_BASE
+    def calculate_odometry4(self, diffs):
+        # Um passo do estimador odom4 (mantido para quem chamava diretamente)
+        self.step_estimator('odom4', diffs)
 
-        # Atualizar orientação
-        self.odometry4['th'] += delta_theta
-        self.odometry4['th'] = self.normalize_angle(self.odometry4['th'])
+    def calculate_odometry5(self, diffs):
+        # Um passo do estimador odom5 (mantido para quem chamava diretamente)
+        self.step_estimator('odom5', diffs)
 
-        # Atualizar posição
-        self.odometry4['x'] += delta_s * math.cos(self.odometry4['th'])
-        self.odometry4['y'] += delta_s * math.sin(self.odometry4['th'])
+    def step_estimator(self, name, values):
+        estimator = self.estimator(name)
+        columns = {key: [values[key]] for key in estimator.inputs}
+        estimator.update(columns, 1, self)
 
-    def calculate_odometry5(self, diffs):
-        # Calcular distâncias percorridas por cada roda
-        delta_left = diffs['PositionActual1_diff'] / self.COUNTS_PER_METER
-        delta_right = diffs['PositionActual2_diff'] / self.COUNTS_PER_METER
+    def estimator(self, name):
+        for estimator in self.estimators:
+            if estimator.name == name:
+                return estimator
+        raise KeyError(name)
 
-        # Calcular movimento
-        delta_s = (delta_left + delta_right) / 2
-        delta_theta = (delta_right - delta_left) / self.WHEEL_BASE
+    def normalize_angle(self, angle):
+        """Normalizar o ângulo para estar entre -pi e pi (mantido por compatibilidade)"""
+        return normalize_angle(angle)
 
-        # Atualizar orientação
-        self.odometry5['th'] += delta_theta
-        self.odometry5['th'] = self.normalize_angle(self.odometry5['th'])
+    @property
+    def data(self):
+        # Visão somente leitura do último quadro processado
+        return self.snapshots.latest().data
 
-        # Atualizar posição
-        self.odometry5['x'] += delta_s * math.cos(self.odometry5['th'])
-        self.odometry5['y'] += delta_s * math.sin(self.odometry5['th'])
+    def output_fields(self):
+        """(nome, tipo) de cada campo dos quadros processados: protocolo, diferenças e estimadores"""
+        fields = list(self.protocols.default.fields)
+        fields += [(diff_key, 'int') for _, diff_key in self.diff_fields]
+        fields += [(key, 'float') for estimator in self.estimators for key in estimator.outputs]
+        return fields
 
-    def normalize_angle(self, angle):
-        """Normalizar o ângulo para estar entre -pi e pi"""
-        while angle > math.pi:
-            angle -= 2 * math.pi
-        while angle < -math.pi:
-            angle += 2 * math.pi
-        return angle
+    def get_snapshot(self, newer_than=None):
+        """Último snapshot; com newer_than, None se nada chegou desde essa sequência"""
+        if newer_than is None:
+            return self.snapshots.latest()
+        return self.snapshots.get_if_newer(newer_than)
 
     def get_data(self):
-        with self.lock:
-            return self.data.copy()
+        # Cópia mutável do último quadro, para consumidores antigos
+        return dict(self.snapshots.latest().data)
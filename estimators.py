@@ -0,0 +1,173 @@
+# estimators.py
+
+import math
+
+# Dois pi e pi usados na normalização dentro dos laços
+TWO_PI = 2 * math.pi
+
+
+def normalize_angle(angle):
+    """Normalizar o ângulo para estar entre -pi e pi"""
+    while angle > math.pi:
+        angle -= TWO_PI
+    while angle < -math.pi:
+        angle += TWO_PI
+    return angle
+
+
+class Estimator:
+    """Estimador de odometria atualizado por lotes de quadros.
+
+    Cada estimador declara os campos de entrada (`inputs`, colunas do lote: campos
+    do quadro ou diferenças '<campo>_diff') e os parâmetros próprios (`params`,
+    com valores padrão). As dimensões do robô (COUNTS_PER_METER, WHEEL_BASE) vêm
+    do DataManager no momento da atualização. As saídas são '<nome>_x',
+    '<nome>_y' e '<nome>_th'.
+    """
+
+    inputs = ()
+    params = {}
+
+    def __init__(self, name, label, color, **params):
+        self.name = name
+        self.label = label
+        self.color = color  # Cor da trilha no Mapa 2D
+        self.params = {**self.params, **params}
+        self.outputs = (f'{name}_x', f'{name}_y', f'{name}_th')
+        self.pose = {'x': 0.0, 'y': 0.0, 'th': 0.0}
+
+    def reset(self):
+        self.pose.update(x=0.0, y=0.0, th=0.0)
+
+    def update(self, columns, count, data_manager):
+        """Integra `count` quadros; retorna as listas (xs, ys, ths), uma pose por quadro"""
+        raise NotImplementedError
+
+
+class EncoderOdometry(Estimator):
+    """Diferencial por encoders: atualiza a orientação e depois anda ao longo dela
+    (a conta original de calculate_odometry4/5)"""
+
+    params = {'left': 'shortLeftEncoderNbPulsesNow', 'right': 'shortRightEncoderNbPulsesNow'}
+
+    def __init__(self, name, label, color, **params):
+        super().__init__(name, label, color, **params)
+        self.inputs = (self.params['left'] + '_diff', self.params['right'] + '_diff')
+
+    def update(self, columns, count, data_manager):
+        counts_per_meter = data_manager.COUNTS_PER_METER
+        wheel_base = data_manager.WHEEL_BASE
+        pose = self.pose
+        x, y, th = pose['x'], pose['y'], pose['th']
+        xs, ys, ths = [], [], []
+        for left, right in zip(columns[self.inputs[0]], columns[self.inputs[1]]):
+            delta_left = left / counts_per_meter
+            delta_right = right / counts_per_meter
+            delta_s = (delta_left + delta_right) / 2
+            th = normalize_angle(th + (delta_right - delta_left) / wheel_base)
+            x += delta_s * math.cos(th)
+            y += delta_s * math.sin(th)
+            xs.append(x)
+            ys.append(y)
+            ths.append(th)
+        pose.update(x=x, y=y, th=th)
+        return xs, ys, ths
+
+
+class ArcOdometry(EncoderOdometry):
+    """Diferencial por encoders com integração exata em arco de círculo.
+
+    Com rotação desprezível usa a orientação do ponto médio do passo; o erro
+    não cresce com a taxa de quadros como no passo de Euler.
+    """
+
+    params = {**EncoderOdometry.params, 'straight_tolerance': 1e-9}
+
+    def update(self, columns, count, data_manager):
+        counts_per_meter = data_manager.COUNTS_PER_METER
+        wheel_base = data_manager.WHEEL_BASE
+        tolerance = self.params['straight_tolerance']
+        pose = self.pose
+        x, y, th = pose['x'], pose['y'], pose['th']
+        xs, ys, ths = [], [], []
+        for left, right in zip(columns[self.inputs[0]], columns[self.inputs[1]]):
+            delta_left = left / counts_per_meter
+            delta_right = right / counts_per_meter
+            delta_s = (delta_left + delta_right) / 2
+            delta_theta = (delta_right - delta_left) / wheel_base
+            if abs(delta_theta) < tolerance:
+                x += delta_s * math.cos(th + delta_theta / 2)
+                y += delta_s * math.sin(th + delta_theta / 2)
+            else:
+                radius = delta_s / delta_theta
+                x += radius * (math.sin(th + delta_theta) - math.sin(th))
+                y -= radius * (math.cos(th + delta_theta) - math.cos(th))
+            th = normalize_angle(th + delta_theta)
+            xs.append(x)
+            ys.append(y)
+            ths.append(th)
+        pose.update(x=x, y=y, th=th)
+        return xs, ys, ths
+
+
+class SpeedOdometry(Estimator):
+    """Diferencial pelas velocidades das rodas vezes o intervalo entre quadros.
+
+    speed_scale converte leftSpeed_act/rightSpeed_act para m/s e dt_scale
+    converte DeltaTimeOdometry para segundos. Integra pelo ponto médio.
+    """
+
+    params = {'left': 'leftSpeed_act', 'right': 'rightSpeed_act', 'dt': 'DeltaTimeOdometry',
+              'speed_scale': 1.0, 'dt_scale': 1e-3}
+
+    def __init__(self, name, label, color, **params):
+        super().__init__(name, label, color, **params)
+        self.inputs = (self.params['left'], self.params['right'], self.params['dt'])
+
+    def update(self, columns, count, data_manager):
+        wheel_base = data_manager.WHEEL_BASE
+        # Metros percorridos por (unidade de velocidade x unidade de tempo)
+        scale = self.params['speed_scale'] * self.params['dt_scale']
+        left_key, right_key, dt_key = self.inputs
+        pose = self.pose
+        x, y, th = pose['x'], pose['y'], pose['th']
+        xs, ys, ths = [], [], []
+        for left, right, dt in zip(columns[left_key], columns[right_key], columns[dt_key]):
+            dt *= scale
+            delta_left = left * dt
+            delta_right = right * dt
+            delta_s = (delta_left + delta_right) / 2
+            delta_theta = (delta_right - delta_left) / wheel_base
+            x += delta_s * math.cos(th + delta_theta / 2)
+            y += delta_s * math.sin(th + delta_theta / 2)
+            th = normalize_angle(th + delta_theta)
+            xs.append(x)
+            ys.append(y)
+            ths.append(th)
+        pose.update(x=x, y=y, th=th)
+        return xs, ys, ths
+
+
+# Estimadores de cada DataManager, na ordem das tabelas e do mapa:
+# nome -> (classe, rótulo, cor da trilha, parâmetros)
+ESTIMATORS = {
+    'odom4': (EncoderOdometry, 'Odometria 4 (encoders curtos)', '#ADD8E6',  # Light blue
+              {'left': 'shortLeftEncoderNbPulsesNow', 'right': 'shortRightEncoderNbPulsesNow'}),
+    'odom5': (EncoderOdometry, 'Odometria 5 (PositionActual)', '#90EE90',  # Light green
+              {'left': 'PositionActual1', 'right': 'PositionActual2'}),
+    'odom6': (ArcOdometry, 'Odometria 6 (arco exato)', '#FFB347',  # Orange
+              {'left': 'shortLeftEncoderNbPulsesNow', 'right': 'shortRightEncoderNbPulsesNow'}),
+    'odom7': (SpeedOdometry, 'Odometria 7 (velocidade x tempo)', '#DDA0DD',  # Plum
+              {}),
+}
+
+
+def register_estimator(name, estimator_class, label, color, **params):
+    """Adiciona (ou substitui) um estimador; vale para DataManagers criados depois"""
+    ESTIMATORS[name] = (estimator_class, label, color, params)
+
+
+def create_estimators():
+    """Uma instância nova (pose zerada) de cada estimador registrado"""
+    return [estimator_class(name, label, color, **params)
+            for name, (estimator_class, label, color, params) in ESTIMATORS.items()]
@@ -0,0 +1,539 @@
+# fanout_server.py
+#
+# Servidor local que repassa os quadros processados (e, opcionalmente, os
+# brutos) a vários consumidores ao mesmo tempo: GUI, loggers, plotters e
+# scripts de teste compartilham assim a mesma porta serial.
+#
+# Endereços: 'tcp:HOST:PORTA' (ou 'HOST:PORTA') e 'unix:/caminho/do/socket'.
+#
+# Protocolo
+# ---------
+# O cliente conecta e envia uma linha JSON com a assinatura, ex.:
+#
+#   {"robot": "r1", "fields": ["odom4_x", "odom4_y"], "decimate": 10, "raw": false,
+#    "policy": "drop_oldest"}
+#
+# Todas as chaves são opcionais: robô padrão é o primeiro, fields vazio = todos
+# os campos, decimate = 1 (todos os quadros processados; os brutos não são
+# decimados), raw = false, policy = 'drop_oldest'.
+# Depois disso o servidor só envia mensagens, cada uma com o cabeçalho
+# '<IB' (tamanho do corpo em bytes, tipo) seguido do corpo:
+#
+#   1 SCHEMA  JSON: {"robot", "fields": [[nome, tipo], ...], "format"}; a primeira
+#             mensagem, ou uma resposta {"error": ...} antes de fechar
+#   2 FRAME   '<QdI' (seq, timestamp monotônico do servidor, quadros descartados
+#             para este cliente desde a mensagem anterior), os campos numéricos
+#             empacotados com "format" e, em seguida, cada campo 'str' como
+#             '<H' (tamanho) + UTF-8
+#   3 RAW     o quadro bruto 'BEGIN;...;END' em UTF-8 (só com "raw": true)
+#
+# Um cliente lento não atrasa a aquisição: o DataManager só enfileira os
+# snapshots e o servidor mantém uma fila de saída limitada por cliente
+# (max_queue_bytes). Cheia, ela descarta as mensagens mais antigas
+# ('drop_oldest'), passa a aceitar só 1 a cada 10 acima da metade
+# ('decimate') ou desconecta o cliente ('disconnect').
+
+import argparse
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+import traceback
+from collections import deque
+from metrics import metrics, debug_log
+from pipeline import BoundedQueue
+
+MESSAGE_HEADER = struct.Struct('<IB')
+FRAME_HEADER = struct.Struct('<QdI')
+STRING_LENGTH = struct.Struct('<H')
+MSG_SCHEMA, MSG_FRAME, MSG_RAW = 1, 2, 3
+
+# Tipo do campo -> código do struct
+STRUCT_CODES = {'int': 'q', 'float': 'd'}
+POLICIES = ('drop_oldest', 'decimate', 'disconnect')
+
+
+def parse_address(address):
+    """'tcp:HOST:PORTA', 'HOST:PORTA' ou 'unix:/caminho' -> (família, endereço)"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('tcp:'):
+        address = address[len('tcp:'):]
+    host, sep, port = address.rpartition(':')
+    if not sep:
+        raise ValueError(f"Endereço inválido: {address} (use tcp:HOST:PORTA ou unix:/caminho)")
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+class FrameEncoder:
+    """Empacota os campos escolhidos de um quadro no formato binário FRAME"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.numeric = [name for name, kind in fields if kind in STRUCT_CODES]
+        self.numeric_types = [int if kind == 'int' else float for _, kind in fields if kind in STRUCT_CODES]
+        self.strings = [name for name, kind in fields if kind not in STRUCT_CODES]
+        self.format = '<' + ''.join(STRUCT_CODES[kind] for _, kind in fields if kind in STRUCT_CODES)
+        self.key = tuple(fields)  # Clientes com os mesmos campos compartilham a codificação
+        self.struct = struct.Struct(self.format)
+
+    def schema(self, robot):
+        fields = [[name, 'int' if kind == 'int' else 'float'] for name, kind in self.fields if kind in STRUCT_CODES]
+        fields += [[name, 'str'] for name, kind in self.fields if kind not in STRUCT_CODES]
+        return {'robot': robot, 'fields': fields, 'format': self.format}
+
+    def encode(self, snapshot):
+        """Corpo da mensagem FRAME sem o contador de descartes (preenchido por cliente)"""
+        data = snapshot.data
+        values = [data.get(name) or 0 for name in self.numeric]
+        try:
+            body = self.struct.pack(*values)
+        except struct.error:
+            # Outro layout do protocolo com tipo diferente no mesmo campo
+            body = self.struct.pack(*map(coerce, self.numeric_types, values))
+        for name in self.strings:
+            text = str(data.get(name, '')).encode('utf-8')[:0xFFFF]
+            body += STRING_LENGTH.pack(len(text)) + text
+        return body
+
+
+def coerce(kind, value):
+    """Valor convertido para o tipo do campo (int ou float); o que não converter vira 0"""
+    try:
+        value = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        return kind(0)
+    if kind is int and not -2 ** 63 <= value < 2 ** 63:
+        return 0
+    return value
+
+
+def message(kind, body):
+    return MESSAGE_HEADER.pack(len(body), kind) + body
+
+
+class Subscriber:
+    """Conexão de um consumidor: assinatura, decimação e fila de saída limitada"""
+
+    def __init__(self, sock, address, max_queue_bytes):
+        self.sock = sock
+        self.address = address
+        self.max_queue_bytes = max_queue_bytes
+        self.request = bytearray()
+        self.robot = None  # Definido quando a assinatura chega
+        self.encoder = None
+        self.raw = False
+        self.decimate = 1
+        self.policy = 'drop_oldest'
+        self.counter = 0          # Quadros vistos, para a decimação pedida
+        self.overload_counter = 0  # Quadros vistos com a fila acima da metade ('decimate')
+        self.out = deque()        # Mensagens que ainda não começaram a sair
+        self.sending = None       # Resto (memoryview) da mensagem que está saindo
+        self.out_bytes = 0        # Bytes em out e em sending
+        self.closed = False
+        self.dropped = 0          # Descartes ainda não informados ao cliente
+        self.dropped_total = 0
+        self.events = selectors.EVENT_READ
+
+    def subscribe(self, request, robots, default_fields):
+        robot = request.get('robot') or next(iter(robots), None)
+        if robot not in robots:
+            raise ValueError(f"Robô desconhecido: {robot}")
+        fields = default_fields(robots[robot])
+        wanted = request.get('fields') or []
+        if wanted:
+            types = dict(fields)
+            unknown = [name for name in wanted if name not in types]
+            if unknown:
+                raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}")
+            fields = [(name, types[name]) for name in wanted]
+        policy = request.get('policy', 'drop_oldest')
+        if policy not in POLICIES:
+            raise ValueError(f"Política desconhecida: {policy}")
+        self.robot = robot
+        self.encoder = FrameEncoder(fields)
+        self.raw = bool(request.get('raw', False))
+        self.decimate = max(1, int(request.get('decimate', 1)))
+        self.policy = policy
+
+    def wants(self):
+        """Decimação pedida pelo cliente: True para 1 a cada `decimate` quadros processados"""
+        self.counter += 1
+        return self.counter % self.decimate == 0
+
+    def queue(self, data, frame=True):
+        """Enfileira uma mensagem; False se o cliente deve ser desconectado"""
+        if self.policy == 'decimate' and self.out_bytes >= self.max_queue_bytes // 2:
+            self.overload_counter += 1
+            if self.overload_counter % 10:
+                self.drop(frame)
+                return True
+        if self.out_bytes + len(data) > self.max_queue_bytes:
+            if self.policy == 'disconnect':
+                return False
+            # Descartar as mais antigas que ainda não começaram a sair
+            while self.out_bytes + len(data) > self.max_queue_bytes and self.out:
+                old = self.out.popleft()
+                self.out_bytes -= len(old)
+                self.drop(old[4] == MSG_FRAME)
+            if self.out_bytes + len(data) > self.max_queue_bytes:
+                self.drop(frame)
+                return True
+        self.out.append(data)
+        self.out_bytes += len(data)
+        return True
+
+    def drop(self, frame):
+        if frame:
+            self.dropped += 1
+            self.dropped_total += 1
+
+
+class FanoutServer(threading.Thread):
+    """Servidor TCP/Unix que repassa os snapshots de um ou mais DataManagers.
+
+    robots: nome -> DataManager (o dicionário do IOLoop pode crescer depois;
+    use add_robot para passar a publicar um robô novo). Toda a E/S dos clientes
+    acontece nesta thread, com sockets não bloqueantes e select; a thread de
+    processamento só põe os snapshots numa fila limitada e acorda o servidor.
+    """
+
+    def __init__(self, address, robots, max_queue_bytes=1 << 20, max_pending=65536):
+        super().__init__(name='FanoutServer', daemon=True)
+        self.address = address
+        self.robots = {}
+        self.max_queue_bytes = max_queue_bytes
+        self.selector = selectors.DefaultSelector()
+        self.listener_socket = None
+        self.subscribers = {}
+        self.raw_wanted = False  # Algum cliente quer os quadros brutos
+        # Snapshots publicados à espera do servidor: (robô, snapshot ou linha bruta)
+        self.pending = BoundedQueue('fanout', max_pending, 'drop_oldest')
+        metrics.gauge('pipeline.fanout', self.pending.stats)
+        self.stop_event = threading.Event()
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        os.set_blocking(self.wake_w, False)
+        self.clients_counter = metrics.counter('fanout.clients')
+        self.sent_counter = metrics.counter('fanout.bytes_sent')
+        self.dropped_counter = metrics.counter('fanout.dropped_frames')
+        self.disconnected_counter = metrics.counter('fanout.slow_disconnects')
+        self.encode_errors_counter = metrics.counter('fanout.encode_errors')
+        for name, data_manager in robots.items():
+            self.add_robot(name, data_manager)
+
+    def add_robot(self, name, data_manager):
+        if name in self.robots:
+            return
+        self.robots[name] = data_manager
+        data_manager.listeners.append(lambda snapshots, lines, name=name: self.publish(name, snapshots, lines))
+
+    def publish(self, robot, snapshots, lines):
+        # Thread de processamento: só enfileirar, e só se houver quem receba
+        if not self.subscribers:
+            return
+        items = [(robot, snapshot) for snapshot in snapshots]
+        if self.raw_wanted:
+            items += [(robot, line) for line in lines]
+        self.pending.put_many(items)
+        try:
+            os.write(self.wake_w, b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def open(self):
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.unlink(address)
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(address)
+        sock.listen(16)
+        sock.setblocking(False)
+        self.listener_socket = sock
+        self.selector.register(sock, selectors.EVENT_READ, 'accept')
+        self.selector.register(self.wake_r, selectors.EVENT_READ, 'wake')
+        return sock.getsockname()
+
+    def run(self):
+        if self.listener_socket is None:
+            self.open()
+        print(f"Servidor de telemetria em {self.address}")
+        try:
+            while not self.stop_event.is_set():
+                for key, mask in self.selector.select(timeout=1.0):
+                    if key.data == 'accept':
+                        self._accept()
+                    elif key.data == 'wake':
+                        self._drain_wakeups()
+                        self._dispatch()
+                    else:
+                        subscriber = key.data
+                        if mask & selectors.EVENT_READ:
+                            self._read(subscriber)
+                        if mask & selectors.EVENT_WRITE and not subscriber.closed:
+                            self._write(subscriber)
+        except Exception:
+            print("Erro no servidor de telemetria:")
+            traceback.print_exc()
+        finally:
+            for subscriber in list(self.subscribers.values()):
+                self._close(subscriber)
+            self.selector.close()
+            self.listener_socket.close()
+            family, address = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(address):
+                os.unlink(address)
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+
+    def _accept(self):
+        try:
+            sock, address = self.listener_socket.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        subscriber = Subscriber(sock, address, self.max_queue_bytes)
+        self.subscribers[sock.fileno()] = subscriber
+        self.selector.register(sock, selectors.EVENT_READ, subscriber)
+        self.clients_counter.inc()
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _read(self, subscriber):
+        try:
+            data = subscriber.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(subscriber)
+            return
+        if subscriber.robot is not None:
+            return  # Depois da assinatura o que o cliente envia é ignorado
+        subscriber.request += data
+        if b'\n' not in subscriber.request:
+            if len(subscriber.request) > 65536:
+                self._close(subscriber)
+            return
+        line = bytes(subscriber.request).split(b'\n', 1)[0]
+        try:
+            request = json.loads(line or b'{}')
+            subscriber.subscribe(request, self.robots, lambda data_manager: data_manager.output_fields())
+        except (ValueError, TypeError) as e:
+            subscriber.queue(message(MSG_SCHEMA, json.dumps({'error': str(e)}).encode('utf-8')), frame=False)
+            self._write(subscriber)
+            self._close(subscriber)
+            return
+        schema = subscriber.encoder.schema(subscriber.robot)
+        subscriber.queue(message(MSG_SCHEMA, json.dumps(schema).encode('utf-8')), frame=False)
+        self.raw_wanted = any(s.raw for s in self.subscribers.values())
+        self._write(subscriber)
+
+    def _dispatch(self):
+        # Cada quadro é codificado uma vez por conjunto de campos, não por cliente
+        while True:
+            batch = self.pending.get_batch(1024, timeout=0)
+            if not batch:
+                break
+            subscribers = [s for s in self.subscribers.values() if s.robot is not None]
+            for robot, item in batch:
+                raw = isinstance(item, str)
+                encoded = {}
+                for subscriber in subscribers:
+                    if subscriber.closed or subscriber.robot != robot or (raw and not subscriber.raw):
+                        continue
+                    if raw:
+                        data = message(MSG_RAW, item.encode('utf-8'))
+                    else:
+                        if not subscriber.wants():
+                            continue
+                        body = encoded.get(subscriber.encoder.key)
+                        if body is None:
+                            body = encoded[subscriber.encoder.key] = self._encode(subscriber.encoder, item)
+                        if body is False:
+                            continue
+                        data = message(MSG_FRAME, FRAME_HEADER.pack(item.seq, item.timestamp, subscriber.dropped) + body)
+                        subscriber.dropped = 0
+                    dropped_before = subscriber.dropped_total
+                    if not subscriber.queue(data, frame=not raw):
+                        print(f"Cliente de telemetria {subscriber.address or self.address} lento demais, desconectado.")
+                        self.disconnected_counter.inc()
+                        self._close(subscriber)
+                        continue
+                    self.dropped_counter.inc(subscriber.dropped_total - dropped_before)
+            for subscriber in subscribers:
+                if not subscriber.closed:
+                    self._write(subscriber)
+
+    def _encode(self, encoder, snapshot):
+        # Um quadro que não codifica é descartado sozinho; a thread e os clientes continuam
+        try:
+            return encoder.encode(snapshot)
+        except Exception as e:
+            self.encode_errors_counter.inc()
+            debug_log.warn(f"Quadro {snapshot.seq} não pôde ser codificado para a telemetria: {e}")
+            return False
+
+    def _write(self, subscriber):
+        out = subscriber.out
+        try:
+            while subscriber.sending is not None or out:
+                if subscriber.sending is None:
+                    subscriber.sending = memoryview(out.popleft())
+                sent = subscriber.sock.send(subscriber.sending)
+                self.sent_counter.inc(sent)
+                subscriber.out_bytes -= sent
+                if sent < len(subscriber.sending):
+                    subscriber.sending = subscriber.sending[sent:]
+                    break
+                subscriber.sending = None
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._close(subscriber)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.out_bytes else 0)
+        if events != subscriber.events:
+            self.selector.modify(subscriber.sock, events, subscriber)
+            subscriber.events = events
+
+    def _close(self, subscriber):
+        if subscriber.closed:
+            return
+        subscriber.closed = True
+        self.subscribers.pop(subscriber.sock.fileno(), None)
+        try:
+            self.selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        subscriber.sock.close()
+        self.raw_wanted = any(s.raw for s in self.subscribers.values())
+
+    def stop(self):
+        self.stop_event.set()
+        try:
+            os.write(self.wake_w, b'\0')
+        except OSError:
+            pass
+        if self.is_alive():
+            self.join(timeout=2)
+
+
+class TelemetryClient:
+    """Cliente do FanoutServer: assina e decodifica as mensagens.
+
+    Iterar retorna um dicionário por quadro ({'seq', 'timestamp', 'dropped',
+    campos...}) ou uma str por quadro bruto, até o servidor fechar.
+    """
+
+    def __init__(self, address, fields=None, decimate=1, raw=False, robot=None, policy='drop_oldest',
+                 timeout=None):
+        family, target = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(target)
+        self.buffer = bytearray()
+        request = {'fields': list(fields or []), 'decimate': decimate, 'raw': raw, 'policy': policy}
+        if robot:
+            request['robot'] = robot
+        self.sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        kind, body = self.read_message()
+        schema = json.loads(body) if kind == MSG_SCHEMA else {}
+        if kind != MSG_SCHEMA or 'error' in schema:
+            self.close()
+            raise ValueError(f"Assinatura recusada: {schema.get('error', 'resposta inesperada')}")
+        self.schema = schema
+        self.robot = schema['robot']
+        self.numeric = [name for name, kind in schema['fields'] if kind != 'str']
+        self.strings = [name for name, kind in schema['fields'] if kind == 'str']
+        self.struct = struct.Struct(schema['format'])
+
+    def read_exactly(self, size):
+        while len(self.buffer) < size:
+            data = self.sock.recv(max(65536, size - len(self.buffer)))
+            if not data:
+                raise EOFError("Servidor fechou a conexão")
+            self.buffer += data
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read_message(self):
+        size, kind = MESSAGE_HEADER.unpack(self.read_exactly(MESSAGE_HEADER.size))
+        return kind, self.read_exactly(size)
+
+    def decode_frame(self, body):
+        seq, timestamp, dropped = FRAME_HEADER.unpack_from(body)
+        offset = FRAME_HEADER.size
+        frame = {'seq': seq, 'timestamp': timestamp, 'dropped': dropped}
+        frame.update(zip(self.numeric, self.struct.unpack_from(body, offset)))
+        offset += self.struct.size
+        for name in self.strings:
+            (length,) = STRING_LENGTH.unpack_from(body, offset)
+            offset += STRING_LENGTH.size
+            frame[name] = body[offset:offset + length].decode('utf-8')
+            offset += length
+        return frame
+
+    def receive(self):
+        """Próximo quadro (dict) ou quadro bruto (str); None quando o servidor fecha"""
+        try:
+            kind, body = self.read_message()
+        except EOFError:
+            return None
+        if kind == MSG_RAW:
+            return body.decode('utf-8')
+        if kind == MSG_FRAME:
+            return self.decode_frame(body)
+        return self.receive()
+
+    def __iter__(self):
+        while True:
+            item = self.receive()
+            if item is None:
+                return
+            yield item
+
+    def close(self):
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cliente do servidor de telemetria: imprime os quadros recebidos")
+    parser.add_argument('address', help="endereço do servidor (tcp:HOST:PORTA ou unix:/caminho)")
+    parser.add_argument('--field', action='append', dest='fields', help="campo a receber (repetir; padrão: todos)")
+    parser.add_argument('--robot', help="robô (padrão: o primeiro do servidor)")
+    parser.add_argument('--decimate', type=int, default=1, help="receber 1 a cada N quadros")
+    parser.add_argument('--raw', action='store_true', help="receber também os quadros brutos")
+    parser.add_argument('--json', action='store_true', help="imprimir uma linha JSON por quadro")
+    args = parser.parse_args()
+
+    client = TelemetryClient(args.address, args.fields, args.decimate, args.raw, args.robot)
+    print(f"Conectado ao robô {client.robot}: {', '.join(name for name, _ in client.schema['fields'])}")
+    try:
+        for item in client:
+            if isinstance(item, str):
+                print(item)
+            elif args.json:
+                print(json.dumps(item))
+            else:
+                print(' '.join(f'{key}={value}' for key, value in item.items()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
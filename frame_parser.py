@@ -0,0 +1,97 @@
+# frame_parser.py
+
+import json
+import os
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protocol_schemas.json')
+
+# Conversores disponíveis para os campos do protocolo
+CONVERTERS = {
+    'int': int,
+    'float': float,
+    'str': str,
+}
+
+
+class FieldCountError(ValueError):
+    """Quadro com número de valores diferente do esperado pelo layout"""
+
+    def __init__(self, expected, received):
+        super().__init__(f"Esperado: {expected}, Recebido: {received}")
+        self.expected = expected
+        self.received = received
+
+
+def infer_field_type(name):
+    """Tipo de um campo segundo as regras históricas do process_line"""
+    if name in ('ChargerConnected', 'NumberOfReceivedConfigs'):
+        return 'int'
+    if name.startswith('FixedValue') or 'Encoder' in name or 'PositionActual' in name or 'DeltaTimeOdometry' in name:
+        return 'int'
+    if name.endswith('_mA') or name.endswith('Int'):
+        return 'int'
+    if name == 'PROTOCOL_VERSION':
+        return 'str'
+    return 'float'
+
+
+def normalize_fields(fields):
+    """Aceita nomes soltos ou pares [nome, tipo] e retorna uma lista de (nome, tipo)"""
+    normalized = []
+    for field in fields:
+        if isinstance(field, str):
+            name, field_type = field, infer_field_type(field)
+        else:
+            name, field_type = field
+        if field_type not in CONVERTERS:
+            raise ValueError(f"Tipo desconhecido para o campo {name}: {field_type}")
+        normalized.append((name, field_type))
+    return normalized
+
+
+class FrameParser:
+    """Parser compilado uma única vez para um layout fixo de campos"""
+
+    def __init__(self, fields):
+        self.fields = tuple(normalize_fields(fields))
+        self.names = tuple(name for name, _ in self.fields)
+        self.types = tuple(field_type for _, field_type in self.fields)
+        self.converters = tuple(CONVERTERS[field_type] for field_type in self.types)
+        self.field_count = len(self.fields)
+
+    def parse(self, values):
+        """Converte a lista de valores (já sem BEGIN/END) em um dicionário"""
+        if len(values) != self.field_count:
+            # Caminho lento: tolerar campos vazios como o parser original
+            values = [v for v in values if v]
+            if len(values) != self.field_count:
+                raise FieldCountError(self.field_count, len(values))
+        return {name: convert(value) for name, convert, value in zip(self.names, self.converters, values)}
+
+
+class ProtocolRegistry:
+    """Parsers compilados por valor de PROTOCOL_VERSION"""
+
+    def __init__(self, default_fields, versions=None):
+        self.default = FrameParser(default_fields)
+        self.parsers = {}
+        for version, fields in (versions or {}).items():
+            self.parsers[str(version)] = FrameParser(fields)
+
+    @classmethod
+    def from_file(cls, default_fields, path=DEFAULT_SCHEMA_PATH):
+        """Carrega os layouts do arquivo de configuração, se existir"""
+        if not path or not os.path.exists(path):
+            return cls(default_fields)
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('default', default_fields), config.get('versions', {}))
+
+    def parser_for(self, version):
+        # Versões sem layout próprio usam o layout padrão
+        return self.parsers.get(version, self.default)
+
+    def parse_line(self, line):
+        """Converte uma linha 'BEGIN;...;END' em um dicionário de valores"""
+        values = line[len('BEGIN;'):-len(';END')].split(';')
+        return self.parser_for(values[0]).parse(values)
@@ -3,28 +3,53 @@
 import tkinter as tk
 from tkinter import ttk
 import time
-import math
-import threading
+import os
 import traceback
 import tkinter.messagebox
+from tkinter import filedialog
+from metrics import metrics
+from map_view import Trace, RobotMarker, MapView, map_tracks
+from plot_view import PlotHistory, PlotView, PLOT_WINDOWS, DEFAULT_PLOT_FIELDS
+from scheduler import CommandScheduler, CommandStream, ProfileStream, load_profile
 class GUI:
-    def __init__(self, root, data_manager, serial_reader):
+    def __init__(self, root, data_manager, serial_reader, replay=None, robots=None, io_loop=None,
+                 map_backend='vector'):
         self.root = root
-        self.data_manager = data_manager
+        self.data_manager = data_manager  # Robô mostrado nas tabelas
+        # Todos os robôs (nome -> DataManager); pode crescer com a GUI aberta
+        self.robots = robots if robots is not None else {'Robô': data_manager}
+        self.robot_names = []
+        # Baldes agregados dos gráficos por robô, mantidos na thread de processamento
+        self.plot_histories = {}
+        # Trilhas do mapa: as do firmware e uma por estimador de odometria
+        self.map_tracks = map_tracks(data_manager.estimators)
         self.serial_reader = serial_reader  # Adicionar serial_reader à GUI
+        self.replay = replay  # ReplayEngine quando a fonte é uma sessão gravada
+        self.io_loop = io_loop  # IOLoop quando há vários robôs; comandos vão para o robô selecionado
+        self.map_backend = map_backend  # Rastros do mapa: 'vector' (linhas do Canvas) ou 'raster' (imagem)
         self.root.title("Monitoramento em Tempo Real")
+        self.update_time = metrics.histogram('gui.update_s')
+        self.last_snapshot_seq = -1
+
+        # Atualização adaptativa: período entre 50 e 500 ms, gastando até 20% do loop do Tk
+        self.refresh_budget = 0.2
+        self.min_refresh_period = 0.05
+        self.max_refresh_period = 0.5
+        self.refresh_cost = 0.0
+
+        # Envios periódicos (intervalo e perfis de velocidade) em prazos absolutos
+        self.scheduler = CommandScheduler()
+        self.scheduler.start()
+        self.profile = None
         self.style = ttk.Style()
         self.setup_theme()
         self.create_widgets()
         self.update_gui()
+        self.update_diagnostics()
 
         # Ajustar a janela para ocupar toda a largura e altura da tela
         self.maximize_window()
 
-        # Variáveis para controle do envio em intervalo
-        self.interval_sending = False
-        self.interval_thread = None
-
         # Fechar corretamente a janela
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -136,115 +161,164 @@ class GUI:
     def create_estimated_odometry_tab(self):
         frame = self.tabs['ODOMETRIA ESTIMADA']
 
-        # Criar frames esquerdo e direito
-        left_frame = ttk.Frame(frame)
-        right_frame = ttk.Frame(frame)
-        left_frame.pack(side='left', fill='both', expand=True)
-        right_frame.pack(side='right', fill='both', expand=True)
-
-        # Tabela da Odometria 4
-        self.odometry4_table = self.create_table(left_frame, ['Variável', 'Valor'])
-        odometry4_vars = ['odom4_x', 'odom4_y', 'odom4_th']
-        for var in odometry4_vars:
-            self.odometry4_table.insert('', 'end', iid=var, values=(var, 'N/A'))
-
-        # Tabela da Odometria 5
-        self.odometry5_table = self.create_table(right_frame, ['Variável', 'Valor'])
-        odometry5_vars = ['odom5_x', 'odom5_y', 'odom5_th']
-        for var in odometry5_vars:
-            self.odometry5_table.insert('', 'end', iid=var, values=(var, 'N/A'))
+        # Uma tabela por estimador registrado, duas por linha
+        self.estimator_tables = []
+        for index, estimator in enumerate(self.data_manager.estimators):
+            estimator_frame = ttk.LabelFrame(frame, text=estimator.label)
+            estimator_frame.grid(row=index // 2, column=index % 2, sticky='nsew', padx=5, pady=5)
+            frame.grid_rowconfigure(index // 2, weight=1)
+            frame.grid_columnconfigure(index % 2, weight=1)
+            table = self.create_table(estimator_frame, ['Variável', 'Valor'])
+            for var in estimator.outputs:
+                table.insert('', 'end', iid=var, values=(var, 'N/A'))
+            self.estimator_tables.append(table)
+
+    def create_plot_tab(self):
+        frame = self.tabs['Gráficos']
+
+        # Lista de campos numéricos (seleção múltipla) e janela de tempo
+        side = ttk.Frame(frame)
+        side.pack(side=tk.LEFT, fill='y', padx=5, pady=5)
+        ttk.Label(side, text="Janela:").pack(anchor='w')
+        self.plot_window_var = tk.StringVar(value='1 min')
+        window_box = ttk.Combobox(side, textvariable=self.plot_window_var, state='readonly', width=10,
+                                  values=list(PLOT_WINDOWS))
+        window_box.pack(anchor='w', pady=(0, 5))
+        window_box.bind('<<ComboboxSelected>>', self.on_plot_window)
+        ttk.Label(side, text="Campos:").pack(anchor='w')
+        self.plot_field_names = [name for name, field_type in self.data_manager.output_fields()
+                                 if field_type in ('int', 'float')]
+        self.plot_fields_list = tk.Listbox(side, selectmode=tk.MULTIPLE, exportselection=False, width=32,
+                                           background='#2D2D2D', foreground='white')
+        self.plot_fields_list.pack(fill='y', expand=True)
+        for index, name in enumerate(self.plot_field_names):
+            self.plot_fields_list.insert('end', name)
+            if name in DEFAULT_PLOT_FIELDS:
+                self.plot_fields_list.selection_set(index)
+        self.plot_fields_list.bind('<<ListboxSelect>>', self.on_plot_fields)
+
+        self.plot_canvas = tk.Canvas(frame, background='#2D2D2D')
+        self.plot_canvas.pack(side=tk.LEFT, fill='both', expand=True)
+        self.plot_view = PlotView(self.plot_canvas, self.data_manager.history,
+                                  [name for name in self.plot_field_names if name in DEFAULT_PLOT_FIELDS],
+                                  PLOT_WINDOWS[self.plot_window_var.get()])
+        self.plot_canvas.bind('<Configure>', lambda event: self.plot_view.resize(event.width, event.height))
+
+    def on_plot_fields(self, event=None):
+        selected = [self.plot_field_names[index] for index in self.plot_fields_list.curselection()]
+        self.plot_view.set_fields(selected)
+
+    def on_plot_window(self, event=None):
+        self.plot_view.set_window(PLOT_WINDOWS[self.plot_window_var.get()])
 
     def create_map_tab(self):
         frame = self.tabs['Mapa 2D']
 
+        # Barra de navegação: seguir robô e centralizar
+        toolbar = ttk.Frame(frame)
+        toolbar.pack(fill='x')
+        ttk.Label(toolbar, text="Seguir:").pack(side=tk.LEFT, padx=(5, 0))
+        self.follow_var = tk.StringVar(value='Nenhum')
+        self.follow_box = ttk.Combobox(toolbar, textvariable=self.follow_var, state='readonly', width=20,
+                                       values=['Nenhum'])
+        self.follow_box.pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="Centralizar", command=self.reset_map_view).pack(side=tk.LEFT, padx=5)
+        ttk.Label(toolbar, text="Roda do mouse: zoom | Arrastar: mover").pack(side=tk.LEFT, padx=10)
+
         # Criar o Canvas para desenhar o mapa
         self.canvas = tk.Canvas(frame, background='#2D2D2D')
         self.canvas.pack(fill='both', expand=True)
 
         # Definir o tamanho do Canvas
         self.canvas.update_idletasks()  # Atualiza o Canvas para obter as dimensões corretas
-        self.canvas_width = self.canvas.winfo_width()
-        self.canvas_height = self.canvas.winfo_height()
 
-        # Definir escala e deslocamento
-        self.scale = 10  # Ajuste a escala para adequar ao tamanho do Canvas
-        self.offset_x = self.canvas_width / 2
-        self.offset_y = self.canvas_height / 2
+        # Vista do mapa (escala em pixels por metro, zoom e deslocamento)
+        self.map_view = MapView(self.canvas, scale=10, on_change=self.on_map_view_changed)
+        self.map_refine_job = None
+
+        # Rastros queimados numa imagem NumPy (custo independente do comprimento) ou linhas do Canvas
+        self.raster = None
+        if self.map_backend == 'raster':
+            try:
+                from raster_map import RasterMap
+                self.raster = RasterMap(self.canvas, self.map_view)
+            except ImportError as e:
+                print(f"Mapa raster indisponível ({e}); usando o desenho vetorial.")
 
         # Desenhar os eixos
         self.draw_axes()
 
-        # Armazenar as posições para o rastro
-        self.robot1_trace = []  # Lista de tuplas (timestamp, x_canvas, y_canvas)
-        self.robot2_trace = []
-        self.robot3_trace = []
-        self.robot4_trace = []
-
-        # Inicializar as posições iniciais
-        self.robot1 = {'x': 0, 'y': 0, 'th': 0}
-        self.robot2 = {'x': 0, 'y': 0, 'th': 0}
-        self.robot3 = {'x': 0, 'y': 0, 'th': 0}
-        self.robot4 = {'x': 0, 'y': 0, 'th': 0}
-
-        # Criar IDs para os robôs e rastros
-        self.robot1_shape = None
-        self.robot2_shape = None
-        self.robot3_shape = None
-        self.robot4_shape = None
+        # Rastros (em coordenadas do mundo) e marcadores de cada (robô, trilha), criados quando o robô aparece
+        self.traces = {}
+        self.robot_markers = {}
+        self.follow_targets = {}  # Texto do combobox Seguir -> (robô, trilha)
+        self.map_seqs = {}  # Último snapshot desenhado de cada robô
 
         # Recalcular o centro do Canvas sempre que ele for redimensionado
         self.canvas.bind('<Configure>', self.on_canvas_resize)
+        # Zoom com a roda do mouse (Windows/macOS e Linux) e arrasto com o botão esquerdo
+        self.canvas.bind('<MouseWheel>', self.on_map_wheel)
+        self.canvas.bind('<Button-4>', self.on_map_wheel)
+        self.canvas.bind('<Button-5>', self.on_map_wheel)
+        self.canvas.bind('<ButtonPress-1>', self.on_map_press)
+        self.canvas.bind('<B1-Motion>', self.on_map_drag)
 
     def on_canvas_resize(self, event):
-        # Atualizar as dimensões do Canvas
-        self.canvas_width = event.width
-        self.canvas_height = event.height
-
-        # Recalcular o offset (centro do Canvas)
-        self.offset_x = self.canvas_width / 2
-        self.offset_y = self.canvas_height / 2
-
-        # Limpar e redesenhar os eixos
-        self.canvas.delete('all')
-        self.draw_axes()
-
-        # Redesenhar os robôs e rastros
-        self.robot1_trace.clear()
-        self.robot2_trace.clear()
-        self.robot3_trace.clear()
-        self.robot4_trace.clear()
+        # Os itens são deslocados em bloco; eixos e grade são refeitos
+        self.map_view.resize(event.width, event.height)
 
-        self.robot1_shape = None
-        self.robot2_shape = None
-        self.robot3_shape = None
-        self.robot4_shape = None
+    def on_map_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            factor = 1.2
+        else:
+            factor = 1 / 1.2
+        self.map_view.zoom(factor, event.x, event.y)
+
+    def on_map_press(self, event):
+        self.drag_last = (event.x, event.y)
+
+    def on_map_drag(self, event):
+        # Arrastar manualmente desliga o modo seguir
+        self.follow_var.set('Nenhum')
+        last_x, last_y = self.drag_last
+        self.drag_last = (event.x, event.y)
+        self.map_view.pan(event.x - last_x, event.y - last_y)
+
+    def reset_map_view(self):
+        self.follow_var.set('Nenhum')
+        self.map_view.reset(scale=10)
+        self.refine_traces()
+
+    def on_map_view_changed(self, zoomed):
+        # Robôs são poucos: reposicioná-los direto
+        for marker in self.robot_markers.values():
+            marker.redraw()
+        if self.raster is not None:
+            # Arrasto e modo seguir só deslocam a imagem; zoom e redimensionamento a refazem,
+            # no máximo a cada 300 ms
+            if self.raster.view_changed(zoomed) and self.map_refine_job is None:
+                self.map_refine_job = self.root.after(300, self.refine_traces)
+        elif zoomed:
+            # canvas.scale() já transformou os rastros; refazer o nível de detalhe quando o zoom parar
+            if self.map_refine_job is not None:
+                self.root.after_cancel(self.map_refine_job)
+            self.map_refine_job = self.root.after(300, self.refine_traces)
+
+    def refine_traces(self):
+        self.map_refine_job = None
+        if self.raster is not None:
+            self.raster.redraw()
+            return
+        for robot_id in self.traces:
+            self.draw_trace(robot_id)
+
+    def world_to_canvas(self, x, y):
+        # Converter coordenadas do mundo real para coordenadas do Canvas (eixo Y invertido)
+        return self.map_view.world_to_canvas(x, y)
 
     def draw_axes(self):
-        # Desenhar os eixos x e y no Canvas com marcações e números
-        axis_color = '#FFFFFF'
-        tick_color = '#AAAAAA'
-        text_color = '#FFFFFF'
-        font = ('Arial', 8)
-
-        # Eixo X
-        self.canvas.create_line(0, self.offset_y, self.canvas_width, self.offset_y, fill=axis_color)
-        # Eixo Y
-        self.canvas.create_line(self.offset_x, 0, self.offset_x, self.canvas_height, fill=axis_color)
-
-        # Desenhar as marcações nos eixos
-        for i in range(-50, 51, 10):  # Marcações de -50 a 50 a cada 10 unidades
-            x = i * self.scale + self.offset_x
-            y = -i * self.scale + self.offset_y  # Inverter o eixo Y
-
-            # Marcações no eixo X
-            self.canvas.create_line(x, self.offset_y - 5, x, self.offset_y + 5, fill=tick_color)
-            if i != 0:  # Evitar duplicar o zero
-                self.canvas.create_text(x, self.offset_y + 15, text=str(i), fill=text_color, font=font)
-
-            # Marcações no eixo Y
-            self.canvas.create_line(self.offset_x - 5, y, self.offset_x + 5, y, fill=tick_color)
-            if i != 0:
-                self.canvas.create_text(self.offset_x + 15, y, text=str(i), fill=text_color, font=font)
+        # Desenhar os eixos x e y, a grade e as marcações para a vista atual
+        self.map_view.draw_grid()
 
     def create_table(self, parent, columns):
         table = ttk.Treeview(parent, columns=columns, show='headings')
@@ -255,208 +329,173 @@ class GUI:
         return table
 
     def update_gui(self):
+        start = time.perf_counter()
         try:
-            data = self.data_manager.get_data()
-            # Atualizar tabela Geral
-            for var in self.general_table.get_children():
-                value = data.get(var, 'N/A')
-                self.general_table.item(var, values=(var, str(value)))
-
-            # Atualizar tabela Bateria
-            for var in self.battery_table.get_children():
-                value = data.get(var, 'N/A')
-                self.battery_table.item(var, values=(var, str(value)))
-
-            # Atualizar tabela Odometria
-            for var in self.odometry_table.get_children():
-                value = data.get(var, 'N/A')
-                self.odometry_table.item(var, values=(var, str(value)))
-
-            # Atualizar tabela Encoder
-            for var in self.encoder_table.get_children():
-                value = data.get(var, 'N/A')
-                self.encoder_table.item(var, values=(var, str(value)))
-
-            # Atualizar tabelas de Odometria Estimada
-            for var in self.odometry4_table.get_children():
-                value = data.get(var, 'N/A')
-                self.odometry4_table.item(var, values=(var, str(value)))
-
-            for var in self.odometry5_table.get_children():
-                value = data.get(var, 'N/A')
-                self.odometry5_table.item(var, values=(var, str(value)))
-
-            # Atualizar o mapa 2D
-            self.update_map(data)
+            # Só redesenhar quando um quadro novo tiver chegado
+            snapshot = self.data_manager.get_snapshot(self.last_snapshot_seq)
+            if snapshot is not None:
+                self.last_snapshot_seq = snapshot.seq
+                data = snapshot.data
+
+                # Atualizar apenas as tabelas da aba visível
+                for table in self.tab_tables.get(self.current_tab(), ()):
+                    self.refresh_table(table, data)
+
+            # Atualizar o mapa 2D (todos os robôs)
+            self.update_map()
+
+            # Gráficos: só as amostras novas do histórico, e só com a aba visível
+            if self.current_tab() == 'Gráficos':
+                self.plot_view.update()
         except Exception as e:
             print("Ocorreu um erro na atualização da GUI:")
             traceback.print_exc()
         finally:
-            self.root.after(100, self.update_gui)  # Atualiza a cada 100 ms
-
-    def update_map(self, data):
+            elapsed = time.perf_counter() - start
+            self.update_time.observe(elapsed)
+            self.root.after(self.next_refresh_delay(elapsed), self.update_gui)
+
+    def refresh_table(self, table, data):
+        # Tocar só nas linhas cujo texto mudou desde o último desenho
+        rendered = self.rendered_cells[table]
+        for var in self.table_rows[table]:
+            text = str(data.get(var, 'N/A'))
+            if rendered.get(var) != text:
+                table.item(var, values=(var, text))
+                rendered[var] = text
+
+    def current_tab(self):
+        return self.notebook.tab(self.notebook.select(), 'text')
+
+    def on_tab_changed(self, event):
+        # Forçar um redesenho imediato da aba que acabou de ficar visível
+        self.last_snapshot_seq = -1
+
+    def next_refresh_delay(self, elapsed):
+        """Período de atualização adaptado ao orçamento de tempo do loop do Tk"""
+        self.refresh_cost = 0.8 * self.refresh_cost + 0.2 * elapsed
+        # Gastar no máximo refresh_budget do tempo do loop principal atualizando a GUI
+        period = self.refresh_cost / self.refresh_budget
+        period = min(max(period, self.min_refresh_period), self.max_refresh_period)
+        return int(period * 1000)
+
+    def update_map(self):
         try:
-            # Obter as posições atuais
-            odom_x2 = data.get('odom_x2', 0.0)
-            odom_y2 = data.get('odom_y2', 0.0)
-            odom_th2 = data.get('odom_th2', 0.0)
-
-            odom_x3 = data.get('odom_x3', 0.0)
-            odom_y3 = data.get('odom_y3', 0.0)
-            odom_th3 = data.get('odom_th3', 0.0)
-
-            # Odometria 4 e 5
-            odom4_x = data.get('odom4_x', 0.0)
-            odom4_y = data.get('odom4_y', 0.0)
-            odom4_th = data.get('odom4_th', 0.0)
-
-            odom5_x = data.get('odom5_x', 0.0)
-            odom5_y = data.get('odom5_y', 0.0)
-            odom5_th = data.get('odom5_th', 0.0)
-
-            # Converter para float
-            odom_x2 = float(odom_x2)
-            odom_y2 = float(odom_y2)
-            odom_th2 = float(odom_th2)
-
-            odom_x3 = float(odom_x3)
-            odom_y3 = float(odom_y3)
-            odom_th3 = float(odom_th3)
-
-            odom4_x = float(odom4_x)
-            odom4_y = float(odom4_y)
-            odom4_th = float(odom4_th)
-
-            odom5_x = float(odom5_x)
-            odom5_y = float(odom5_y)
-            odom5_th = float(odom5_th)
-
-            # Atualizar as posições dos robôs
-            self.robot1['x'] = odom_x2
-            self.robot1['y'] = odom_y2
-            self.robot1['th'] = odom_th2
-
-            self.robot2['x'] = odom_x3
-            self.robot2['y'] = odom_y3
-            self.robot2['th'] = odom_th3
-
-            self.robot3['x'] = odom4_x
-            self.robot3['y'] = odom4_y
-            self.robot3['th'] = odom4_th
-
-            self.robot4['x'] = odom5_x
-            self.robot4['y'] = odom5_y
-            self.robot4['th'] = odom5_th
-
-            # Desenhar os robôs no Canvas
-            self.draw_robot('robot1', self.robot1, trace_list=self.robot1_trace)
-            self.draw_robot('robot2', self.robot2, trace_list=self.robot2_trace)
-            self.draw_robot('robot3', self.robot3, trace_list=self.robot3_trace)
-            self.draw_robot('robot4', self.robot4, trace_list=self.robot4_trace)
-
+            # Atualizar a posição e o rastro de cada trilha dos robôs com quadros novos
+            for name in self.robot_names:
+                data_manager = self.robots.get(name)
+                snapshot = data_manager and data_manager.get_snapshot(self.map_seqs.get(name, -1))
+                if snapshot is None:
+                    continue
+                self.map_seqs[name] = snapshot.seq
+                data = snapshot.data
+                for robot_id, key_x, key_y, key_th, _ in self.map_tracks:
+                    robot = {
+                        'x': float(data.get(key_x, 0.0)),
+                        'y': float(data.get(key_y, 0.0)),
+                        'th': float(data.get(key_th, 0.0)),
+                    }
+                    self.draw_robot((name, robot_id), robot)
+
+            # Modo seguir: manter o robô escolhido no centro
+            marker = self.robot_markers.get(self.follow_targets.get(self.follow_var.get()))
+            if marker is not None:
+                self.map_view.center_on(marker.pose[0], marker.pose[1])
+
+            # Mapa raster: queimar os segmentos novos de uma vez
+            if self.raster is not None:
+                self.raster.flush()
         except Exception as e:
             print("Ocorreu um erro na atualização do mapa:")
             traceback.print_exc()
 
-    def draw_robot(self, robot_id, robot, trace_list=None):
+    def add_map_robot(self, name):
+        # Um rastro e um marcador por trilha; com vários robôs o marcador leva o nome
+        label = name if len(self.robot_names) > 1 else None
+        index = len(self.map_seqs)
+        self.map_seqs[name] = -1
+        for robot_id, _, _, _, color in self.map_tracks:
+            key = (name, robot_id)
+            tag = f'{robot_id}_{index}'
+            if self.raster is not None:
+                self.traces[key] = self.raster.trace(color)
+            else:
+                self.traces[key] = Trace(self.canvas, 'trace_' + tag, color, self.world_to_canvas)
+            self.robot_markers[key] = RobotMarker(self.canvas, 'shape_' + tag, color, self.world_to_canvas,
+                                                  label=label)
+            self.follow_targets[f'{name}: {robot_id}'] = key
+
+    def refresh_robot_list(self):
+        # Robôs novos aparecem no seletor, no mapa e no modo seguir
+        names = list(self.robots)
+        if names == self.robot_names:
+            return
+        self.robot_names = names
+        for name in names:
+            if name not in self.map_seqs:
+                self.add_map_robot(name)
+            if name not in self.plot_histories:
+                history = PlotHistory(self.robots[name].output_fields())
+                history.attach(self.robots[name])
+                self.plot_histories[name] = history
+        self.robot_box.configure(values=names)
+        self.follow_box.configure(values=['Nenhum'] + list(self.follow_targets))
+        if self.robot_var.get() not in self.robots and names:
+            self.robot_var.set(names[0])
+        self.on_robot_selected()
+
+    def on_robot_selected(self, event=None):
+        data_manager = self.robots.get(self.robot_var.get())
+        if data_manager is not None:
+            self.data_manager = data_manager
+            self.last_snapshot_seq = -1
+            self.plot_view.set_store(data_manager.history, self.plot_histories.get(self.robot_var.get()))
+
+    def draw_robot(self, robot_id, robot):
         try:
-            # Converter coordenadas do mundo real para coordenadas do Canvas
-            x = robot['x'] * self.scale + self.offset_x
-            y = -robot['y'] * self.scale + self.offset_y  # Inverter o eixo Y
-
-            # Atualizar o rastro
-            if trace_list is not None:
-                current_time = time.time()
-                # Adicionar a posição atual à lista de rastros
-                trace_list.append((current_time, x, y))
-                # Remover posições mais antigas que um minuto
-                one_minute_ago = current_time - 60  # 60 segundos atrás
-                trace_list[:] = [(t, x_t, y_t) for t, x_t, y_t in trace_list if t >= one_minute_ago]
-
-                # Desenhar o rastro
-                self.draw_trace(trace_list, color=robot_id)
-
-            # Remover a forma anterior
-            if hasattr(self, f'{robot_id}_shape') and getattr(self, f'{robot_id}_shape'):
-                self.canvas.delete(getattr(self, f'{robot_id}_shape'))
-
-            # Desenhar um triângulo representando o robô
-            self.draw_triangle_robot(robot_id, x, y, robot['th'])
-
+            # Adicionar a posição atual ao rastro; pontos antigos descem para níveis simplificados
+            trace = self.traces[robot_id]
+            current_time = time.monotonic()
+            trace.add_point(current_time, robot['x'], robot['y'])
+            trace.evict(current_time)
+
+            # Mover o triângulo que representa o robô
+            self.draw_triangle_robot(robot_id, robot['x'], robot['y'], robot['th'])
         except Exception as e:
             print(f"Ocorreu um erro ao desenhar o robô {robot_id}:")
             traceback.print_exc()
 
     def draw_triangle_robot(self, robot_id, x, y, th):
         try:
-            # Definir o tamanho do robô no Canvas
-            robot_size = 20
-
-            # Calcular os vértices do triângulo
-            angle = th  # Assumindo que 'th' está em radianos
-
-            # Coordenadas do triângulo em relação ao centro do robô
-            points = [
-                (x + robot_size * math.cos(angle), y + robot_size * math.sin(angle)),  # Ponta do triângulo
-                (x + robot_size * math.cos(angle + 2 * math.pi / 3), y + robot_size * math.sin(angle + 2 * math.pi / 3)),
-                (x + robot_size * math.cos(angle + 4 * math.pi / 3), y + robot_size * math.sin(angle + 4 * math.pi / 3))
-            ]
-
-            # Definir a cor com base no robô
-            if robot_id == 'robot1':
-                color = 'blue'
-            elif robot_id == 'robot2':
-                color = 'green'
-            elif robot_id == 'robot3':
-                color = '#ADD8E6'  # Light blue
-            elif robot_id == 'robot4':
-                color = '#90EE90'  # Light green
-            else:
-                color = 'gray'
-
-            # Desenhar o triângulo
-            shape = self.canvas.create_polygon(points, fill=color)
-
-            # Salvar o ID da forma
-            setattr(self, f'{robot_id}_shape', shape)
+            self.robot_markers[robot_id].move(x, y, th)
         except Exception as e:
             print(f"Erro ao desenhar triângulo para {robot_id}: {e}")
             traceback.print_exc()
 
-    def draw_trace(self, trace_list, color='blue'):
+    def draw_trace(self, robot_id):
         try:
-            # Primeiro, remover o rastro anterior
-            self.canvas.delete('trace_' + color)
-
-            # Se houver pelo menos dois pontos, desenhar linhas entre eles
-            if len(trace_list) >= 2:
-                points = []
-                for _, x, y in trace_list:
-                    points.extend([x, y])
-
-                # Definir a cor com base no robô
-                if color == 'robot1':
-                    line_color = 'blue'
-                elif color == 'robot2':
-                    line_color = 'green'
-                elif color == 'robot3':
-                    line_color = '#ADD8E6'  # Light blue
-                elif color == 'robot4':
-                    line_color = '#90EE90'  # Light green
-                else:
-                    line_color = 'gray'
-
-                self.canvas.create_line(points, fill=line_color, width=2, tags=('trace_' + color))
+            # Redesenhar o rastro inteiro a partir das coordenadas do mundo
+            self.traces[robot_id].redraw()
         except Exception as e:
-            print(f"Erro ao desenhar o rastro do {color}: {e}")
+            print(f"Erro ao desenhar o rastro do {robot_id}: {e}")
             traceback.print_exc()
 
     def create_widgets(self):
+        # Seletor do robô mostrado nas tabelas (lista atualizada conforme robôs aparecem)
+        robot_bar = ttk.Frame(self.root)
+        robot_bar.pack(fill='x')
+        ttk.Label(robot_bar, text="Robô:").pack(side=tk.LEFT, padx=(5, 0))
+        self.robot_var = tk.StringVar()
+        self.robot_box = ttk.Combobox(robot_bar, textvariable=self.robot_var, state='readonly', width=20)
+        self.robot_box.pack(side=tk.LEFT, padx=5, pady=2)
+        self.robot_box.bind('<<ComboboxSelected>>', self.on_robot_selected)
+
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True)
 
         self.tabs = {}
-        tab_names = ['Geral', 'Bateria', 'Odometria', 'Encoder', 'Mapa 2D', 'ODOMETRIA ESTIMADA', 'Controle']
+        tab_names = ['Geral', 'Bateria', 'Odometria', 'Encoder', 'Mapa 2D', 'ODOMETRIA ESTIMADA', 'Gráficos',
+                     'Controle', 'Diagnóstico']
         for name in tab_names:
             frame = ttk.Frame(self.notebook)
             self.notebook.add(frame, text=name)
@@ -468,7 +507,73 @@ class GUI:
         self.create_encoder_tab()
         self.create_map_tab()
         self.create_estimated_odometry_tab()
+        self.create_plot_tab()
         self.create_control_tab()  # Adicionar a aba Controle
+        self.create_diagnostics_tab()
+        if self.replay is not None:
+            self.create_replay_tab()
+
+        # Tabelas de cada aba, com as linhas e o último texto desenhado em cada célula
+        self.tab_tables = {
+            'Geral': [self.general_table],
+            'Bateria': [self.battery_table],
+            'Odometria': [self.odometry_table],
+            'Encoder': [self.encoder_table],
+            'ODOMETRIA ESTIMADA': self.estimator_tables,
+        }
+        self.table_rows = {}
+        self.rendered_cells = {}
+        for tables in self.tab_tables.values():
+            for table in tables:
+                self.table_rows[table] = tuple(table.get_children())
+                self.rendered_cells[table] = {var: 'N/A' for var in self.table_rows[table]}
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.robot_var.set(next((name for name, dm in self.robots.items() if dm is self.data_manager), ''))
+        self.refresh_robot_list()
+
+    def create_diagnostics_tab(self):
+        frame = self.tabs['Diagnóstico']
+        self.diagnostics_table = self.create_table(frame, ['Métrica', 'Valor', 'Taxa/s', 'p50', 'p99', 'Máx'])
+
+    def update_diagnostics(self):
+        try:
+            self.refresh_robot_list()
+            self.update_scheduler_status()
+            snapshot = metrics.snapshot()
+            rows = {}
+            for name, counter in snapshot['counters'].items():
+                rows[name] = (name, counter['value'], f"{counter['rate']:.1f}", '', '', '')
+            for name, histogram in snapshot['histograms'].items():
+                rows[name] = (name, histogram['count'], '',
+                              self.format_seconds(histogram['p50']),
+                              self.format_seconds(histogram['p99']),
+                              self.format_seconds(histogram['max']))
+            for name, value in snapshot['gauges'].items():
+                if isinstance(value, dict):
+                    rows[name] = (name, f"{value.get('depth')}/{value.get('capacity')}", '', '', '',
+                                  f"descartados: {value.get('dropped', 0)}")
+                else:
+                    rows[name] = (name, str(value), '', '', '', '')
+
+            for name in sorted(rows):
+                if self.diagnostics_table.exists(name):
+                    self.diagnostics_table.item(name, values=rows[name])
+                else:
+                    self.diagnostics_table.insert('', 'end', iid=name, values=rows[name])
+        except Exception as e:
+            print("Ocorreu um erro na atualização do diagnóstico:")
+            traceback.print_exc()
+        finally:
+            self.root.after(1000, self.update_diagnostics)  # Atualiza a cada 1 s
+
+    def format_seconds(self, value):
+        if value is None:
+            return ''
+        if value < 1e-3:
+            return f"{value * 1e6:.1f} µs"
+        if value < 1:
+            return f"{value * 1e3:.2f} ms"
+        return f"{value:.2f} s"
 
     def create_control_tab(self):
         frame = self.tabs['Controle']
@@ -530,12 +635,104 @@ class GUI:
         twist_button = ttk.Button(twist_frame, text="Enviar Comando 'twist'", command=self.send_twist_command)
         twist_button.pack(side=tk.LEFT)
 
+        # Perfil de velocidade: comandos em frequência fixa a partir de um arquivo
+        profile_frame = ttk.Frame(frame)
+        profile_frame.pack(pady=10)
+
+        ttk.Button(profile_frame, text="Carregar Perfil...", command=self.load_profile_file).pack(side=tk.LEFT)
+        self.profile_label = ttk.Label(profile_frame, text="Nenhum perfil", width=25)
+        self.profile_label.pack(side=tk.LEFT, padx=5)
+        ttk.Label(profile_frame, text="Frequência (Hz):").pack(side=tk.LEFT)
+        self.profile_rate_entry = ttk.Entry(profile_frame, width=6)
+        self.profile_rate_entry.pack(side=tk.LEFT)
+        self.profile_rate_entry.insert(0, "50")  # Setpoints a 50 Hz
+        self.profile_loop_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(profile_frame, text="Repetir", variable=self.profile_loop_var).pack(side=tk.LEFT, padx=5)
+        self.profile_button = ttk.Button(profile_frame, text="Iniciar Perfil", command=self.toggle_profile)
+        self.profile_button.pack(side=tk.LEFT)
+
+        # Estatísticas dos envios periódicos
+        self.scheduler_label = ttk.Label(frame, text="")
+        self.scheduler_label.pack(pady=10)
+
+    def command_target(self):
+        """Função de envio para o robô atual, segura para chamar de outras threads"""
+        if self.io_loop is not None:
+            name = self.robot_var.get()
+            return lambda command: self.io_loop.send_command(name, command)
+        if self.serial_reader is None:
+            return None
+        return self.serial_reader.send_command
+
+    def send_command(self, command):
+        # Não bloqueia a GUI: a escrita é feita pela thread de envio da porta
+        if self.io_loop is not None:
+            self.io_loop.send_command(self.robot_var.get(), command)
+            return
+        # Sem porta serial (ex.: reprodução de sessão) os comandos são ignorados
+        if self.serial_reader is None:
+            print(f"Sem porta serial, comando ignorado: {command}")
+            return
+        self.serial_reader.send_command(command)
+
+    def create_replay_tab(self):
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text='Reprodução')
+        self.tabs['Reprodução'] = frame
+
+        controls = ttk.Frame(frame)
+        controls.pack(pady=10)
+        self.replay_button = ttk.Button(controls, text="Pausar", command=self.toggle_replay_pause)
+        self.replay_button.pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(controls, text="Velocidade:").pack(side=tk.LEFT)
+        self.replay_speed_var = tk.StringVar(value='1x')
+        speed_box = ttk.Combobox(controls, textvariable=self.replay_speed_var, state='readonly', width=8,
+                                 values=['0.25x', '0.5x', '1x', '2x', '5x', '10x', 'Máxima'])
+        speed_box.pack(side=tk.LEFT, padx=5)
+        speed_box.bind('<<ComboboxSelected>>', self.on_replay_speed)
+
+        self.replay_time_label = ttk.Label(controls, text="0.0 s")
+        self.replay_time_label.pack(side=tk.LEFT, padx=10)
+
+        # Barra de busca: soltar o botão do mouse leva a reprodução até o instante
+        self.replay_scale = ttk.Scale(frame, from_=0.0, to=max(self.replay.duration(), 0.001), orient='horizontal')
+        self.replay_scale.pack(fill='x', padx=20, pady=10)
+        self.replay_scale.bind('<ButtonRelease-1>', self.on_replay_seek)
+        self.replay_dragging = False
+        self.replay_scale.bind('<ButtonPress-1>', lambda event: setattr(self, 'replay_dragging', True))
+        self.update_replay_position()
+
+    def toggle_replay_pause(self):
+        if self.replay.paused:
+            self.replay.resume()
+            self.replay_button.config(text="Pausar")
+        else:
+            self.replay.pause()
+            self.replay_button.config(text="Continuar")
+
+    def on_replay_speed(self, event):
+        value = self.replay_speed_var.get()
+        self.replay.set_speed(None if value == 'Máxima' else float(value.rstrip('x')))
+
+    def on_replay_seek(self, event):
+        self.replay_dragging = False
+        self.replay.seek(float(self.replay_scale.get()))
+
+    def update_replay_position(self):
+        position = self.replay.position()
+        if not self.replay_dragging:
+            self.replay_scale.set(position)
+        status = " (fim)" if self.replay.finished else ""
+        self.replay_time_label.config(text=f"{position:.1f} / {self.replay.duration():.1f} s{status}")
+        self.root.after(250, self.update_replay_position)
+
     def send_single_at(self):
         command = 'test@'
-        self.serial_reader.send_command(command)
+        self.send_command(command)
 
     def toggle_interval_sending(self):
-        if not self.interval_sending:
+        if not self.scheduler.active('intervalo'):
             # Iniciar o envio em intervalo
             try:
                 interval = float(self.interval_entry.get())
@@ -546,27 +743,70 @@ class GUI:
                 tk.messagebox.showerror("Erro", "Por favor, insira um número válido para o intervalo.")
                 return
 
-            self.interval_sending = True
+            send = self.command_target()
+            if send is None:
+                print("Sem porta serial, envio em intervalo não iniciado.")
+                return
+            self.scheduler.add_stream(CommandStream('intervalo', interval, send, 'speed:10:10@'))
             self.interval_button.config(text="Parar Envio '@' em Intervalo")
-            self.interval_thread = threading.Thread(target=self.send_at_interval, args=(interval,))
-            self.interval_thread.daemon = True
-            self.interval_thread.start()
         else:
             # Parar o envio em intervalo
-            self.interval_sending = False
+            self.scheduler.remove_stream('intervalo')
             self.interval_button.config(text="Iniciar Envio '@' em Intervalo")
 
-    def send_at_interval(self, interval):
-        while self.interval_sending:
-            self.serial_reader.send_command('speed:10:10@')
-            time.sleep(interval)
+    def load_profile_file(self):
+        path = filedialog.askopenfilename(title="Perfil de velocidade",
+                                          filetypes=[("Perfil", "*.txt *.prof"), ("Todos", "*.*")])
+        if not path:
+            return
+        try:
+            self.profile = load_profile(path)
+        except (OSError, ValueError) as e:
+            tk.messagebox.showerror("Erro", f"Não foi possível carregar o perfil: {e}")
+            return
+        duration = self.profile[-1][0] if self.profile else 0.0
+        self.profile_label.config(text=f"{os.path.basename(path)} ({duration:.1f} s)")
+
+    def toggle_profile(self):
+        if self.scheduler.active('perfil'):
+            self.scheduler.remove_stream('perfil')
+            self.profile_button.config(text="Iniciar Perfil")
+            return
+        if not self.profile:
+            tk.messagebox.showerror("Erro", "Carregue um perfil de velocidade primeiro.")
+            return
+        try:
+            rate = float(self.profile_rate_entry.get())
+            if rate <= 0:
+                raise ValueError
+        except ValueError:
+            tk.messagebox.showerror("Erro", "A frequência deve ser um número positivo.")
+            return
+        send = self.command_target()
+        if send is None:
+            print("Sem porta serial, perfil não iniciado.")
+            return
+        self.scheduler.add_stream(ProfileStream('perfil', 1.0 / rate, send, self.profile,
+                                                loop=self.profile_loop_var.get()))
+        self.profile_button.config(text="Parar Perfil")
+
+    def update_scheduler_status(self):
+        # O perfil termina sozinho no último ponto
+        if not self.scheduler.active('perfil'):
+            self.profile_button.config(text="Iniciar Perfil")
+        lines = []
+        for name, stats in self.scheduler.stats().items():
+            jitter = self.format_seconds(stats['jitter_p99']) or '-'
+            lines.append(f"{name}: {1 / stats['period']:.0f} Hz, enviados {stats['sent']}, "
+                         f"perdidos {stats['missed']}, jitter p99 {jitter}")
+        self.scheduler_label.config(text='\n'.join(lines))
 
     def send_speed_command(self):
         try:
             vel_esquerda = float(self.speed_left_entry.get())
             vel_direita = float(self.speed_right_entry.get())
             command = f'speed:{vel_esquerda}:{vel_direita}@'
-            self.serial_reader.send_command(command)
+            self.send_command(command)
         except ValueError:
             tk.messagebox.showerror("Erro", "Por favor, insira números válidos para vel_esquerda e vel_direita.")
 
@@ -575,12 +815,11 @@ class GUI:
             vel_linear = float(self.twist_linear_entry.get())
             vel_angular = float(self.twist_angular_entry.get())
             command = f'twist:{vel_linear}:{vel_angular}@'
-            self.serial_reader.send_command(command)
+            self.send_command(command)
         except ValueError:
             tk.messagebox.showerror("Erro", "Por favor, insira números válidos para vel_linear e vel_angular.")
 
     def on_closing(self):
-        # Parar o envio em intervalo se estiver ativo
-        if self.interval_sending:
-            self.interval_sending = False
+        # Parar os envios periódicos ativos
+        self.scheduler.stop()
         self.root.destroy()
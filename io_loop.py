@@ -0,0 +1,260 @@
+# io_loop.py
+
+import os
+import selectors
+import threading
+import time
+import traceback
+from collections import deque
+import serial
+from command_writer import CommandQueue
+from data_manager import DataManager
+from metrics import metrics, debug_log
+from serial_reader import FrameExtractor
+
+
+class PortSource:
+    """Uma porta atendida pelo IOLoop: descritor não bloqueante, extrator e DataManager"""
+
+    def __init__(self, name, port, baudrate, data_manager):
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.data_manager = data_manager
+        self.extractor = FrameExtractor()
+        self.ser = None
+        self.fd = None
+        self.events = selectors.EVENT_READ
+        # Comandos: fila com coalescência e bytes ainda não aceitos pelo driver
+        self.commands = CommandQueue()
+        self.flush_scheduled = False
+        self.out = bytearray()
+        self.out_marks = deque()  # (total de bytes ao fim do comando, instante do pedido, comando)
+        self.queued_total = 0
+        self.written_total = 0
+        self.bytes_counter = metrics.counter(f'serial.{name}.bytes')
+        self.frames_counter = metrics.counter(f'serial.{name}.frames')
+        self.invalid_counter = metrics.counter(f'serial.{name}.invalid_frames')
+
+    def open(self):
+        # timeout=0: leituras nunca bloqueiam, quem espera é o select do loop
+        self.ser = serial.Serial(
+            self.port,
+            self.baudrate,
+            timeout=0,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            bytesize=serial.EIGHTBITS
+        )
+        self.fd = self.ser.fileno()
+        os.set_blocking(self.fd, False)
+
+    def close(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+            print(f"Porta serial {self.port} ({self.name}) fechada.")
+
+
+class IOLoop(threading.Thread):
+    """Uma única thread que atende N portas seriais (ou pseudo-terminais) com select.
+
+    Cada porta tem seu FrameExtractor e seu DataManager; os quadros são
+    processados na própria thread do loop, logo há uma thread de aquisição no
+    total em vez de uma por robô disputando o GIL. `robots` (nome -> DataManager)
+    pode crescer com o loop rodando e é lido pela GUI.
+
+    Usa descritores de arquivo, então só funciona em POSIX (Linux/macOS); no
+    Windows use um SerialReader por porta.
+    """
+
+    def __init__(self, history_capacity=16384, read_size=65536):
+        super().__init__(name='IOLoop', daemon=True)
+        self.history_capacity = history_capacity
+        self.read_size = read_size
+        self.selector = selectors.DefaultSelector()
+        self.sources = {}
+        self.robots = {}
+        self.pending = deque()  # Chamadas a executar na thread do loop
+        self.stop_event = threading.Event()
+        # Self-pipe: acorda o select quando outra thread agenda algo
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        os.set_blocking(self.wake_w, False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        self.process_time = metrics.histogram('ioloop.process_s')
+        self.wakeups_counter = metrics.counter('ioloop.wakeups')
+        self.sent_counter = metrics.counter('commands.sent')
+        self.command_latency = metrics.histogram('commands.latency_s')
+
+    def add_port(self, name, port, baudrate=921600, data_manager=None):
+        """Abre a porta e passa a atendê-la; retorna o DataManager do robô ou None"""
+        if name in self.sources:
+            raise ValueError(f"Robô já registrado: {name}")
+        if data_manager is None:
+            data_manager = DataManager(history_capacity=self.history_capacity)
+        source = PortSource(name, port, baudrate, data_manager)
+        try:
+            source.open()
+            print(f"Porta serial {port} ({name}) aberta com sucesso.")
+        except Exception as e:
+            print(f"Erro ao abrir a porta serial {port} ({name}): {e}")
+            return None
+        self.sources[name] = source
+        self.robots[name] = data_manager
+        self.call_soon(self._register, source)
+        return data_manager
+
+    def remove_port(self, name):
+        """Para de atender a porta e tira o robô da lista"""
+        self.call_soon(self._unregister, name, True)
+
+    def send_command(self, name, command):
+        """Envia um comando ao robô sem bloquear; a escrita é feita pela thread do loop"""
+        source = self.sources.get(name)
+        if source is None:
+            print(f"Robô {name} sem porta aberta, comando ignorado: {command}")
+            return
+        # speed/twist ainda não enviados são substituídos pelo mais recente
+        source.commands.put(command)
+        if not source.flush_scheduled:
+            source.flush_scheduled = True
+            self.call_soon(self._flush_commands, source)
+
+    def call_soon(self, callback, *args):
+        """Agenda callback(*args) na thread do loop (seguro a partir de qualquer thread)"""
+        self.pending.append((callback, args))
+        try:
+            os.write(self.wake_w, b'\0')
+        except (BlockingIOError, OSError):
+            # Pipe cheio (o loop já vai acordar) ou fechado (loop encerrado)
+            pass
+
+    def _register(self, source):
+        self.selector.register(source.fd, selectors.EVENT_READ, source)
+
+    def _unregister(self, name, forget=False):
+        # Sem forget o robô continua listado com os últimos dados (ex.: porta desconectada)
+        source = self.sources.pop(name, None)
+        if forget:
+            self.robots.pop(name, None)
+        if source is None:
+            return
+        try:
+            self.selector.unregister(source.fd)
+        except (KeyError, ValueError):
+            pass
+        source.close()
+
+    def run(self):
+        print("Thread IOLoop iniciada.")
+        try:
+            while not self.stop_event.is_set():
+                for key, mask in self.selector.select(timeout=1.0):
+                    source = key.data
+                    if source is None:
+                        self._drain_wakeups()
+                        continue
+                    if mask & selectors.EVENT_WRITE:
+                        self._write(source)
+                    if mask & selectors.EVENT_READ and source.name in self.sources:
+                        self._read(source)
+        except Exception:
+            print("Erro no loop de aquisição:")
+            traceback.print_exc()
+        finally:
+            for name in list(self.sources):
+                self._unregister(name)
+            self.selector.close()
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self.wakeups_counter.inc()
+        while self.pending:
+            callback, args = self.pending.popleft()
+            try:
+                callback(*args)
+            except Exception:
+                print("Erro em tarefa agendada no loop de aquisição:")
+                traceback.print_exc()
+
+    def _read(self, source):
+        try:
+            chunk = os.read(source.fd, self.read_size)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            # Ex.: EIO quando o outro lado de um pseudo-terminal fecha
+            print(f"Erro ao ler a porta {source.port} ({source.name}): {e}")
+            self._unregister(source.name)
+            return
+        if not chunk:
+            print(f"Porta {source.port} ({source.name}) desconectada.")
+            self._unregister(source.name)
+            return
+        source.bytes_counter.inc(len(chunk))
+        extractor = source.extractor
+        invalid_before = extractor.invalid_frames
+        frames = extractor.feed(chunk)
+        if extractor.invalid_frames != invalid_before:
+            source.invalid_counter.inc(extractor.invalid_frames - invalid_before)
+            debug_log.warn(f"{source.name}: quadros inválidos descartados: {extractor.invalid_frames - invalid_before}")
+        if frames:
+            source.frames_counter.inc(len(frames))
+            if debug_log.enabled:
+                for line in frames:
+                    debug_log.log(f"{source.name}: linha recebida: {line}")
+            start = time.perf_counter()
+            source.data_manager.process_lines(frames)
+            self.process_time.observe(time.perf_counter() - start)
+
+    def _flush_commands(self, source):
+        source.flush_scheduled = False
+        if self.sources.get(source.name) is not source:
+            return
+        for command, submitted in source.commands.take():
+            data = command.encode('utf-8')
+            source.out += data
+            source.queued_total += len(data)
+            source.out_marks.append((source.queued_total, submitted, command))
+        self._write(source)
+
+    def _write(self, source):
+        # Latência medida até o driver aceitar os bytes (a escrita não bloqueia)
+        if source.out:
+            try:
+                written = os.write(source.fd, source.out)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                print(f"Erro ao enviar comando para {source.name}: {e}")
+                # Descartar o que estava pendente; os contadores voltam a coincidir para os próximos comandos
+                source.out.clear()
+                source.out_marks.clear()
+                source.written_total = source.queued_total
+                written = 0
+            del source.out[:written]
+            source.written_total += written
+            now = time.perf_counter()
+            marks = source.out_marks
+            while marks and marks[0][0] <= source.written_total:
+                _, submitted, command = marks.popleft()
+                self.command_latency.observe(now - submitted)
+                self.sent_counter.inc()
+                debug_log.log(f"Comando enviado para {source.name}: {command}")
+        # O que não coube no buffer do driver sai quando a porta ficar gravável
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if source.out else 0)
+        if events != source.events:
+            self.selector.modify(source.fd, events, source)
+            source.events = events
+
+    def stop(self):
+        self.stop_event.set()
+        self.call_soon(lambda: None)
+        if self.is_alive():
+            self.join(timeout=5)
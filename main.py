@@ -1,31 +1,287 @@
 # main.py
 
-import tkinter as tk
-from gui import GUI
+import argparse
+import json
+import os
+import signal
+import threading
+import time
 from data_manager import DataManager
-from serial_reader import SerialReader
+from metrics import MetricsExporter, metrics, debug_log
+from pipeline import Pipeline
 
-def main():
-    root = tk.Tk()
-    data_manager = DataManager()
+# Configuração padrão; um arquivo --config (JSON com as mesmas chaves) e as
+# opções da linha de comando sobrescrevem, nessa ordem
+DEFAULT_CONFIG = {
+    'port': 'COM23',          # Porta serial
+    'baud': 921600,           # Baud rate
+    'robots': {},             # Vários robôs num só loop de E/S: nome -> porta (ex.: {"r1": "/dev/ttyUSB0"})
+    'replay': None,           # Sessão gravada reproduzida no lugar da porta serial
+    'speed': 1.0,             # Velocidade da reprodução (0 = o mais rápido possível)
+    'record': None,           # Gravar a sessão (quadros brutos + tempo de recepção)
+    'raw_policy': 'block',    # Política da fila bruta: 'block', 'drop_oldest' ou 'decimate'
+    'metrics_file': None,     # Ex.: 'metrics.json'
+    'metrics_port': None,     # Ex.: 8765 para http://127.0.0.1:8765/metrics
+    'debug': False,           # Log por linha (opcional e limitado)
+    'headless': False,        # Sem GUI: tkinter nem é importado
+    'status_interval': 10.0,  # Resumo periódico no modo sem GUI (0 desativa)
+    'profile': None,          # Perfil de velocidade enviado ao iniciar (ver scheduler.py)
+    'profile_rate': 50.0,     # Frequência dos setpoints do perfil (Hz)
+    'profile_loop': False,    # Repetir o perfil até encerrar
+    'fanout': None,           # Servidor de telemetria para outros processos (ex.: 'tcp:127.0.0.1:8766')
+    'shm': None,              # Snapshot e histórico recente em memória compartilhada (nome do segmento)
+    'shm_capacity': 4096,     # Quadros no anel da memória compartilhada
+    'map_backend': 'vector',  # Rastros do Mapa 2D: 'vector' (linhas do Canvas) ou 'raster' (imagem NumPy)
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Aquisição e visualização da telemetria dos robôs")
+    parser.add_argument('--config', help="arquivo JSON com a configuração (mesmas chaves das opções)")
+    parser.add_argument('--port', help="porta serial (ex.: COM23, /dev/ttyUSB0)")
+    parser.add_argument('--baud', type=int, help="baud rate")
+    parser.add_argument('--robot', action='append', metavar='NOME=PORTA', dest='robots',
+                        help="atender várias portas num só loop de E/S (repetir para cada robô)")
+    parser.add_argument('--replay', help="reproduzir uma sessão gravada no lugar da porta serial")
+    parser.add_argument('--speed', type=float, help="velocidade da reprodução (0 = o mais rápido possível)")
+    parser.add_argument('--record', help="gravar a sessão neste arquivo")
+    parser.add_argument('--raw-policy', choices=('block', 'drop_oldest', 'decimate'), help="política da fila bruta")
+    parser.add_argument('--metrics-file', help="exportar métricas neste arquivo JSON")
+    parser.add_argument('--metrics-port', type=int, help="servir métricas em http://127.0.0.1:PORTA/metrics")
+    parser.add_argument('--debug', action='store_true', default=None, help="ativar o log por linha")
+    parser.add_argument('--headless', action='store_true', default=None, help="rodar sem GUI")
+    parser.add_argument('--status-interval', type=float, help="segundos entre resumos no modo sem GUI")
+    parser.add_argument('--profile', help="enviar este perfil de velocidade a todos os robôs ao iniciar")
+    parser.add_argument('--profile-rate', type=float, help="frequência dos setpoints do perfil (Hz)")
+    parser.add_argument('--profile-loop', action='store_true', default=None, help="repetir o perfil")
+    parser.add_argument('--fanout', metavar='ENDEREÇO',
+                        help="publicar os quadros para outros processos (tcp:HOST:PORTA ou unix:/caminho)")
+    parser.add_argument('--shm', metavar='NOME',
+                        help="publicar o último quadro e o histórico recente em memória compartilhada")
+    parser.add_argument('--shm-capacity', type=int, help="quadros no anel da memória compartilhada")
+    parser.add_argument('--map-backend', choices=('vector', 'raster'),
+                        help="desenho dos rastros do Mapa 2D (raster: imagem, para muitos robôs e rastros longos)")
+    return parser.parse_args(argv)
+
+
+def load_config(args):
+    """Mescla padrão, arquivo de configuração e linha de comando"""
+    config = dict(DEFAULT_CONFIG)
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            file_config = json.load(f)
+        unknown = set(file_config) - set(DEFAULT_CONFIG)
+        if unknown:
+            print(f"Chaves desconhecidas em {args.config} ignoradas: {', '.join(sorted(unknown))}")
+        config.update((key, value) for key, value in file_config.items() if key in DEFAULT_CONFIG)
+    for key in DEFAULT_CONFIG:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    if isinstance(config['robots'], list):
+        config['robots'] = dict(parse_robot(text) for text in config['robots'])
+    return config
+
+
+def parse_robot(text):
+    name, sep, port = text.partition('=')
+    if not sep or not name or not port:
+        raise SystemExit(f"Robô inválido: {text} (use NOME=PORTA)")
+    return name, port
+
+
+class Runtime:
+    """Aquisição (serial ou reprodução), pipeline, gravação e métricas, sem GUI"""
+
+    def __init__(self, config):
+        self.config = config
+        self.data_manager = None
+        self.robots = {}  # Nome -> DataManager de cada robô visível na GUI
+        self.io_loop = None
+        self.serial_reader = None
+        self.pipeline = None
+        self.recorder = None
+        self.replay = None
+        self.exporter = None
+        self.scheduler = None
+        self.fanout = None
+        self.shm_publishers = []
+
+    def start(self):
+        config = self.config
+        debug_log.enabled = bool(config['debug'])
+        if config['metrics_file'] or config['metrics_port']:
+            self.exporter = MetricsExporter(path=config['metrics_file'], port=config['metrics_port'])
+            self.exporter.start()
+        self.start_acquisition()
+        self.start_fanout()
+        self.start_shm()
+        self.start_profile()
+
+    def start_acquisition(self):
+        config = self.config
+        if config['robots']:
+            self.start_io_loop()
+            return
+
+        self.data_manager = DataManager()
+        if config['replay']:
+            from replay import ReplayEngine
+            # Com GUI a reprodução fica aberta no fim para permitir busca
+            self.replay = ReplayEngine(config['replay'], self.data_manager, speed=config['speed'] or None,
+                                       stay_open=not config['headless'])
+            self.replay.start()
+            self.robots[os.path.basename(config['replay'])] = self.data_manager
+            return
 
-    # Configurações da porta serial
-    serial_port = 'COM23'  # Substitua pela sua porta serial
-    baud_rate = 921600      # Substitua pelo baud rate correto
+        # Pipeline leitura → parse/odometria → publicação
+        self.pipeline = Pipeline(self.data_manager, raw_maxsize=8192, raw_policy=config['raw_policy'])
+        if config['record']:
+            from recorder import SessionRecorder
+            self.recorder = SessionRecorder(config['record'],
+                                            self.pipeline.tap('recorder', maxsize=65536, policy='drop_oldest'))
+            self.recorder.start()
+        self.pipeline.start()
 
-    # Iniciar o SerialReader
-    serial_reader = SerialReader(serial_port, baud_rate, data_manager)
-    serial_reader.daemon = True
-    serial_reader.start()
+        from serial_reader import SerialReader
+        self.serial_reader = SerialReader(config['port'], config['baud'], self.data_manager, pipeline=self.pipeline)
+        self.serial_reader.daemon = True
+        self.serial_reader.start()
+        self.robots[config['port']] = self.data_manager
+
+    def start_io_loop(self):
+        """Todas as portas em uma thread, com um DataManager por robô"""
+        from io_loop import IOLoop
+        if self.config['record']:
+            print("Gravação não suportada com vários robôs; use uma instância por porta para gravar.")
+        self.io_loop = IOLoop()
+        self.io_loop.start()
+        for name, port in self.config['robots'].items():
+            self.io_loop.add_port(name, port, self.config['baud'])
+        self.robots = self.io_loop.robots
+        # Robô mostrado inicialmente nas tabelas (vazio se nenhuma porta abriu)
+        self.data_manager = next(iter(self.robots.values()), None) or DataManager(history_capacity=0)
+
+    def start_fanout(self):
+        """Servidor local que repassa os quadros de todos os robôs a outros processos"""
+        if not self.config['fanout']:
+            return
+        from fanout_server import FanoutServer
+        self.fanout = FanoutServer(self.config['fanout'], self.robots)
+        self.fanout.open()
+        self.fanout.start()
+
+    def start_shm(self):
+        """Um segmento de memória compartilhada por robô (NOME, ou NOME_robô com vários)"""
+        if not self.config['shm']:
+            return
+        from shm_publisher import SharedSnapshotPublisher, segment_name
+        several = len(self.robots) > 1 or bool(self.io_loop)
+        for name, data_manager in self.robots.items():
+            segment = segment_name(self.config['shm'], name if several else None)
+            publisher = SharedSnapshotPublisher(segment, data_manager.output_fields(),
+                                                capacity=self.config['shm_capacity'], robot=name)
+            publisher.attach(data_manager)
+            self.shm_publishers.append(publisher)
+            print(f"Snapshot compartilhado do robô {name} em {segment}")
+
+    def start_profile(self):
+        """Perfil de velocidade da configuração, um fluxo por robô"""
+        if not self.config['profile'] or self.replay:
+            return
+        from scheduler import CommandScheduler, ProfileStream, load_profile
+        profile = load_profile(self.config['profile'])
+        if self.io_loop:
+            targets = {name: (lambda command, name=name: self.io_loop.send_command(name, command))
+                       for name in self.io_loop.sources}
+        else:
+            targets = {'perfil': self.serial_reader.send_command}
+        # Sem GUI o perfil é a única coisa com prazo: reduzir o intervalo de troca do GIL enquanto ele roda.
+        # Com a GUI o intervalo padrão fica (o loop do Tk também disputa o GIL)
+        self.scheduler = CommandScheduler(switch_interval=0.001 if self.config['headless'] else None)
+        self.scheduler.start()
+        # Primeiro envio depois de um instante, para a porta terminar de abrir
+        for name, send in targets.items():
+            self.scheduler.add_stream(ProfileStream(name, 1.0 / self.config['profile_rate'], send, profile,
+                                                    loop=self.config['profile_loop']), delay=0.5)
+
+    def finished(self):
+        """Verdadeiro quando não há mais dados a chegar (reprodução terminada ou serial caiu)"""
+        if self.replay:
+            return not self.replay.is_alive()
+        if self.io_loop:
+            return not self.io_loop.is_alive() or not self.io_loop.sources
+        return self.serial_reader is not None and not self.serial_reader.is_alive()
+
+    def status_line(self):
+        frames = metrics.counter('parse.frames')
+        line = f"quadros={frames.value} ({frames.rate(time.monotonic(), 10.0):.0f}/s)"
+        for name, data_manager in list(self.robots.items()):
+            snapshot = data_manager.get_snapshot()
+            line += (f" {name}: odom4=({snapshot.get('odom4_x', 0.0):.3f}, {snapshot.get('odom4_y', 0.0):.3f}, "
+                     f"{snapshot.get('odom4_th', 0.0):.3f})")
+        return line
+
+    def stop(self):
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.serial_reader:
+            self.serial_reader.stop()
+        if self.recorder:
+            self.recorder.stop()
+        if self.pipeline:
+            self.pipeline.stop()
+        if self.replay:
+            self.replay.stop()
+        if self.io_loop:
+            self.io_loop.stop()
+        if self.fanout:
+            self.fanout.stop()
+        for publisher in self.shm_publishers:
+            publisher.close()
+        if self.exporter:
+            self.exporter.stop()
+
+
+def run_headless(runtime):
+    """Espera até Ctrl+C, SIGTERM ou o fim dos dados, com um resumo periódico"""
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    interval = runtime.config['status_interval']
+    next_status = time.monotonic() + interval if interval else None
+    while not stop_event.is_set() and not runtime.finished():
+        stop_event.wait(0.2)
+        if next_status is not None and time.monotonic() >= next_status:
+            print(runtime.status_line())
+            next_status += interval
+    if runtime.replay:
+        print(f"Reprodução concluída: {runtime.status_line()}")
+
+
+def run_gui(runtime):
+    # Importado só aqui: o modo sem GUI não carrega tkinter
+    import tkinter as tk
+    from gui import GUI
+    root = tk.Tk()
+    gui = GUI(root, runtime.data_manager, runtime.serial_reader, replay=runtime.replay,
+              robots=runtime.robots, io_loop=runtime.io_loop,  # Passar serial_reader para a GUI
+              map_backend=runtime.config['map_backend'])
+    root.mainloop()
 
-    gui = GUI(root, data_manager, serial_reader)  # Passar serial_reader para a GUI
 
+def main(argv=None):
+    config = load_config(parse_args(argv))
+    runtime = Runtime(config)
     try:
-        root.mainloop()
+        runtime.start()
+        if config['headless']:
+            run_headless(runtime)
+        else:
+            run_gui(runtime)
     except KeyboardInterrupt:
         print("Encerrando o programa...")
     finally:
-        serial_reader.stop()
+        runtime.stop()
 
 if __name__ == '__main__':
     main()
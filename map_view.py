@@ -0,0 +1,425 @@
+# map_view.py
+
+import math
+from collections import deque
+
+# Trilhas do firmware desenhadas no Mapa 2D: (id, chave x, chave y, chave th, cor)
+MAP_TRACKS = [
+    ('robot1', 'odom_x2', 'odom_y2', 'odom_th2', 'blue'),
+    ('robot2', 'odom_x3', 'odom_y3', 'odom_th3', 'green'),
+]
+
+
+def map_tracks(estimators):
+    """Trilhas do firmware seguidas de uma por estimador (id = nome do estimador)"""
+    return MAP_TRACKS + [(estimator.name, *estimator.outputs, estimator.color) for estimator in estimators]
+
+
+# Níveis de detalhe dos rastros: (idade máxima em s, tolerância em m, máximo de pontos)
+# O primeiro nível guarda os pontos recentes sem simplificação; cada nível passa
+# para o seguinte os pontos que envelhecem, simplificados com tolerância maior.
+# O último nível guarda o resto da sessão e dobra a tolerância quando enche.
+DEFAULT_TRACE_LEVELS = [
+    (60.0, 0.0, None),
+    (600.0, 0.05, None),
+    (3600.0, 0.2, None),
+    (None, 0.5, 20000),
+]
+
+
+class TraceLevel:
+    """Um nível de detalhe do rastro, desenhado em blocos de linhas do Canvas.
+
+    Os pontos ficam em blocos de até chunk_size pontos, cada bloco é uma linha do
+    Canvas. Um ponto novo só atualiza o último bloco e os blocos expirados são
+    removidos inteiros pela esquerda, então o custo por ponto não depende do
+    tamanho do rastro. Blocos vizinhos compartilham o ponto da junção.
+
+    Com tolerância > 0 o nível simplifica por distância/ângulo: o último ponto é
+    sempre o mais recente recebido e só vira vértice fixo quando se afasta mais
+    que a tolerância do vértice anterior ou quando há uma curva.
+    """
+
+    def __init__(self, trace, max_age, tolerance=0.0, max_points=None, angle_tolerance=0.35):
+        self.trace = trace
+        self.max_age = max_age
+        self.tolerance = tolerance
+        self.max_points = max_points
+        self.angle_tolerance = angle_tolerance
+        self.chunks = deque()  # [id da linha ou None, lista de (t, x, y)]
+        self.point_count = 0
+
+    def add(self, t, x, y):
+        if self.chunks:
+            chunk = self.chunks[-1]
+            points = chunk[1]
+            last = points[-1]
+            if last[1] == x and last[2] == y:
+                # Robô parado: só renovar o tempo do último ponto
+                points[-1] = (t, x, y)
+                return
+            if self.tolerance and len(points) >= 2 and not self._is_vertex(points[-2], last, x, y):
+                # O último ponto não é significativo: substituí-lo pelo novo
+                points[-1] = (t, x, y)
+                self.draw_chunk(chunk)
+                return
+            if len(points) >= self.trace.chunk_size:
+                chunk = [None, [last]]
+                self.chunks.append(chunk)
+                points = chunk[1]
+        else:
+            chunk = [None, []]
+            self.chunks.append(chunk)
+            points = chunk[1]
+        points.append((t, x, y))
+        self.point_count += 1
+        self.draw_chunk(chunk)
+        if self.max_points and self.point_count > self.max_points:
+            self.coarsen()
+
+    def _is_vertex(self, anchor, tail, x, y):
+        dx1, dy1 = tail[1] - anchor[1], tail[2] - anchor[2]
+        distance = math.hypot(dx1, dy1)
+        if distance >= self.tolerance:
+            return True
+        if distance < self.tolerance / 4:
+            return False
+        # Curva acentuada em tail: manter o vértice mesmo abaixo da tolerância
+        turn = math.atan2(y - tail[2], x - tail[1]) - math.atan2(dy1, dx1)
+        turn = abs((turn + math.pi) % (2 * math.pi) - math.pi)
+        return turn > self.angle_tolerance
+
+    def pop_expired(self, cutoff):
+        """Remover e retornar os pontos com t < cutoff, em ordem.
+
+        O último ponto expirado continua no nível para o rastro não ter lacuna,
+        e também é retornado para que o próximo nível termine nele.
+        """
+        expired = []
+        chunks = self.chunks
+        while chunks and chunks[0][1][-1][0] < cutoff:
+            item, points = chunks.popleft()
+            if item is not None:
+                self.trace.canvas.delete(item)
+            expired.extend(points)
+            self.point_count -= len(points) - 1
+        if chunks and chunks[0][1][0][0] < cutoff:
+            first = chunks[0]
+            points = first[1]
+            count = 0
+            while points[count][0] < cutoff:
+                count += 1
+            expired.extend(points[:count])
+            if count > 1:
+                del points[:count - 1]
+                self.point_count -= count - 1
+                self.draw_chunk(first)
+        return expired
+
+    def coarsen(self):
+        # Dobrar a tolerância e simplificar de novo todos os pontos do nível
+        points = [p for chunk in self.chunks for p in chunk[1]]
+        self.clear()
+        self.tolerance = self.tolerance * 2 if self.tolerance else self.trace.min_tolerance
+        for t, x, y in points:
+            self.add(t, x, y)
+
+    def draw_chunk(self, chunk):
+        points = chunk[1]
+        coords = self.trace.project(points) if len(points) >= 2 else []
+        canvas = self.trace.canvas
+        if len(coords) < 4:
+            if chunk[0] is not None:
+                canvas.delete(chunk[0])
+                chunk[0] = None
+            return
+        if chunk[0] is None:
+            chunk[0] = canvas.create_line(coords, fill=self.trace.color, width=self.trace.width,
+                                          tags=('trace', self.trace.tag))
+        else:
+            canvas.coords(chunk[0], coords)
+
+    def redraw(self):
+        for chunk in self.chunks:
+            self.draw_chunk(chunk)
+
+    def clear(self):
+        canvas = self.trace.canvas
+        for item, _ in self.chunks:
+            if item is not None:
+                canvas.delete(item)
+        self.chunks.clear()
+        self.point_count = 0
+
+    def __len__(self):
+        return sum(len(chunk[1]) for chunk in self.chunks)
+
+
+class Trace:
+    """Rastro multirresolução em coordenadas do mundo, para a sessão inteira.
+
+    Pontos recentes ficam em resolução total; os mais antigos descem para níveis
+    cada vez mais simplificados. Ao desenhar, vértices a menos de min_pixels do
+    anterior na tela são omitidos, então só se desenha o que o zoom atual mostra.
+    Os blocos dos níveis antigos só são redesenhados quando a vista muda.
+    """
+
+    def __init__(self, canvas, tag, color, to_canvas, levels=DEFAULT_TRACE_LEVELS,
+                 chunk_size=64, width=2, min_pixels=1.5, min_tolerance=0.01):
+        self.canvas = canvas
+        self.tag = tag
+        self.color = color
+        self.to_canvas = to_canvas  # Função (x, y) do mundo -> (x, y) do Canvas
+        self.chunk_size = chunk_size
+        self.width = width
+        self.min_pixels = min_pixels
+        self.min_tolerance = min_tolerance
+        self.levels = [TraceLevel(self, max_age, tolerance, max_points)
+                       for max_age, tolerance, max_points in levels]
+
+    def add_point(self, t, x, y):
+        self.levels[0].add(t, x, y)
+
+    def evict(self, now):
+        """Passar os pontos envelhecidos de cada nível para o nível seguinte"""
+        levels = self.levels
+        for i, level in enumerate(levels):
+            if level.max_age is None:
+                break
+            expired = level.pop_expired(now - level.max_age)
+            if not expired or i + 1 >= len(levels):
+                continue
+            add = levels[i + 1].add
+            for t, x, y in expired:
+                add(t, x, y)
+
+    def project(self, points):
+        """Coordenadas do Canvas dos pontos, omitindo vértices menores que um pixel"""
+        to_canvas = self.to_canvas
+        min_sq = self.min_pixels * self.min_pixels
+        coords = []
+        last_x = last_y = None
+        last_index = len(points) - 1
+        for i, (_, x, y) in enumerate(points):
+            cx, cy = to_canvas(x, y)
+            if last_x is not None and i != last_index:
+                dx = cx - last_x
+                dy = cy - last_y
+                if dx * dx + dy * dy < min_sq:
+                    continue
+            coords.append(cx)
+            coords.append(cy)
+            last_x, last_y = cx, cy
+        return coords
+
+    def redraw(self):
+        """Recalcular as coordenadas de todos os blocos (ex.: após redimensionar ou zoom)"""
+        for level in self.levels:
+            level.redraw()
+
+    def clear(self):
+        for level in self.levels:
+            level.clear()
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def vertex_count(self):
+        """Número de vértices atualmente enviados ao Canvas"""
+        return sum(len(self.canvas.coords(chunk[0])) // 2
+                   for level in self.levels for chunk in level.chunks if chunk[0] is not None)
+
+
+class RobotMarker:
+    """Triângulo do robô (com um rótulo opcional); criado uma vez e movido com coords()"""
+
+    def __init__(self, canvas, tag, color, to_canvas, size=20, label=None):
+        self.canvas = canvas
+        self.tag = tag
+        self.color = color
+        self.to_canvas = to_canvas
+        self.size = size
+        self.label = label
+        self.item = None
+        self.label_item = None
+        self.pose = (0.0, 0.0, 0.0)
+
+    def move(self, x, y, th):
+        self.pose = (x, y, th)
+        cx, cy = self.to_canvas(x, y)
+        size = self.size
+        # O eixo Y do Canvas é invertido, então o ângulo também
+        points = [
+            cx + size * math.cos(th), cy - size * math.sin(th),  # Ponta do triângulo
+            cx + size * math.cos(th + 2 * math.pi / 3), cy - size * math.sin(th + 2 * math.pi / 3),
+            cx + size * math.cos(th + 4 * math.pi / 3), cy - size * math.sin(th + 4 * math.pi / 3),
+        ]
+        if self.item is None:
+            self.item = self.canvas.create_polygon(points, fill=self.color, tags=('robot', self.tag))
+            if self.label:
+                self.label_item = self.canvas.create_text(cx + size, cy - size, text=self.label, anchor='sw',
+                                                          fill=self.color, tags=('robot', self.tag))
+        else:
+            self.canvas.coords(self.item, points)
+            if self.label_item is not None:
+                self.canvas.coords(self.label_item, cx + size, cy - size)
+
+    def redraw(self):
+        if self.item is not None:
+            self.move(*self.pose)
+
+
+def nice_step(raw):
+    """Menor passo 1, 2 ou 5 x 10^k maior ou igual a raw"""
+    exponent = math.floor(math.log10(raw))
+    base = 10 ** exponent
+    for multiple in (1, 2, 5, 10):
+        if multiple * base >= raw:
+            return multiple * base
+    return 10 * base
+
+
+class MapView:
+    """Transformação mundo -> Canvas (escala e centro) com zoom, arrasto e seguir robô.
+
+    Itens com a tag 'trace' são transformados em bloco com canvas.move()/scale(),
+    sem recriação. A camada de eixos/grade ('axes') é desenhada cobrindo uma área
+    maior que a visível e só é refeita no zoom ou quando o arrasto sai dessa área.
+    """
+
+    def __init__(self, canvas, scale=10.0, min_scale=0.05, max_scale=5000.0, on_change=None):
+        self.canvas = canvas
+        self.scale = scale  # pixels por metro
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.center_x = 0.0  # Ponto do mundo no centro do Canvas
+        self.center_y = 0.0
+        self.width = max(canvas.winfo_width(), 1)
+        self.height = max(canvas.winfo_height(), 1)
+        self.grid_bounds = None
+        self.on_change = on_change  # Chamado com zoomed=True/False após mudar a vista
+
+    @property
+    def offset_x(self):
+        return self.width / 2 - self.center_x * self.scale
+
+    @property
+    def offset_y(self):
+        return self.height / 2 + self.center_y * self.scale
+
+    def world_to_canvas(self, x, y):
+        # Eixo Y do Canvas invertido
+        return x * self.scale + self.offset_x, -y * self.scale + self.offset_y
+
+    def canvas_to_world(self, cx, cy):
+        return (cx - self.offset_x) / self.scale, (self.offset_y - cy) / self.scale
+
+    def visible_bounds(self):
+        half_w = self.width / 2 / self.scale
+        half_h = self.height / 2 / self.scale
+        return (self.center_x - half_w, self.center_y - half_h,
+                self.center_x + half_w, self.center_y + half_h)
+
+    def resize(self, width, height):
+        # O centro do mundo continua no centro do Canvas
+        dx = (width - self.width) / 2
+        dy = (height - self.height) / 2
+        self.width = max(width, 1)
+        self.height = max(height, 1)
+        self._shift(dx, dy)
+        self.draw_grid()
+        self._changed(False)
+
+    def pan(self, dx, dy):
+        """Arrastar a vista dx, dy pixels"""
+        if not dx and not dy:
+            return
+        self.center_x -= dx / self.scale
+        self.center_y += dy / self.scale
+        self._shift(dx, dy)
+        if not self._grid_covers_view():
+            self.draw_grid()
+        self._changed(False)
+
+    def center_on(self, x, y):
+        self.pan((self.center_x - x) * self.scale, (y - self.center_y) * self.scale)
+
+    def zoom(self, factor, cx=None, cy=None):
+        """Zoom em torno do ponto (cx, cy) do Canvas, que fica fixo na tela"""
+        if cx is None:
+            cx, cy = self.width / 2, self.height / 2
+        new_scale = min(max(self.scale * factor, self.min_scale), self.max_scale)
+        factor = new_scale / self.scale
+        if factor == 1:
+            return
+        wx, wy = self.canvas_to_world(cx, cy)
+        self.scale = new_scale
+        self.center_x = wx - (cx - self.width / 2) / new_scale
+        self.center_y = wy + (cy - self.height / 2) / new_scale
+        self.canvas.scale('trace', cx, cy, factor, factor)
+        self.draw_grid()
+        self._changed(True)
+
+    def reset(self, scale=10.0):
+        self.scale = scale
+        self.center_x = self.center_y = 0.0
+        self.draw_grid()
+        self._changed(True)
+
+    def _shift(self, dx, dy):
+        self.canvas.move('trace', dx, dy)
+        self.canvas.move('axes', dx, dy)
+
+    def _changed(self, zoomed):
+        if self.on_change is not None:
+            self.on_change(zoomed)
+
+    def _grid_covers_view(self):
+        if self.grid_bounds is None:
+            return False
+        x0, y0, x1, y1 = self.visible_bounds()
+        gx0, gy0, gx1, gy1 = self.grid_bounds
+        return gx0 <= x0 and gy0 <= y0 and x1 <= gx1 and y1 <= gy1
+
+    def draw_grid(self):
+        """Redesenhar eixos, grade e marcações cobrindo três vezes a área visível"""
+        canvas = self.canvas
+        canvas.delete('axes')
+        axis_color = '#FFFFFF'
+        grid_color = '#3A3A3A'
+        tick_color = '#AAAAAA'
+        text_color = '#FFFFFF'
+        font = ('Arial', 8)
+
+        step = nice_step(80 / self.scale)  # Marcações a cada ~80 pixels
+        x0, y0, x1, y1 = self.visible_bounds()
+        span_x, span_y = x1 - x0, y1 - y0
+        x0 = math.floor((x0 - span_x) / step) * step
+        x1 = math.ceil((x1 + span_x) / step) * step
+        y0 = math.floor((y0 - span_y) / step) * step
+        y1 = math.ceil((y1 + span_y) / step) * step
+        self.grid_bounds = (x0, y0, x1, y1)
+
+        left, top = self.world_to_canvas(x0, y1)
+        right, bottom = self.world_to_canvas(x1, y0)
+        origin_x, origin_y = self.world_to_canvas(0.0, 0.0)
+
+        for i in range(round(x0 / step), round(x1 / step) + 1):
+            value = i * step
+            x, _ = self.world_to_canvas(value, 0.0)
+            canvas.create_line(x, top, x, bottom, fill=grid_color, tags='axes')
+            canvas.create_line(x, origin_y - 5, x, origin_y + 5, fill=tick_color, tags='axes')
+            if i != 0:  # Evitar duplicar o zero
+                canvas.create_text(x, origin_y + 15, text=f"{value:g}", fill=text_color, font=font, tags='axes')
+        for i in range(round(y0 / step), round(y1 / step) + 1):
+            value = i * step
+            _, y = self.world_to_canvas(0.0, value)
+            canvas.create_line(left, y, right, y, fill=grid_color, tags='axes')
+            canvas.create_line(origin_x - 5, y, origin_x + 5, y, fill=tick_color, tags='axes')
+            if i != 0:
+                canvas.create_text(origin_x + 15, y, text=f"{value:g}", fill=text_color, font=font, tags='axes')
+
+        # Eixos X e Y
+        canvas.create_line(left, origin_y, right, origin_y, fill=axis_color, tags='axes')
+        canvas.create_line(origin_x, top, origin_x, bottom, fill=axis_color, tags='axes')
+        canvas.tag_lower('axes')
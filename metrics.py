@@ -0,0 +1,237 @@
+# metrics.py
+
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos buckets dos histogramas de tempo: 1 µs a ~16 s em potências de 2
+DEFAULT_TIME_BOUNDS = tuple(1e-6 * 2 ** k for k in range(25))
+
+
+class Counter:
+    """Contador monotônico; incrementado sem lock pela thread dona.
+
+    Vários leitores (GUI, exportador, linha de status) chamam rate() ao mesmo
+    tempo; as amostras da taxa são protegidas por um lock só dos leitores.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self.samples = deque()  # (tempo, valor) para cálculo da taxa
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def rate(self, now, window=5.0):
+        """Taxa por segundo na janela recente, amostrada a cada leitura"""
+        with self.lock:
+            value = self.value
+            samples = self.samples
+            # Um leitor atrasado (now anterior à última amostra) não reordena a janela
+            if not samples or now >= samples[-1][0]:
+                samples.append((now, value))
+            while len(samples) > 2 and now - samples[0][0] > window:
+                samples.popleft()
+            t0, v0 = samples[0]
+        if now - t0 <= 0:
+            return 0.0
+        return (value - v0) / (now - t0)
+
+
+class Histogram:
+    """Histograma de buckets fixos com contagem, soma, mínimo e máximo"""
+
+    def __init__(self, name, bounds=DEFAULT_TIME_BOUNDS):
+        self.name = name
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Estimativa do percentil q (0-100) pelo limite superior do bucket"""
+        if not self.count:
+            return None
+        target = self.count * q / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    """Registro de contadores, histogramas e medidores (gauges) por nome"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def counter(self, name):
+        counter = self.counters.get(name)
+        if counter is None:
+            with self.lock:
+                counter = self.counters.setdefault(name, Counter(name))
+        return counter
+
+    def histogram(self, name, bounds=DEFAULT_TIME_BOUNDS):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram(name, bounds))
+        return histogram
+
+    def gauge(self, name, function):
+        """Registra uma função lida a cada snapshot (ex.: profundidade de fila)"""
+        with self.lock:
+            self.gauges[name] = function
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            counters = list(self.counters.values())
+            histograms = list(self.histograms.values())
+            gauges = list(self.gauges.items())
+        result = {
+            'timestamp': time.time(),
+            'counters': {c.name: {'value': c.value, 'rate': c.rate(now)} for c in counters},
+            'histograms': {h.name: h.snapshot() for h in histograms},
+            'gauges': {},
+        }
+        for name, function in gauges:
+            try:
+                result['gauges'][name] = function()
+            except Exception as e:
+                result['gauges'][name] = f"erro: {e}"
+        return result
+
+
+# Registro global usado pelos caminhos críticos
+metrics = MetricsRegistry()
+
+
+class DebugLog:
+    """Log de depuração opcional e limitado em mensagens por segundo"""
+
+    def __init__(self, enabled=False, max_per_second=20):
+        self.enabled = enabled
+        self.max_per_second = max_per_second
+        self.window_start = 0.0
+        self.window_count = 0
+        self.suppressed = 0
+
+    def _allow(self):
+        now = time.monotonic()
+        if now - self.window_start >= 1.0:
+            if self.suppressed:
+                print(f"[debug] {self.suppressed} mensagens suprimidas")
+            self.window_start = now
+            self.window_count = 0
+            self.suppressed = 0
+        if self.window_count >= self.max_per_second:
+            self.suppressed += 1
+            return False
+        self.window_count += 1
+        return True
+
+    def log(self, message):
+        """Mensagem por quadro; só aparece com o log de depuração ativado"""
+        if self.enabled and self._allow():
+            print(message)
+
+    def warn(self, message):
+        """Aviso sempre exibido, mas limitado para não inundar o console"""
+        if self._allow():
+            print(message)
+
+
+debug_log = DebugLog()
+
+
+class MetricsExporter(threading.Thread):
+    """Expõe as métricas sem GUI: arquivo JSON periódico e/ou HTTP local em /metrics"""
+
+    def __init__(self, registry=metrics, path=None, port=None, interval=1.0, host='127.0.0.1'):
+        super().__init__(name='MetricsExporter', daemon=True)
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.server = None
+        if port is not None:
+            self.server = ThreadingHTTPServer((host, port), self._make_handler())
+            self.server.daemon_threads = True
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(registry.snapshot()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def run(self):
+        if self.server is not None:
+            threading.Thread(target=self.server.serve_forever, name='MetricsHTTP', daemon=True).start()
+            print(f"Métricas disponíveis em http://{self.server.server_address[0]}:{self.server.server_address[1]}/metrics")
+        while not self.stop_event.wait(self.interval):
+            if self.path:
+                self.write_file()
+
+    def write_file(self):
+        # Escrita atômica para que leitores nunca vejam um JSON pela metade
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.registry.snapshot(), f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Erro ao gravar métricas em {self.path}: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,186 @@
+# pipeline.py
+
+import threading
+import time
+import traceback
+from collections import deque
+from metrics import metrics, debug_log
+
+
+class BoundedQueue:
+    """Fila limitada entre estágios, com política de contrapressão configurável.
+
+    Políticas:
+      'block'       - o produtor espera até haver espaço (nada é perdido)
+      'drop_oldest' - com a fila cheia, descarta o item mais antigo
+      'decimate'    - acima da metade da capacidade aceita só 1 a cada `decimate`
+                      itens; com a fila cheia, descarta o mais antigo
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'decimate')
+
+    def __init__(self, name, maxsize=1024, policy='block', decimate=10):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de fila desconhecida: {policy}")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.decimate = max(1, decimate)
+        self.items = deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.closed = False
+        self.accepted = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._decimate_counter = 0
+
+    def put(self, item, timeout=None):
+        self.put_many((item,), timeout)
+
+    def put_many(self, items, timeout=None):
+        """Insere vários itens com uma única aquisição do lock"""
+        with self.lock:
+            for item in items:
+                self._put(item, timeout)
+            depth = len(self.items)
+            if depth > self.max_depth:
+                self.max_depth = depth
+            self.not_empty.notify()
+
+    def _put(self, item, timeout):
+        queue = self.items
+        if self.policy == 'decimate' and len(queue) >= self.maxsize // 2:
+            self._decimate_counter += 1
+            if self._decimate_counter % self.decimate:
+                self.dropped += 1
+                return
+        if len(queue) >= self.maxsize:
+            if self.policy == 'block':
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while len(queue) >= self.maxsize and not self.closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.not_empty.notify()
+                    self.not_full.wait(remaining)
+                if len(queue) >= self.maxsize or self.closed:
+                    self.dropped += 1
+                    return
+            else:
+                queue.popleft()
+                self.dropped += 1
+        queue.append(item)
+        self.accepted += 1
+
+    def get_batch(self, max_items=256, timeout=None):
+        """Retira até max_items itens; retorna lista vazia no timeout ou se fechada"""
+        with self.lock:
+            if not self.items and not self.closed:
+                self.not_empty.wait(timeout)
+            queue = self.items
+            count = min(len(queue), max_items)
+            batch = [queue.popleft() for _ in range(count)]
+            if count:
+                self.not_full.notify_all()
+            return batch
+
+    def depth(self):
+        return len(self.items)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def stats(self):
+        return {
+            'depth': len(self.items),
+            'max_depth': self.max_depth,
+            'capacity': self.maxsize,
+            'policy': self.policy,
+            'accepted': self.accepted,
+            'dropped': self.dropped,
+        }
+
+
+class Pipeline:
+    """Estágios leitura → parse/odometria → publicação ligados por filas limitadas.
+
+    O leitor serial só chama submit() com os quadros brutos. Uma thread de
+    trabalho faz o parse e a odometria no DataManager e repassa os dados
+    processados para os assinantes. Derivações ('taps') recebem os quadros brutos
+    antes do parse, por exemplo para gravar tudo mesmo quando a exibição é dizimada.
+    """
+
+    def __init__(self, data_manager, raw_maxsize=8192, raw_policy='block', batch_size=256):
+        self.data_manager = data_manager
+        self.raw_queue = BoundedQueue('raw', raw_maxsize, raw_policy)
+        self.batch_size = batch_size
+        self.taps = []
+        self.subscribers = []
+        self.stop_event = threading.Event()
+        self.worker = threading.Thread(target=self.run_parser, name='PipelineParser', daemon=True)
+        self.register_gauge(self.raw_queue)
+
+    def tap(self, name, maxsize=8192, policy='drop_oldest', decimate=10):
+        """Fila que recebe todos os quadros brutos (timestamp, linha) antes do parse"""
+        queue = BoundedQueue(name, maxsize, policy, decimate)
+        self.taps.append(queue)
+        self.register_gauge(queue)
+        return queue
+
+    def subscribe(self, name, maxsize=256, policy='decimate', decimate=10):
+        """Fila que recebe os dicionários de dados já processados"""
+        queue = BoundedQueue(name, maxsize, policy, decimate)
+        self.subscribers.append(queue)
+        self.register_gauge(queue)
+        return queue
+
+    def register_gauge(self, queue):
+        metrics.gauge(f'pipeline.{queue.name}', queue.stats)
+
+    def start(self):
+        self.worker.start()
+
+    def submit(self, frames, timestamp=None):
+        """Chamado pelo leitor com um lote de quadros brutos"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        items = [(timestamp, frame) for frame in frames]
+        for queue in self.taps:
+            queue.put_many(items, timeout=0)
+        self.raw_queue.put_many(items)
+
+    def run_parser(self):
+        while not self.stop_event.is_set():
+            batch = self.raw_queue.get_batch(self.batch_size, timeout=0.5)
+            if not batch:
+                continue
+            try:
+                lines = [frame for _, frame in batch]
+                if debug_log.enabled:
+                    for line in lines:
+                        debug_log.log(f"Linha recebida: {line}")
+                results = self.data_manager.process_lines(lines)
+                if results:
+                    for queue in self.subscribers:
+                        queue.put_many(results)
+            except Exception:
+                print("Erro no estágio de processamento do pipeline:")
+                traceback.print_exc()
+
+    def stop(self):
+        self.stop_event.set()
+        self.raw_queue.close()
+        for queue in self.taps + self.subscribers:
+            queue.close()
+
+    def stats(self):
+        """Profundidade e descartes de cada fila do pipeline"""
+        stats = {'raw': self.raw_queue.stats()}
+        for queue in self.taps + self.subscribers:
+            stats[queue.name] = queue.stats()
+        return stats
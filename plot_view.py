@@ -0,0 +1,386 @@
+# plot_view.py
+
+import math
+import threading
+from array import array
+from collections import deque
+from operator import itemgetter
+
+# Janelas de tempo do gráfico: rótulo -> segundos
+PLOT_WINDOWS = {
+    '10 s': 10.0,
+    '1 min': 60.0,
+    '10 min': 600.0,
+    '1 h': 3600.0,
+    '4 h': 4 * 3600.0,
+}
+
+# Campos mostrados ao abrir a aba
+DEFAULT_PLOT_FIELDS = ['BMS_Current_mA', 'leftSpeed_act', 'rightSpeed_act']
+
+PLOT_COLORS = ['#4FC3F7', '#AED581', '#FFB74D', '#E57373', '#BA68C8', '#4DB6AC', '#FFF176', '#90A4AE']
+
+
+class PlotHistory:
+    """Mínimo, máximo e último valor de todos os campos numéricos em baldes de
+    bucket_seconds, pela duração da maior janela do gráfico.
+
+    Atualizado na thread de processamento (listener do DataManager), com a aba
+    visível ou não, então janelas maiores que o histórico bruto do DataManager
+    (TelemetryStore, alguns minutos) continuam completas. Os baldes fechados
+    ficam num anel de arrays 'f' (um registro com todos os campos por balde); o
+    balde aberto é trocado inteiro a cada lote, sem lock para o leitor.
+    """
+
+    def __init__(self, fields, bucket_seconds=1.0, duration=max(PLOT_WINDOWS.values())):
+        self.names = [name for name, kind in fields if kind in ('int', 'float')]
+        self.columns = {name: j for j, name in enumerate(self.names)}
+        self.getter = itemgetter(*self.names) if len(self.names) > 1 else None
+        self.bucket_seconds = bucket_seconds
+        self.capacity = int(duration / bucket_seconds) + 1
+        size = self.capacity * len(self.names)
+        self.indexes = array('q', bytes(8 * self.capacity))
+        self.mins = array('f', bytes(4 * size))
+        self.maxs = array('f', bytes(4 * size))
+        self.lasts = array('f', bytes(4 * size))
+        self.count = 0  # Baldes fechados já gravados no anel
+        self.current = None  # Balde aberto: (índice, mínimos, máximos, últimos)
+        self.last_timestamp = None  # Timestamp do último quadro incluído
+        self.lock = threading.Lock()
+
+    def attach(self, data_manager):
+        data_manager.listeners.append(self.publish)
+
+    def values(self, data):
+        if self.getter is not None:
+            try:
+                return self.getter(data)
+            except KeyError:
+                pass
+        # Campos ausentes (outro layout do protocolo) viram 0
+        return [data.get(name) or 0 for name in self.names]
+
+    def publish(self, snapshots, lines=None):
+        if not snapshots:
+            return
+        bucket_seconds = self.bucket_seconds
+        current = self.current
+        rows = []
+        rows_index = None
+        for snapshot in snapshots:
+            index = math.floor(snapshot.timestamp / bucket_seconds)
+            if index != rows_index:
+                if rows:
+                    current = self._merge(current, rows_index, rows)
+                rows = []
+                rows_index = index
+            rows.append(self.values(snapshot.data))
+        current = self._merge(current, rows_index, rows)
+        # O leitor lê last_timestamp antes do balde: no pior caso vê quadros repetidos, nunca a menos
+        self.current = current
+        self.last_timestamp = snapshots[-1].timestamp
+
+    def _merge(self, current, index, rows):
+        # Mínimo e máximo de cada coluna do grupo em C (map sobre as colunas), já em arrays 'f'
+        columns = list(zip(*rows))
+        try:
+            mins = array('f', map(min, columns))
+            maxs = array('f', map(max, columns))
+            lasts = array('f', rows[-1])
+        except (TypeError, ValueError, OverflowError):
+            # Valor fora do tipo declarado (texto, None, inteiro enorme): tratar como número ou 0
+            columns = [[as_number(value) for value in column] for column in columns]
+            mins = array('f', map(min, columns))
+            maxs = array('f', map(max, columns))
+            lasts = array('f', (column[-1] for column in columns))
+        if current is not None:
+            if current[0] == index:
+                return index, array('f', map(min, current[1], mins)), array('f', map(max, current[2], maxs)), lasts
+            self._close(current)
+        return index, mins, maxs, lasts
+
+    def _close(self, bucket):
+        index, mins, maxs, lasts = bucket
+        width = len(self.names)
+        with self.lock:
+            slot = self.count % self.capacity
+            start = slot * width
+            self.indexes[slot] = index
+            self.mins[start:start + width] = mins
+            self.maxs[start:start + width] = maxs
+            self.lasts[start:start + width] = lasts
+            self.count += 1
+
+    def buckets(self, name, t0):
+        """Baldes (instante inicial, mínimo, máximo, último) do campo a partir de t0, incluindo o aberto"""
+        column = self.columns.get(name)
+        if column is None:
+            return []
+        first = math.floor(t0 / self.bucket_seconds)
+        width = len(self.names)
+        current = self.current
+        result = []
+        with self.lock:
+            for n in range(max(0, self.count - self.capacity), self.count):
+                slot = n % self.capacity
+                index = self.indexes[slot]
+                if index >= first:
+                    k = slot * width + column
+                    result.append((index * self.bucket_seconds, self.mins[k], self.maxs[k], self.lasts[k]))
+        if current is not None and current[0] >= first and (not result or
+                                                             current[0] * self.bucket_seconds > result[-1][0]):
+            result.append((current[0] * self.bucket_seconds, current[1][column], current[2][column],
+                           current[3][column]))
+        return result
+
+
+def as_number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError, OverflowError):
+        return 0.0
+    return value if abs(value) < 3e38 else math.copysign(3e38, value)
+
+
+class BucketSeries:
+    """Mínimo e máximo de um campo por coluna de pixel do gráfico.
+
+    O tempo é dividido em baldes de bucket_seconds alinhados ao relógio (índice
+    = floor(t / bucket_seconds)), então amostras novas só atualizam o último
+    balde ou abrem um novo; baldes que saem da janela são removidos pela
+    esquerda. Cada balde é [índice, mínimo, máximo, último valor].
+    """
+
+    def __init__(self, name, bucket_seconds):
+        self.name = name
+        self.bucket_seconds = bucket_seconds
+        self.buckets = deque()
+
+    def extend(self, times, values):
+        buckets = self.buckets
+        bucket_seconds = self.bucket_seconds
+        last = buckets[-1] if buckets else None
+        for t, value in zip(times, values):
+            index = math.floor(t / bucket_seconds)
+            if last is not None and index <= last[0]:
+                if value < last[1]:
+                    last[1] = value
+                elif value > last[2]:
+                    last[2] = value
+                last[3] = value
+            else:
+                last = [index, value, value, value]
+                buckets.append(last)
+
+    def extend_buckets(self, buckets):
+        """Acrescenta baldes já agregados (PlotHistory.buckets), cada um no pixel do seu início"""
+        series = self.buckets
+        bucket_seconds = self.bucket_seconds
+        last = series[-1] if series else None
+        for t, minimum, maximum, value in buckets:
+            index = math.floor(t / bucket_seconds)
+            if last is not None and index <= last[0]:
+                last[1] = min(last[1], minimum)
+                last[2] = max(last[2], maximum)
+                last[3] = value
+            else:
+                last = [index, minimum, maximum, value]
+                series.append(last)
+
+    def evict(self, first_index):
+        buckets = self.buckets
+        while buckets and buckets[0][0] < first_index:
+            buckets.popleft()
+
+    def value_range(self):
+        if not self.buckets:
+            return None
+        return min(bucket[1] for bucket in self.buckets), max(bucket[2] for bucket in self.buckets)
+
+    def latest(self):
+        return self.buckets[-1][3] if self.buckets else None
+
+
+class PlotView:
+    """Gráficos de séries temporais no Canvas, um por campo, empilhados.
+
+    Lê o histórico colunar (TelemetryStore) de forma incremental: a cada
+    update() só as amostras novas entram nos baldes. O trecho da janela que o
+    TelemetryStore não cobre mais (janelas longas, ou a aba escondida por muito
+    tempo) vem dos baldes agregados do PlotHistory. O desenho usa uma linha
+    do Canvas por campo com dois vértices (mínimo e máximo) por coluna de
+    pixel, então o custo depende da largura do gráfico, não do número de
+    amostras na janela.
+    """
+
+    def __init__(self, canvas, store=None, fields=(), window=60.0, margin=70, history=None):
+        self.canvas = canvas
+        self.store = store
+        self.history = history  # PlotHistory do mesmo robô (opcional)
+        self.window = window
+        self.margin = margin  # Faixa à esquerda para os rótulos do eixo Y
+        self.width = 1
+        self.height = 1
+        self.fields = []
+        self.series = {}
+        self.items = {}  # Campo -> (linha, nome/valor, máximo, mínimo, separador)
+        self.next_index = 0  # Próximo índice lógico do histórico a ler
+        self.message_item = canvas.create_text(10, 10, anchor='nw', fill='white', text='')
+        self.time_items = (canvas.create_text(0, 0, anchor='sw', fill='gray', text=''),
+                           canvas.create_text(0, 0, anchor='se', fill='gray', text='agora'))
+        self.set_fields(fields)
+
+    @property
+    def plot_width(self):
+        return max(1, self.width - self.margin - 10)
+
+    def bucket_seconds(self):
+        # Uma coluna de pixel por balde
+        return self.window / self.plot_width
+
+    def set_store(self, store, history=None):
+        self.store = store
+        self.history = history
+        self.rebuild()
+
+    def set_fields(self, fields):
+        for name in list(self.items):
+            if name not in fields:
+                for item in self.items.pop(name):
+                    self.canvas.delete(item)
+        for name in fields:
+            if name not in self.items:
+                color = PLOT_COLORS[len(self.items) % len(PLOT_COLORS)]
+                canvas = self.canvas
+                self.items[name] = (
+                    canvas.create_line(0, 0, 0, 0, fill=color, width=1),
+                    canvas.create_text(0, 0, anchor='nw', fill=color, text=name),
+                    canvas.create_text(0, 0, anchor='ne', fill='gray', text=''),
+                    canvas.create_text(0, 0, anchor='se', fill='gray', text=''),
+                    canvas.create_line(0, 0, 0, 0, fill='#404040'),
+                )
+        self.fields = list(fields)
+        self.rebuild()
+
+    def set_window(self, seconds):
+        self.window = seconds
+        self.rebuild()
+
+    def resize(self, width, height):
+        width_changed = width != self.width
+        self.width, self.height = width, height
+        if width_changed:
+            # Outra largura muda a duração de cada balde
+            self.rebuild()
+        else:
+            self.redraw()
+
+    def rebuild(self):
+        """Refaz os baldes da janela inteira (nova janela, largura, campos ou robô)"""
+        bucket_seconds = self.bucket_seconds()
+        self.series = {name: BucketSeries(name, bucket_seconds) for name in self.fields}
+        self.next_index = 0
+        store = self.store
+        if store is not None and store.count:
+            start_time = store.timestamp_at(store.count - 1) - self.window
+            history = self.history
+            if history is not None and store.timestamp_at(store.first_index()) > start_time:
+                # O começo da janela já saiu do histórico bruto: usar os baldes agregados até
+                # onde eles vão e continuar com as amostras do histórico a partir daí
+                covered = history.last_timestamp
+                for name, series in self.series.items():
+                    series.extend_buckets(history.buckets(name, start_time))
+                if covered is not None:
+                    start_time = covered
+            self.next_index = store.index_at_time(start_time)
+        self.update(force=True)
+
+    def update(self, force=False):
+        """Acrescenta as amostras novas do histórico e redesenha se algo mudou"""
+        store = self.store
+        if store is None:
+            self.show_message("Sem histórico para este robô")
+            return
+        if store.count < self.next_index or self.next_index < store.first_index():
+            # Histórico limpo (reinício ou busca na reprodução) ou amostras perdidas com a aba escondida
+            self.rebuild()
+            return
+        start = max(self.next_index, store.first_index())
+        stop = store.count
+        if start >= stop and not force:
+            return
+        if start < stop:
+            times = store.view('timestamp', start, stop)
+            for name, series in self.series.items():
+                if name not in store.columns:
+                    continue
+                for time_segment, value_segment in zip(times, store.view(name, start, stop)):
+                    series.extend(time_segment, value_segment)
+            if not store.valid_from(start):
+                # O escritor sobrescreveu o trecho durante a leitura
+                self.rebuild()
+                return
+            self.next_index = stop
+            latest = store.timestamp_at(stop - 1)
+            first_bucket = math.floor((latest - self.window) / self.bucket_seconds())
+            for series in self.series.values():
+                series.evict(first_bucket)
+        self.redraw()
+
+    def show_message(self, text):
+        self.canvas.itemconfigure(self.message_item, text=text)
+
+    def redraw(self):
+        canvas = self.canvas
+        store = self.store
+        self.show_message('' if self.fields else "Selecione campos na lista")
+        if not self.fields or store is None or not store.count:
+            for items in self.items.values():
+                canvas.coords(items[0], -10, -10, -10, -10)
+            return
+        right = self.margin + self.plot_width
+        last_bucket = math.floor(store.timestamp_at(store.count - 1) / self.bucket_seconds())
+        lane_height = max(10, (self.height - 20) / len(self.fields))
+        for lane, name in enumerate(self.fields):
+            line, label, max_label, min_label, separator = self.items[name]
+            series = self.series[name]
+            top = lane * lane_height + 4
+            bottom = top + lane_height - 8
+            canvas.coords(separator, self.margin, top + lane_height - 4, right, top + lane_height - 4)
+            value_range = series.value_range()
+            if value_range is None:
+                canvas.coords(line, -10, -10, -10, -10)
+                canvas.itemconfigure(label, text=name)
+                continue
+            low, high = value_range
+            span = (high - low) or 1.0
+            scale = (bottom - top) / span
+            coords = []
+            for index, minimum, maximum, last in series.buckets:
+                x = right - (last_bucket - index)
+                y_min = bottom - (minimum - low) * scale
+                y_max = bottom - (maximum - low) * scale
+                # Terminar a coluna no lado do último valor, para a linha seguir o sinal
+                if last - minimum < maximum - last:
+                    coords += (x, y_max, x, y_min)
+                else:
+                    coords += (x, y_min, x, y_max)
+            if len(coords) < 4:
+                coords += coords
+            canvas.coords(line, coords)
+            canvas.coords(label, self.margin + 4, top)
+            canvas.itemconfigure(label, text=f"{name}: {series.latest():.4g}")
+            canvas.coords(max_label, self.margin - 4, top)
+            canvas.itemconfigure(max_label, text=f"{high:.4g}")
+            canvas.coords(min_label, self.margin - 4, bottom)
+            canvas.itemconfigure(min_label, text=f"{low:.4g}")
+        canvas.coords(self.time_items[0], self.margin, self.height - 2)
+        canvas.itemconfigure(self.time_items[0], text=f"-{format_window(self.window)}")
+        canvas.coords(self.time_items[1], right, self.height - 2)
+
+
+def format_window(seconds):
+    for label, value in PLOT_WINDOWS.items():
+        if value == seconds:
+            return label
+    return f"{seconds:g} s"
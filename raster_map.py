@@ -0,0 +1,420 @@
+# raster_map.py
+#
+# Alternativa ao desenho vetorial dos rastros do Mapa 2D (map_view.Trace):
+# os rastros são queimados numa imagem NumPy persistente, mostrada no Canvas
+# por um único PhotoImage. A cada atualização só os segmentos novos são
+# rasterizados e só o retângulo alterado é copiado para o PhotoImage, então o
+# custo não cresce com o comprimento dos rastros nem com o número de itens no
+# Canvas. Os marcadores dos robôs continuam sendo itens do Canvas, por cima.
+#
+# No arrasto e no modo seguir (mesma escala e tamanho) a imagem é deslocada
+# (shift): os pixels que continuam visíveis são copiados no lugar e só as
+# faixas novas das bordas são rasterizadas. Zoom e redimensionamento refazem
+# a imagem inteira (redraw), no máximo a cada 300 ms; enquanto isso ela é
+# deslocada junto com o arrasto e os pontos novos esperam o redraw.
+#
+# Para as faixas do shift não percorrerem o rastro inteiro, cada rastro tem um
+# índice espacial: ladrilhos de tile_size pixels (na escala da imagem atual)
+# com os segmentos que passam por eles, montado aos poucos e refeito no zoom.
+
+import tkinter as tk
+import numpy as np
+
+
+class RasterTrace:
+    """Pontos de um rastro em coordenadas do mundo, para a sessão inteira.
+
+    Mesma interface de map_view.Trace usada pela GUI. Os pontos ficam em arrays
+    que dobram de tamanho; ao passar de max_points, um a cada dois pontos é
+    descartado (o rastro inteiro perde resolução, como em TraceLevel.coarsen).
+    """
+
+    def __init__(self, raster, color, max_points=2_000_000):
+        self.raster = raster
+        self.color = color
+        self.rgb = raster.rgb(color)
+        self.max_points = max_points
+        self.xs = np.empty(1024)
+        self.ys = np.empty(1024)
+        self.count = 0
+        self.burned = 0  # Pontos já queimados na imagem
+        self.reset_index()
+
+    def add_point(self, t, x, y):
+        count = self.count
+        if count and self.xs[count - 1] == x and self.ys[count - 1] == y:
+            return  # Robô parado
+        if count == len(self.xs):
+            if count >= self.max_points:
+                self.coarsen()
+                count = self.count
+            else:
+                self.xs = np.concatenate((self.xs, np.empty(count)))
+                self.ys = np.concatenate((self.ys, np.empty(count)))
+        self.xs[count] = x
+        self.ys[count] = y
+        self.count = count + 1
+
+    def coarsen(self):
+        # Manter um a cada dois pontos, preservando o último; o que já está na
+        # imagem continua lá até o próximo redraw
+        keep = np.arange(self.count - 1, -1, -2)[::-1]
+        self.count = len(keep)
+        self.xs[:self.count] = self.xs[keep]
+        self.ys[:self.count] = self.ys[keep]
+        self.burned = self.count
+        self.reset_index()
+
+    def evict(self, now):
+        # Os pontos antigos não saem da imagem; a memória é limitada por max_points
+        pass
+
+    def pending(self):
+        """Pontos ainda não queimados, começando no último já queimado"""
+        start = max(self.burned - 1, 0)
+        return self.xs[start:self.count], self.ys[start:self.count]
+
+    def reset_index(self):
+        self.tiles = {}  # Ladrilho (tx, ty) -> arrays com os índices dos segmentos
+        self.long_segments = []  # Segmentos que cruzam ladrilhos demais: sempre testados
+        self.indexed = 0  # Segmentos já no índice (o segmento i liga os pontos i e i + 1)
+
+    def index_segments(self, scale, tile_size, max_tiles=64):
+        """Pôr no índice espacial os segmentos ainda fora dele"""
+        start, stop = self.indexed, self.count - 1
+        if stop <= start:
+            return
+        factor = scale / tile_size
+        tx = np.floor(self.xs[start:stop + 1] * factor).astype(np.intp)
+        ty = np.floor(self.ys[start:stop + 1] * -factor).astype(np.intp)
+        tx0, tx1 = np.minimum(tx[:-1], tx[1:]), np.maximum(tx[:-1], tx[1:])
+        ty0, ty1 = np.minimum(ty[:-1], ty[1:]), np.maximum(ty[:-1], ty[1:])
+        width, height = tx1 - tx0 + 1, ty1 - ty0 + 1
+        area = width * height
+        segments = np.arange(start, stop)
+        # Saltos longos cruzam ladrilhos demais: ficam de fora e são sempre testados
+        spread = area > max_tiles
+        if spread.any():
+            self.long_segments += segments[spread].tolist()
+            keep = ~spread
+            segments, tx0, ty0, width, area = segments[keep], tx0[keep], ty0[keep], width[keep], area[keep]
+        # Cada segmento vai para todos os ladrilhos da sua caixa (quase sempre um só)
+        first = np.cumsum(area) - area
+        owner = np.repeat(np.arange(len(segments)), area)
+        k = np.arange(len(owner)) - first[owner]
+        keys_x = tx0[owner] + k % width[owner]
+        keys_y = ty0[owner] + k // width[owner]
+        group = segments[owner]
+        if len(group):
+            base_y = keys_y.min()
+            order = np.argsort((keys_x - keys_x.min()) * (keys_y.max() - base_y + 1) + (keys_y - base_y), kind='stable')
+            keys_x, keys_y, group = keys_x[order], keys_y[order], group[order]
+            bounds = np.nonzero((keys_x[1:] != keys_x[:-1]) | (keys_y[1:] != keys_y[:-1]))[0] + 1
+            for begin, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(group)]))):
+                self.tiles.setdefault((int(keys_x[begin]), int(keys_y[begin])), []).append(group[begin:end])
+        self.indexed = stop
+
+    def segments_in_tiles(self, tx0, tx1, ty0, ty1):
+        """Índices (sem repetição) dos segmentos que podem cruzar os ladrilhos [tx0, tx1] x [ty0, ty1]"""
+        found = [np.array(self.long_segments, dtype=np.intp)]
+        for x in range(tx0, tx1 + 1):
+            for y in range(ty0, ty1 + 1):
+                parts = self.tiles.get((x, y))
+                if parts:
+                    if len(parts) > 1:
+                        # Juntar os pedaços acrescentados a cada atualização
+                        parts[:] = [np.concatenate(parts)]
+                    found.append(parts[0])
+        return np.unique(np.concatenate(found))
+
+    def redraw(self):
+        self.raster.redraw()
+
+    def clear(self):
+        self.count = self.burned = 0
+        self.reset_index()
+        self.raster.redraw()
+
+    def __len__(self):
+        return self.count
+
+    def vertex_count(self):
+        # Nada é enviado ao Canvas por ponto
+        return 0
+
+
+class RasterMap:
+    """Imagem RGB do tamanho do Canvas com os rastros de todos os robôs.
+
+    As alterações são anotadas por faixa horizontal de band_height pixels
+    (coluna mínima e máxima alterada em cada faixa); blit() copia um retângulo
+    por faixa alterada, em vez do retângulo que envolve tudo.
+    """
+
+    def __init__(self, canvas, map_view, background=None, line_width=2, band_height=32, tile_size=64):
+        self.canvas = canvas
+        self.map_view = map_view
+        self.background = self.rgb(background or canvas.cget('background'))
+        self.line_width = line_width
+        self.band_height = band_height
+        self.tile_size = tile_size  # Lado dos ladrilhos do índice espacial dos rastros (pixels)
+        self.traces = []
+        self.width = self.height = 0
+        self.scale = None  # Escala da vista na imagem atual
+        self.image = None
+        self.photo = None
+        self.spare = None  # Segundo PhotoImage: destino da cópia deslocada no shift
+        self.item = None
+        self.band_min = self.band_max = None  # Colunas alteradas por faixa desde a última cópia
+        self.redraw()
+
+    def rgb(self, color):
+        return tuple(value // 256 for value in self.canvas.winfo_rgb(color))
+
+    def trace(self, color, **options):
+        trace = RasterTrace(self, color, **options)
+        self.traces.append(trace)
+        return trace
+
+    def view_changed(self, zoomed=False):
+        """Acompanhar a vista; retorna True quando a imagem precisa ser refeita (redraw)"""
+        # Deixar a imagem abaixo dos eixos (draw_grid baixa a camada 'axes')
+        self.canvas.tag_lower(self.item)
+        view = self.map_view
+        if zoomed or view.scale != self.scale or (int(view.width), int(view.height)) != (self.width, self.height):
+            return True
+        self.shift()
+        return False
+
+    def redraw(self):
+        """Refazer a imagem inteira para a vista atual"""
+        width, height = int(self.map_view.width), int(self.map_view.height)
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self.image = np.empty((height, width, 3), dtype=np.uint8)
+            bands = -(-height // self.band_height)
+            self.band_min = np.empty(bands, dtype=np.intp)
+            self.band_max = np.empty(bands, dtype=np.intp)
+            if self.item is not None:
+                self.canvas.delete(self.item)
+            self.photo = tk.PhotoImage(master=self.canvas, width=width, height=height)
+            self.spare = tk.PhotoImage(master=self.canvas, width=width, height=height)
+            # Tag 'trace': o arrasto move a imagem junto com o resto até o redraw
+            self.item = self.canvas.create_image(0, 0, image=self.photo, anchor='nw', tags=('trace', 'raster'))
+        if self.map_view.scale != self.scale:
+            # O índice espacial é em pixels da escala da imagem
+            for trace in self.traces:
+                trace.reset_index()
+        self.scale = self.map_view.scale
+        self.canvas.coords(self.item, 0, 0)
+        self.canvas.tag_lower(self.item)
+        self.image[:] = self.background
+        for trace in self.traces:
+            trace.burned = 0
+        self.burn(self.traces)
+        # Montar já o índice espacial, para o primeiro arrasto não pagar por ele
+        for trace in self.traces:
+            trace.index_segments(self.scale, self.tile_size)
+        self.band_min[:] = 0
+        self.band_max[:] = width - 1
+        self.blit()
+
+    def shift(self):
+        """Deslocar a imagem com o arrasto e rasterizar só as faixas que entraram na vista"""
+        left, top = self.canvas.coords(self.item)
+        dx, dy = round(left), round(top)
+        if not dx and not dy:
+            return
+        width, height = self.width, self.height
+        if abs(dx) >= width or abs(dy) >= height:
+            self.redraw()
+            return
+        # Pixel (x, y) novo = pixel (x - dx, y - dy) antigo; NumPy trata a sobreposição
+        sx0, sx1 = max(-dx, 0), width - max(dx, 0)
+        sy0, sy1 = max(-dy, 0), height - max(dy, 0)
+        self.image[sy0 + dy:sy1 + dy, sx0 + dx:sx1 + dx] = self.image[sy0:sy1, sx0:sx1]
+        # O mesmo deslocamento no Tk, para o outro PhotoImage (sem cópia sobreposta na mesma imagem)
+        self.spare.tk.call(self.spare.name, 'copy', self.photo.name, '-from', sx0, sy0, sx1, sy1,
+                           '-to', sx0 + dx, sy0 + dy)
+        self.photo, self.spare = self.spare, self.photo
+        self.canvas.itemconfigure(self.item, image=self.photo)
+        self.canvas.move(self.item, -dx, -dy)
+        # Faixas expostas: colunas à esquerda/direita e linhas em cima/embaixo
+        strips = []
+        if dx:
+            strips.append((0, dx, 0, height) if dx > 0 else (width + dx, width, 0, height))
+        if dy:
+            strips.append((0, width, 0, dy) if dy > 0 else (0, width, height + dy, height))
+        for x0, x1, y0, y1 in strips:
+            self.image[y0:y1, x0:x1] = self.background
+            bands = slice(y0 // self.band_height, (y1 - 1) // self.band_height + 1)
+            np.minimum(self.band_min[bands], x0, out=self.band_min[bands])
+            np.maximum(self.band_max[bands], x1 - 1, out=self.band_max[bands])
+        self.burn(self.traces, strips)
+        self.blit()
+
+    def flush(self):
+        """Queimar os segmentos novos de todos os rastros e copiar só as faixas alteradas"""
+        view = self.map_view
+        if view.scale != self.scale or (int(view.width), int(view.height)) != (self.width, self.height):
+            # Zoom ou redimensionamento à espera do redraw: queimar agora poria os
+            # pontos na escala nova sobre a imagem antiga; eles ficam pendentes
+            return
+        self.burn([trace for trace in self.traces if trace.count > trace.burned])
+        self.blit()
+
+    def burn(self, traces, regions=None):
+        """Rasterizar de uma vez os pontos pendentes dos rastros.
+
+        Com regions = [(x0, x1, y0, y1), ...], rasteriza só os pixels dentro
+        desses retângulos (faixas expostas pelo shift), com os segmentos que o
+        índice espacial encontra perto deles, já queimados ou não.
+        """
+        if not traces:
+            return
+        # A imagem pode ter sido deslocada pelo arrasto desde o último redraw
+        view = self.map_view
+        left, top = self.canvas.coords(self.item)
+        scale = view.scale
+        offset_x = view.offset_x - left
+        offset_y = view.offset_y - top
+        segments = []
+        for index, trace in enumerate(traces):
+            if regions is not None:
+                starts = self.segments_near(trace, regions, offset_x, offset_y)
+                if len(starts) == 0:
+                    continue
+                ends = np.minimum(starts + 1, trace.count - 1)
+                xs, ys = trace.xs, trace.ys
+                segments.append((np.rint(xs[starts] * scale + offset_x), np.rint(ys[starts] * -scale + offset_y),
+                                 np.rint(xs[ends] * scale + offset_x), np.rint(ys[ends] * -scale + offset_y),
+                                 np.full(len(starts), index)))
+                continue
+            xs, ys = trace.pending()
+            trace.burned = trace.count
+            if len(xs) == 0:
+                continue
+            px = np.rint(xs * scale + offset_x)
+            py = np.rint(ys * -scale + offset_y)
+            # Pontos seguidos no mesmo pixel não mudam a imagem
+            keep = np.ones(len(px), dtype=bool)
+            np.logical_or(px[1:] != px[:-1], py[1:] != py[:-1], out=keep[1:])
+            px, py = px[keep], py[keep]
+            if len(px) == 1:
+                px, py = np.repeat(px, 2), np.repeat(py, 2)
+            segments.append((px[:-1], py[:-1], px[1:], py[1:], np.full(len(px) - 1, index)))
+        if not segments:
+            return
+        x0, y0, x1, y1, color = (np.concatenate(column) for column in zip(*segments))
+        if regions is None:
+            cols, rows, segment = rasterize_segments(x0, y0, x1, y1, self.width, self.height, self.line_width)
+        else:
+            parts = [self.rasterize_region(x0, y0, x1, y1, region) for region in regions]
+            cols, rows, segment = (np.concatenate(column) for column in zip(*parts))
+        if len(cols) == 0:
+            return
+        palette = np.array([trace.rgb for trace in traces], dtype=np.uint8)
+        self.image[rows, cols] = palette[color[segment]]
+        bands = rows // self.band_height
+        np.minimum.at(self.band_min, bands, cols)
+        np.maximum.at(self.band_max, bands, cols)
+
+    def segments_near(self, trace, regions, offset_x, offset_y):
+        """Índices dos segmentos do rastro que podem pintar pixels dentro das regiões"""
+        if trace.count == 1:
+            return np.zeros(1, dtype=np.intp)  # Ponto isolado: segmento de comprimento zero
+        trace.index_segments(self.scale, self.tile_size)
+        size = self.tile_size
+        # Margem da espessura da linha e do arredondamento para o pixel
+        pad = self.line_width + 1
+        parts = [trace.segments_in_tiles(int((x0 - pad - offset_x) // size), int((x1 + pad - offset_x) // size),
+                                         int((y0 - pad - offset_y) // size), int((y1 + pad - offset_y) // size))
+                 for x0, x1, y0, y1 in regions]
+        return np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+
+    def rasterize_region(self, x0, y0, x1, y1, region):
+        """Pixels dos segmentos dentro do retângulo region = (x0, x1, y0, y1)"""
+        left, right, top, bottom = region
+        # Margem da espessura da linha: segmentos logo fora da faixa também pintam pixels dentro dela
+        pad = self.line_width
+        left, top = left - pad, top - pad
+        near = np.nonzero((np.maximum(x0, x1) >= left) & (np.minimum(x0, x1) < right + pad) &
+                          (np.maximum(y0, y1) >= top) & (np.minimum(y0, y1) < bottom + pad))[0]
+        cols, rows, segment = rasterize_segments(x0[near] - left, y0[near] - top, x1[near] - left, y1[near] - top,
+                                                 right + pad - left, bottom + pad - top, self.line_width)
+        cols = cols + left
+        rows = rows + top
+        inside = (cols >= region[0]) & (cols < right) & (rows >= region[2]) & (rows < bottom)
+        return cols[inside], rows[inside], near[segment[inside]]
+
+    def blit(self):
+        """Copiar as faixas alteradas da imagem para o PhotoImage (um PPM por faixa)"""
+        band_height = self.band_height
+        for band in np.nonzero(self.band_min <= self.band_max)[0]:
+            x0, x1 = int(self.band_min[band]), int(self.band_max[band]) + 1
+            y0 = int(band) * band_height
+            y1 = min(y0 + band_height, self.height)
+            region = np.ascontiguousarray(self.image[y0:y1, x0:x1])
+            ppm = b'P6 %d %d 255\n' % (x1 - x0, y1 - y0) + region.tobytes()
+            patch = tk.PhotoImage(master=self.canvas, data=ppm, format='PPM')
+            self.photo.tk.call(self.photo.name, 'copy', patch.name, '-to', x0, y0)
+        self.band_min[:] = self.width
+        self.band_max[:] = -1
+
+
+def clip_segments(x0, y0, x1, y1, width, height):
+    """Recorte de Liang-Barsky dos segmentos ao retângulo [0, width - 1] x [0, height - 1].
+
+    Retorna os segmentos recortados e o índice original de cada um (só os que
+    têm alguma parte visível). Segmentos inteiros dentro passam direto.
+    """
+    inside = ((x0 >= 0) & (x0 <= width - 1) & (y0 >= 0) & (y0 <= height - 1) &
+              (x1 >= 0) & (x1 <= width - 1) & (y1 >= 0) & (y1 <= height - 1))
+    if inside.all():
+        return x0, y0, x1, y1, np.arange(len(x0))
+    outside = np.nonzero(~inside)[0]
+    cx0, cy0 = x0[outside], y0[outside]
+    dx = x1[outside] - cx0
+    dy = y1[outside] - cy0
+    t0 = np.zeros(len(outside))
+    t1 = np.ones(len(outside))
+    visible = np.ones(len(outside), dtype=bool)
+    for p, q in ((-dx, cx0), (dx, width - 1 - cx0), (-dy, cy0), (dy, height - 1 - cy0)):
+        parallel = p == 0
+        visible &= ~(parallel & (q < 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.where(parallel, 0.0, q / np.where(parallel, 1.0, p))
+        t0 = np.where(~parallel & (p < 0), np.maximum(t0, r), t0)
+        t1 = np.where(~parallel & (p > 0), np.minimum(t1, r), t1)
+    visible &= t0 <= t1
+    cx0, cy0, dx, dy, t0, t1 = (a[visible] for a in (cx0, cy0, dx, dy, t0, t1))
+    index = np.concatenate((np.nonzero(inside)[0], outside[visible]))
+    return (np.concatenate((x0[inside], cx0 + t0 * dx)), np.concatenate((y0[inside], cy0 + t0 * dy)),
+            np.concatenate((x1[inside], cx0 + t1 * dx)), np.concatenate((y1[inside], cy0 + t1 * dy)), index)
+
+
+def rasterize_segments(x0, y0, x1, y1, width, height, line_width=1):
+    """Pixels (colunas, linhas) dos segmentos e o índice do segmento de cada um (DDA vetorizado)"""
+    x0, y0, x1, y1, index = clip_segments(x0, y0, x1, y1, width, height)
+    if len(x0) == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, empty
+    dx = x1 - x0
+    dy = y1 - y0
+    steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.intp) + 1
+    segment = np.repeat(np.arange(len(steps)), steps)
+    first = np.cumsum(steps) - steps
+    t = (np.arange(len(segment)) - first[segment]) / np.maximum(steps - 1, 1)[segment]
+    cols = np.rint(x0[segment] + dx[segment] * t).astype(np.intp)
+    rows = np.rint(y0[segment] + dy[segment] * t).astype(np.intp)
+    segment = index[segment]
+    if line_width > 1:
+        # Engrossar com um quadrado de line_width pixels
+        offsets = np.arange(line_width) - (line_width - 1) // 2
+        shape = (len(cols), line_width, line_width)
+        cols = np.broadcast_to(cols[:, None, None] + offsets[None, :, None], shape).ravel()
+        rows = np.broadcast_to(rows[:, None, None] + offsets[None, None, :], shape).ravel()
+        segment = np.broadcast_to(segment[:, None, None], shape).ravel()
+        inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+        cols, rows, segment = cols[inside], rows[inside], segment[inside]
+    return cols, rows, segment
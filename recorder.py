@@ -0,0 +1,258 @@
+# recorder.py
+#
+# Formato da sessão gravada (little-endian), só com anexação:
+#
+#   Cabeçalho do arquivo (24 bytes): magic b'ODOREC01', tempo de parede do início
+#   (float64, time.time()) e relógio monotônico do início (int64, ns).
+#
+#   Blocos, um após o outro:
+#     cabeçalho do bloco (28 bytes): b'CHNK', número de registros (uint32),
+#     tamanho do conteúdo (uint32), t do primeiro e do último registro (int64, ns)
+#     registros: deslocamento desde o primeiro registro do bloco (uint32, µs),
+#                tamanho (uint16) e os bytes do quadro 'BEGIN;...;END'
+#
+#   Índice esparso em '<arquivo>.idx', uma entrada por bloco (28 bytes):
+#     t do primeiro e do último registro (int64, ns), posição do bloco no arquivo
+#     (uint64) e número de registros (uint32). Se o índice faltar ou estiver
+#     incompleto, ele é reconstruído lendo só os cabeçalhos dos blocos.
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+import traceback
+from metrics import metrics
+
+FILE_MAGIC = b'ODOREC01'
+FILE_HEADER = struct.Struct('<8sdq')
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HEADER = struct.Struct('<4sIIqq')
+RECORD_HEADER = struct.Struct('<IH')
+INDEX_ENTRY = struct.Struct('<qqQI')
+
+
+class SessionRecorder(threading.Thread):
+    """Grava os quadros brutos em segundo plano, em blocos com índice de tempo.
+
+    Consome uma fila de (timestamp monotônico em s, linha), normalmente uma
+    derivação do pipeline com política 'drop_oldest', de modo que o leitor
+    serial nunca espera pelo disco. A memória fica limitada à fila e a um bloco.
+    """
+
+    def __init__(self, path, source, chunk_bytes=256 * 1024, flush_interval=1.0):
+        super().__init__(name='SessionRecorder', daemon=True)
+        self.path = path
+        self.source = source
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.stop_event = threading.Event()
+        self.frames_counter = metrics.counter('recorder.frames')
+        self.bytes_counter = metrics.counter('recorder.bytes')
+        self.chunk = bytearray()
+        self.chunk_count = 0
+        self.chunk_first_ns = 0
+        self.chunk_last_ns = 0
+        self.chunk_started = 0.0
+        self.file = open(path, 'wb')
+        self.index_file = open(path + '.idx', 'wb')
+        self.file.write(FILE_HEADER.pack(FILE_MAGIC, time.time(), time.monotonic_ns()))
+        self.file.flush()
+
+    def run(self):
+        print(f"Gravando sessão em {self.path}")
+        try:
+            while not self.stop_event.is_set():
+                batch = self.source.get_batch(4096, timeout=self.flush_interval)
+                for timestamp, frame in batch:
+                    self.add_record(int(timestamp * 1e9), frame)
+                if self.chunk_count and time.monotonic() - self.chunk_started >= self.flush_interval:
+                    self.write_chunk()
+            # Esvaziar o que ainda estiver na fila antes de fechar
+            while True:
+                batch = self.source.get_batch(4096, timeout=0)
+                if not batch:
+                    break
+                for timestamp, frame in batch:
+                    self.add_record(int(timestamp * 1e9), frame)
+        except Exception:
+            print("Erro na gravação da sessão:")
+            traceback.print_exc()
+        finally:
+            self.close()
+
+    def add_record(self, t_ns, frame):
+        data = frame.encode('utf-8') if isinstance(frame, str) else frame
+        if self.chunk_count and (t_ns - self.chunk_first_ns) // 1000 > 0xFFFFFFFF:
+            # Deslocamento não cabe em uint32: começar outro bloco
+            self.write_chunk()
+        if self.chunk_count == 0:
+            self.chunk_first_ns = t_ns
+            self.chunk_started = time.monotonic()
+        delta_us = max(0, (t_ns - self.chunk_first_ns) // 1000)
+        self.chunk += RECORD_HEADER.pack(delta_us, len(data))
+        self.chunk += data
+        self.chunk_count += 1
+        self.chunk_last_ns = max(t_ns, self.chunk_last_ns)
+        self.frames_counter.inc()
+        if len(self.chunk) >= self.chunk_bytes:
+            self.write_chunk()
+
+    def write_chunk(self):
+        if not self.chunk_count:
+            return
+        offset = self.file.tell()
+        header = CHUNK_HEADER.pack(CHUNK_MAGIC, self.chunk_count, len(self.chunk),
+                                   self.chunk_first_ns, self.chunk_last_ns)
+        self.file.write(header)
+        self.file.write(self.chunk)
+        self.file.flush()
+        self.index_file.write(INDEX_ENTRY.pack(self.chunk_first_ns, self.chunk_last_ns, offset, self.chunk_count))
+        self.index_file.flush()
+        self.bytes_counter.inc(len(header) + len(self.chunk))
+        self.chunk.clear()
+        self.chunk_count = 0
+        self.chunk_last_ns = 0
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=5)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.write_chunk()
+        self.file.close()
+        self.index_file.close()
+        print(f"Sessão gravada em {self.path}")
+
+
+class SessionReader:
+    """Leitura de uma sessão gravada via mmap, com busca direta por tempo"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            raise ValueError(f"Arquivo de sessão inválido: {path}")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.wall_start, self.start_ns = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError(f"Arquivo de sessão inválido: {path}")
+        self.chunks = self.load_index()
+        self.chunk_first = [entry[0] for entry in self.chunks]
+        self.chunk_last = [entry[1] for entry in self.chunks]
+        # Índice (na sessão) do primeiro quadro de cada bloco
+        self.chunk_start = []
+        total = 0
+        for entry in self.chunks:
+            self.chunk_start.append(total)
+            total += entry[3]
+        self.frame_count = total
+
+    def load_index(self):
+        """Entradas (t_primeiro, t_último, posição, registros) de cada bloco completo"""
+        entries = []
+        index_path = self.path + '.idx'
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as f:
+                data = f.read()
+            for i in range(len(data) // INDEX_ENTRY.size):
+                entry = INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size)
+                if not self._chunk_complete(entry[2]):
+                    break
+                entries.append(entry)
+        next_offset = FILE_HEADER.size
+        if entries:
+            last_offset = entries[-1][2]
+            next_offset = last_offset + CHUNK_HEADER.size + CHUNK_HEADER.unpack_from(self.mm, last_offset)[2]
+        # Blocos gravados depois do índice (ou sem índice): ler só os cabeçalhos
+        while self._chunk_complete(next_offset):
+            magic, count, length, first_ns, last_ns = CHUNK_HEADER.unpack_from(self.mm, next_offset)
+            entries.append((first_ns, last_ns, next_offset, count))
+            next_offset += CHUNK_HEADER.size + length
+        return entries
+
+    def _chunk_complete(self, offset):
+        if offset + CHUNK_HEADER.size > len(self.mm):
+            return False
+        magic, count, length, _, _ = CHUNK_HEADER.unpack_from(self.mm, offset)
+        return magic == CHUNK_MAGIC and offset + CHUNK_HEADER.size + length <= len(self.mm)
+
+    def __len__(self):
+        return self.frame_count
+
+    def time_range(self):
+        """(primeiro, último) timestamp em ns do relógio monotônico da gravação"""
+        if not self.chunks:
+            return None, None
+        return self.chunks[0][0], self.chunks[-1][1]
+
+    def duration(self):
+        first, last = self.time_range()
+        return 0.0 if first is None else (last - first) / 1e9
+
+    def iter_frames(self, t0_ns=None, t1_ns=None):
+        """Gera (t_ns, linha) com t0_ns <= t < t1_ns, indo direto ao primeiro bloco"""
+        start = 0 if t0_ns is None else bisect.bisect_left(self.chunk_last, t0_ns)
+        mm = self.mm
+        for first_ns, last_ns, offset, count in self.chunks[start:]:
+            if t1_ns is not None and first_ns >= t1_ns:
+                return
+            pos = offset + CHUNK_HEADER.size
+            for _ in range(count):
+                delta_us, length = RECORD_HEADER.unpack_from(mm, pos)
+                pos += RECORD_HEADER.size
+                t_ns = first_ns + delta_us * 1000
+                if t0_ns is not None and t_ns < t0_ns:
+                    pos += length
+                    continue
+                if t1_ns is not None and t_ns >= t1_ns:
+                    return
+                yield t_ns, mm[pos:pos + length].decode('utf-8', errors='replace')
+                pos += length
+
+    def index_at_time(self, t_ns):
+        """Índice do primeiro quadro com t >= t_ns (len(self) se não houver)"""
+        chunk = bisect.bisect_left(self.chunk_last, t_ns)
+        if chunk == len(self.chunks):
+            return self.frame_count
+        first_ns, _, offset, count = self.chunks[chunk]
+        pos = offset + CHUNK_HEADER.size
+        for i in range(count):
+            delta_us, length = RECORD_HEADER.unpack_from(self.mm, pos)
+            if first_ns + delta_us * 1000 >= t_ns:
+                return self.chunk_start[chunk] + i
+            pos += RECORD_HEADER.size + length
+        return self.chunk_start[chunk] + count
+
+    def iter_records(self, start=0, stop=None):
+        """Gera (t_ns, linha) dos quadros de índice start <= i < stop, indo direto ao bloco de start.
+
+        Ao contrário do tempo, o índice identifica cada quadro mesmo quando
+        vários têm o mesmo timestamp (todos os quadros de uma leitura da serial).
+        """
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        if start >= stop:
+            return
+        chunk = bisect.bisect_right(self.chunk_start, start) - 1
+        index = self.chunk_start[chunk]
+        mm = self.mm
+        for first_ns, last_ns, offset, count in self.chunks[chunk:]:
+            pos = offset + CHUNK_HEADER.size
+            for _ in range(count):
+                delta_us, length = RECORD_HEADER.unpack_from(mm, pos)
+                pos += RECORD_HEADER.size
+                if index >= start:
+                    yield first_ns + delta_us * 1000, mm[pos:pos + length].decode('utf-8', errors='replace')
+                pos += length
+                index += 1
+                if index >= stop:
+                    return
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
@@ -0,0 +1,229 @@
+# replay.py
+
+import argparse
+import threading
+import time
+import traceback
+from recorder import SessionReader
+
+
+class ReplayEngine(threading.Thread):
+    """Reproduz uma sessão gravada pelo DataManager, sem porta serial e sem Tk.
+
+    Os quadros passam pelo mesmo process_lines do modo ao vivo (odometria 4/5
+    inclusive), então consumidores usam a mesma interface de snapshots. Com
+    speed=None a reprodução é tão rápida quanto a CPU permitir; caso contrário
+    segue o tempo original multiplicado por speed. Pausa, busca e velocidade
+    podem ser alteradas com a reprodução em andamento.
+    """
+
+    def __init__(self, path, data_manager, speed=1.0, batch_size=256, stay_open=False, loop=False):
+        super().__init__(name='ReplayEngine', daemon=True)
+        self.reader = SessionReader(path)
+        self.data_manager = data_manager
+        self.speed = speed
+        self.batch_size = batch_size
+        self.stay_open = stay_open  # Ao terminar, ficar pausado esperando busca (uso com GUI)
+        self.loop = loop
+        self.start_ns, self.end_ns = self.reader.time_range()
+        self.position_ns = self.start_ns or 0  # Só para mostrar a posição; a busca usa next_frame
+        # Índice do próximo quadro ainda não processado. Quadros de uma mesma leitura da
+        # serial têm o mesmo timestamp, então o tempo não diz quais já foram integrados
+        self.next_frame = 0
+        self.frames_processed = 0
+        self.finished = False
+        self.paused = False
+        self.seek_target_ns = None
+        self.control_changed = False
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+
+    # Controles (chamados de outras threads)
+
+    def pause(self):
+        with self.condition:
+            self.paused = True
+            self.control_changed = True
+            self.condition.notify_all()
+
+    def resume(self):
+        with self.condition:
+            self.paused = False
+            self.control_changed = True
+            self.condition.notify_all()
+
+    def set_speed(self, speed):
+        """Multiplicador do tempo original; None para o mais rápido possível"""
+        with self.condition:
+            self.speed = speed
+            self.control_changed = True
+            self.condition.notify_all()
+
+    def seek(self, seconds):
+        """Ir para `seconds` desde o início da sessão"""
+        if self.start_ns is None:
+            return
+        target = self.start_ns + int(max(0.0, min(seconds, self.duration())) * 1e9)
+        with self.condition:
+            self.seek_target_ns = target
+            self.finished = False
+            self.control_changed = True
+            self.condition.notify_all()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.control_changed = True
+            self.condition.notify_all()
+
+    def duration(self):
+        return self.reader.duration()
+
+    def position(self):
+        """Posição atual em segundos desde o início da sessão"""
+        if self.start_ns is None:
+            return 0.0
+        return (self.position_ns - self.start_ns) / 1e9
+
+    # Reprodução
+
+    def run(self):
+        if self.start_ns is None:
+            print(f"Sessão vazia: {self.reader.path}")
+            return
+        print(f"Reproduzindo {self.reader.path} ({len(self.reader)} quadros, {self.duration():.1f} s)")
+        try:
+            from_frame = 0
+            while not self.stop_event.is_set():
+                target = self.play(from_frame)
+                if self.stop_event.is_set():
+                    break
+                if target is None:
+                    # Fim da sessão
+                    self.finished = True
+                    if self.loop:
+                        self.data_manager.reset()
+                        self.next_frame = from_frame = 0
+                        continue
+                    if not self.stay_open:
+                        break
+                    with self.condition:
+                        while self.seek_target_ns is None and not self.stop_event.is_set():
+                            self.condition.wait()
+                        target = self.seek_target_ns
+                    if target is None:
+                        break
+                from_frame = self.apply_seek(target)
+        except Exception:
+            print("Erro na reprodução da sessão:")
+            traceback.print_exc()
+        finally:
+            self.reader.close()
+
+    def apply_seek(self, target_ns):
+        """Reprocessar rapidamente os quadros antes de target_ns; retorna o índice de onde continuar"""
+        with self.condition:
+            self.seek_target_ns = None
+            self.control_changed = False
+        target_frame = self.reader.index_at_time(target_ns)
+        # A odometria é integrada: voltar exige recomeçar do início
+        if target_frame < self.next_frame:
+            self.data_manager.reset()
+            self.next_frame = 0
+        batch = []
+        for t_ns, frame in self.reader.iter_records(self.next_frame, target_frame):
+            batch.append(frame)
+            if len(batch) >= self.batch_size:
+                self.process(batch, t_ns)
+                batch = []
+        if batch:
+            self.process(batch, target_ns)
+        self.position_ns = target_ns
+        self.finished = False
+        return target_frame
+
+    def play(self, from_frame):
+        """Reproduz a partir do quadro from_frame; retorna o alvo de uma busca ou None no fim"""
+        anchor_wall = time.perf_counter()
+        anchor_ns = None
+        batch = []
+        for t_ns, frame in self.reader.iter_records(from_frame):
+            if anchor_ns is None:
+                anchor_ns = t_ns
+            if self.control_changed or self.paused:
+                if batch:
+                    self.process(batch, t_ns)
+                    batch = []
+                target = self.handle_controls(t_ns)
+                if target is not None:
+                    return target
+                if self.stop_event.is_set():
+                    return None
+                anchor_wall, anchor_ns = time.perf_counter(), t_ns
+            speed = self.speed
+            if speed:
+                due = anchor_wall + (t_ns - anchor_ns) / 1e9 / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    # Entregar o lote antes de esperar pelo próximo quadro
+                    if batch:
+                        self.process(batch, t_ns)
+                        batch = []
+                    with self.condition:
+                        if not self.control_changed:
+                            self.condition.wait(delay)
+                    if self.control_changed:
+                        target = self.handle_controls(t_ns)
+                        if target is not None:
+                            return target
+                        if self.stop_event.is_set():
+                            return None
+                        anchor_wall, anchor_ns = time.perf_counter(), t_ns
+            batch.append(frame)
+            if len(batch) >= self.batch_size:
+                self.process(batch, t_ns)
+                batch = []
+        if batch:
+            self.process(batch, self.end_ns)
+        self.position_ns = self.end_ns
+        return None
+
+    def handle_controls(self, t_ns):
+        """Tratar pausa/busca/velocidade; retorna o alvo de uma busca, se houver"""
+        with self.condition:
+            self.control_changed = False
+            while self.paused and self.seek_target_ns is None and not self.stop_event.is_set():
+                self.condition.wait()
+                self.control_changed = False
+            return self.seek_target_ns
+
+    def process(self, batch, t_ns):
+        self.data_manager.process_lines(batch)
+        self.frames_processed += len(batch)
+        self.next_frame += len(batch)
+        self.position_ns = t_ns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz uma sessão gravada sem porta serial nem GUI")
+    parser.add_argument('session', help="arquivo da sessão gravada")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="multiplicador do tempo original (0 = o mais rápido possível)")
+    args = parser.parse_args()
+
+    from data_manager import DataManager
+    data_manager = DataManager()
+    replay = ReplayEngine(args.session, data_manager, speed=args.speed or None)
+    start = time.perf_counter()
+    replay.start()
+    replay.join()
+    elapsed = time.perf_counter() - start
+    snapshot = data_manager.get_snapshot()
+    print(f"{replay.frames_processed} quadros em {elapsed:.2f} s "
+          f"({replay.frames_processed / elapsed if elapsed else 0:.0f} quadros/s)")
+    for key in ('odom4_x', 'odom4_y', 'odom4_th', 'odom5_x', 'odom5_y', 'odom5_th'):
+        print(f"{key}: {snapshot.get(key, 'N/A')}")
+
+
+if __name__ == '__main__':
+    main()
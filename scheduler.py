@@ -0,0 +1,268 @@
+# scheduler.py
+#
+# Perfil de velocidade (arquivo de texto), uma linha por ponto:
+#
+#   # tempo (s)   comando
+#   0.0           speed:0:0@
+#   1.0           speed:10:10@
+#   3.0           twist:0.2:0.5@
+#   5.0           speed:0:0@
+#
+# A cada período o fluxo envia o comando do ponto em vigor. Entre dois pontos
+# do mesmo tipo com argumentos numéricos os valores são interpolados
+# linearamente (rampas de velocidade). Antes do primeiro ponto nada é enviado.
+# O fluxo termina no último ponto, ou recomeça do início com loop.
+
+import bisect
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+from metrics import metrics
+
+# Retornado pela função de comando quando não há nada a enviar neste prazo (o fluxo continua)
+NOTHING_DUE = object()
+
+
+class CommandStream:
+    """Comando enviado periodicamente; command pode ser um texto fixo ou uma função
+    que recebe o tempo decorrido (s) e retorna o comando, NOTHING_DUE para pular
+    este prazo ou None para terminar."""
+
+    def __init__(self, name, period, send, command):
+        if period <= 0:
+            raise ValueError(f"Período inválido: {period}")
+        self.name = name
+        self.period = period
+        self.send = send
+        self.command = command
+        self.start = None
+        self.deadline = None
+        self.entry = None  # Ordem da entrada válida deste fluxo no heap
+        self.sent_counter = metrics.counter(f'scheduler.{name}.sent')
+        self.missed_counter = metrics.counter(f'scheduler.{name}.missed')
+        self.jitter = metrics.histogram(f'scheduler.{name}.jitter_s')
+
+    def command_at(self, elapsed):
+        if callable(self.command):
+            return self.command(elapsed)
+        return self.command
+
+    def stats(self):
+        jitter = self.jitter.snapshot()
+        return {
+            'period': self.period,
+            'sent': self.sent_counter.value,
+            'missed': self.missed_counter.value,
+            'jitter_mean': jitter['mean'],
+            'jitter_p99': jitter['p99'],
+            'jitter_max': jitter['max'],
+        }
+
+
+class ProfileStream(CommandStream):
+    """Fluxo que segue um perfil de velocidade (lista de (tempo, comando))"""
+
+    def __init__(self, name, period, send, profile, loop=False, interpolate=True):
+        if not profile:
+            raise ValueError(f"Perfil vazio: {name}")
+        self.times = [t for t, _ in profile]
+        self.commands = [command for _, command in profile]
+        self.loop = loop
+        self.interpolate = interpolate
+        self.done = False
+        super().__init__(name, period, send, self.profile_command)
+
+    def profile_command(self, elapsed):
+        duration = self.times[-1]
+        if elapsed >= duration:
+            if not self.loop or duration <= 0:
+                # O último ponto (ex.: parar o robô) sai uma vez, mesmo entre dois prazos
+                if self.done:
+                    return None
+                self.done = True
+                return self.commands[-1]
+            elapsed %= duration
+        i = bisect.bisect_right(self.times, elapsed) - 1
+        if i < 0:
+            # Antes do primeiro ponto do perfil (ou da volta, com loop)
+            return NOTHING_DUE
+        if not self.interpolate or i + 1 >= len(self.times):
+            return self.commands[i]
+        return interpolate_command(self.commands[i], self.commands[i + 1],
+                                   (elapsed - self.times[i]) / (self.times[i + 1] - self.times[i]))
+
+
+def split_command(command):
+    """'speed:10:-5@' -> ('speed', [10.0, -5.0]); argumentos não numéricos -> None"""
+    parts = command.rstrip('@').split(':')
+    try:
+        return parts[0], [float(value) for value in parts[1:]]
+    except ValueError:
+        return parts[0], None
+
+
+def interpolate_command(first, second, fraction):
+    kind, start = split_command(first)
+    next_kind, end = split_command(second)
+    if kind != next_kind or start is None or end is None or len(start) != len(end) or not start:
+        return first
+    values = [a + (b - a) * fraction for a, b in zip(start, end)]
+    return kind + ''.join(f':{value:g}' for value in values) + '@'
+
+
+def load_profile(path):
+    """Lê um perfil de velocidade: lista de (tempo em s, comando) em ordem de tempo"""
+    profile = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split(None, 1)
+            try:
+                t = float(parts[0])
+                command = parts[1].strip()
+            except (ValueError, IndexError):
+                raise ValueError(f"{path}:{number}: linha inválida: {line}")
+            if profile and t < profile[-1][0]:
+                raise ValueError(f"{path}:{number}: tempos devem ser crescentes")
+            profile.append((t, command))
+    return profile
+
+
+class CommandScheduler(threading.Thread):
+    """Envia vários fluxos periódicos numa única thread, em prazos absolutos.
+
+    O k-ésimo envio de um fluxo tem prazo início + k * período no relógio
+    monotônico, então o tempo gasto enviando não acumula deriva. A thread dorme
+    até perto do prazo e termina a espera com sleep(0) (spin), pois a espera
+    com timeout pode atrasar mais que um período em alguns sistemas. Prazos
+    perdidos por mais de um período são pulados (contados como missed) em vez
+    de enviados em rajada.
+
+    Com outra thread ocupando a CPU (parse, GUI) a espera pelo GIL chega ao
+    intervalo de troca do interpretador (5 ms por padrão). switch_interval
+    (opcional, vale para o processo inteiro) o reduz só enquanto houver fluxos
+    ativos; o valor anterior volta quando eles acabam e em stop().
+    """
+
+    def __init__(self, spin=0.001, switch_interval=None):
+        super().__init__(name='CommandScheduler', daemon=True)
+        self.spin = spin
+        self.switch_interval = switch_interval
+        self.heap = []  # (prazo, ordem, fluxo)
+        self.streams = {}
+        self.order = itertools.count()
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.saved_switch_interval = None  # Valor a restaurar enquanto o reduzido estiver aplicado
+
+    def _apply_switch_interval(self, active):
+        if not self.switch_interval:
+            return
+        if active and self.saved_switch_interval is None:
+            current = sys.getswitchinterval()
+            if current > self.switch_interval:
+                self.saved_switch_interval = current
+                sys.setswitchinterval(self.switch_interval)
+        elif not active and self.saved_switch_interval is not None:
+            sys.setswitchinterval(self.saved_switch_interval)
+            self.saved_switch_interval = None
+
+    def add_stream(self, stream, delay=0.0):
+        """Inicia (ou substitui, pelo nome) um fluxo; o primeiro envio é em delay s"""
+        with self.condition:
+            self.streams[stream.name] = stream
+            stream.start = stream.deadline = time.monotonic() + delay
+            self._push(stream)
+            self.condition.notify()
+        return stream
+
+    def remove_stream(self, name):
+        # A entrada no heap é descartada quando chegar a vez dela
+        with self.condition:
+            stream = self.streams.pop(name, None)
+            self.condition.notify()
+        return stream
+
+    def _push(self, stream):
+        stream.entry = next(self.order)
+        heapq.heappush(self.heap, (stream.deadline, stream.entry, stream))
+
+    def _valid(self, entry):
+        _, order, stream = entry
+        return self.streams.get(stream.name) is stream and stream.entry == order
+
+    def active(self, name):
+        return name in self.streams
+
+    def stats(self):
+        return {name: stream.stats() for name, stream in list(self.streams.items())}
+
+    def run(self):
+        try:
+            self._loop()
+        finally:
+            with self.condition:
+                self._apply_switch_interval(False)
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            with self.condition:
+                # Descartar fluxos removidos ou substituídos
+                while self.heap and not self._valid(self.heap[0]):
+                    heapq.heappop(self.heap)
+                self._apply_switch_interval(bool(self.heap))
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                deadline, _, stream = self.heap[0]
+                remaining = deadline - time.monotonic()
+                if remaining > self.spin:
+                    self.condition.wait(remaining - self.spin)
+                    continue
+                heapq.heappop(self.heap)
+            while time.monotonic() < deadline:
+                time.sleep(0)
+            self.fire(stream, deadline)
+
+    def fire(self, stream, deadline):
+        now = time.monotonic()
+        late = now - deadline
+        if late >= stream.period:
+            # Prazos perdidos: pular para o prazo atual
+            missed = int(late // stream.period)
+            stream.missed_counter.inc(missed)
+            deadline += missed * stream.period
+            late = now - deadline
+        stream.jitter.observe(late)
+        try:
+            command = stream.command_at(deadline - stream.start)
+            if command is None:
+                # Fim do perfil
+                with self.condition:
+                    if self.streams.get(stream.name) is stream:
+                        del self.streams[stream.name]
+                return
+            if command is not NOTHING_DUE:
+                stream.send(command)
+                stream.sent_counter.inc()
+        except Exception:
+            print(f"Erro no envio periódico '{stream.name}':")
+            traceback.print_exc()
+        stream.deadline = deadline + stream.period
+        with self.condition:
+            if self.streams.get(stream.name) is stream:
+                self._push(stream)
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify()
+        if self.is_alive():
+            self.join(timeout=2)
+        with self.condition:
+            self._apply_switch_interval(False)
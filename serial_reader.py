@@ -3,16 +3,91 @@
 import threading
 import serial
 import traceback
+from command_writer import CommandWriter
+from metrics import metrics, debug_log
+
+class FrameExtractor:
+    """Extrai os quadros 'BEGIN;...;END' completos de um fluxo de bytes"""
+
+    START = b'BEGIN;'
+    END = b';END'
+
+    def __init__(self, max_frame_size=4096):
+        # Buffer reutilizado entre leituras; só guarda o quadro parcial pendente
+        self.buffer = bytearray()
+        self.max_frame_size = max_frame_size
+        self.invalid_frames = 0    # quadros truncados ou grandes demais
+        self.discarded_bytes = 0   # lixo descartado entre quadros
+
+    def feed(self, data):
+        """Adiciona bytes ao buffer e retorna a lista de quadros completos (str)"""
+        buf = self.buffer
+        buf += data
+        find = buf.find
+        start_len = len(self.START)
+        end_len = len(self.END)
+        frames = []
+        pos = 0
+
+        while True:
+            start = find(self.START, pos)
+            if start < 0:
+                # Manter apenas um possível 'BEGIN;' parcial no final do buffer
+                keep = max(pos, len(buf) - (start_len - 1))
+                self._discard(buf, pos, keep)
+                pos = keep
+                break
+            if start > pos:
+                self._discard(buf, pos, start)
+
+            end = find(self.END, start + start_len)
+            if end < 0:
+                if len(buf) - start > self.max_frame_size:
+                    # Quadro sem fim: ressincronizar no próximo 'BEGIN;'
+                    self.invalid_frames += 1
+                    pos = start + 1
+                    continue
+                pos = start
+                break
+
+            # Um novo 'BEGIN;' antes do ';END' indica um quadro truncado
+            restart = find(self.START, start + start_len, end)
+            if restart >= 0:
+                self.invalid_frames += 1
+                pos = restart
+                continue
+
+            frames.append(buf[start:end + end_len].decode('utf-8', errors='replace'))
+            pos = end + end_len
+
+        if pos:
+            del buf[:pos]
+        return frames
+
+    def _discard(self, buf, begin, end):
+        # Quebras de linha entre quadros são esperadas e não contam como lixo
+        if end > begin and buf[begin:end].strip():
+            self.discarded_bytes += end - begin
+
+    def reset(self):
+        self.buffer.clear()
+
 
 class SerialReader(threading.Thread):
-    def __init__(self, port, baudrate, data_manager):
+    def __init__(self, port, baudrate, data_manager, bulk_read=True, pipeline=None):
         super().__init__()
         self.port = port
         self.baudrate = baudrate
         self.data_manager = data_manager
+        self.pipeline = pipeline  # Se definido, a thread só coleta os quadros e os entrega ao pipeline
+        self.bulk_read = bulk_read  # Ler tudo o que estiver disponível em vez de readline()
+        self.extractor = FrameExtractor()
         self.ser = None
+        self.writer = None  # Comandos saem por uma thread própria, sem esperar as leituras
         self.stop_event = threading.Event()
-        self.serial_lock = threading.Lock()  # Lock para acesso thread-safe
+        self.bytes_counter = metrics.counter('serial.bytes')
+        self.frames_counter = metrics.counter('serial.frames')
+        self.invalid_counter = metrics.counter('serial.invalid_frames')
 
     def run(self):
         print("Thread SerialReader iniciada.")
@@ -30,36 +105,85 @@ class SerialReader(threading.Thread):
             print(f"Erro ao abrir a porta serial {self.port}: {e}")
             return
 
+        # Full-duplex: leitura e escrita em threads diferentes, sem lock entre elas
+        self.writer = CommandWriter(self.ser, name=f'CommandWriter-{self.port}')
+        self.writer.start()
+
+        if self.bulk_read:
+            self.read_bulk()
+        else:
+            self.read_lines()
+
+    def read_bulk(self):
+        extractor = self.extractor
         while not self.stop_event.is_set():
             try:
-                with self.serial_lock:
-                    line = self.ser.readline().decode('utf-8', errors='replace').strip()
+                # Esvaziar o buffer do SO de uma vez; sem dados, aguardar até o timeout por 1 byte
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+                if not chunk:
+                    continue
+                self.bytes_counter.inc(len(chunk))
+                invalid_before = extractor.invalid_frames
+                frames = extractor.feed(chunk)
+                if extractor.invalid_frames != invalid_before:
+                    self.invalid_counter.inc(extractor.invalid_frames - invalid_before)
+                    debug_log.warn(f"Quadros inválidos descartados: {extractor.invalid_frames - invalid_before}")
+                if frames:
+                    self.frames_counter.inc(len(frames))
+                    self.dispatch(frames)
+            except Exception as e:
+                if self.stop_event.is_set():
+                    # Porta fechada por stop() durante a leitura
+                    break
+                print("Erro ao ler dados da porta serial:")
+                traceback.print_exc()
+                break
+
+    def read_lines(self):
+        while not self.stop_event.is_set():
+            try:
+                raw = self.ser.readline()
+                self.bytes_counter.inc(len(raw))
+                line = raw.decode('utf-8', errors='replace').strip()
                 if line:
                     # Verificar se a linha está no formato correto
                     if line.startswith('BEGIN;') and line.endswith(';END'):
-                        print(f"Linha recebida: {line}")
-                        self.data_manager.process_line(line)
+                        self.frames_counter.inc()
+                        self.dispatch([line])
                     else:
-                        print(f"Linha inválida ignorada: {line}")
+                        self.invalid_counter.inc()
+                        debug_log.warn(f"Linha inválida ignorada: {line}")
                 else:
                     # Nenhum dado recebido, aguardar um pouco
                     pass
             except Exception as e:
+                if self.stop_event.is_set():
+                    # Porta fechada por stop() durante a leitura
+                    break
                 print("Erro ao ler dados da porta serial:")
                 traceback.print_exc()
                 break
 
+    def dispatch(self, frames):
+        if self.pipeline is not None:
+            self.pipeline.submit(frames)
+            return
+        if debug_log.enabled:
+            for line in frames:
+                debug_log.log(f"Linha recebida: {line}")
+        self.data_manager.process_lines(frames)
+
     def send_command(self, command):
-        with self.serial_lock:
-            if self.ser and self.ser.is_open:
-                try:
-                    self.ser.write(command.encode('utf-8'))
-                    print(f"Comando enviado: {command}")
-                except Exception as e:
-                    print(f"Erro ao enviar comando: {e}")
+        # Não bloqueia: speed/twist ainda não enviados são substituídos pelo mais recente
+        if self.writer is None or not (self.ser and self.ser.is_open):
+            print(f"Porta serial {self.port} não está aberta, comando ignorado: {command}")
+            return
+        self.writer.send(command)
 
     def stop(self):
         self.stop_event.set()
+        if self.writer:
+            self.writer.stop()
         if self.ser and self.ser.is_open:
             self.ser.close()
             print(f"Porta serial {self.port} fechada.")
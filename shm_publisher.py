@@ -0,0 +1,290 @@
+# shm_publisher.py
+#
+# Publica o snapshot mais recente e um anel com os últimos quadros de um
+# DataManager num segmento multiprocessing.shared_memory, para ferramentas de
+# análise em outros processos lerem sem cópia e sem sockets. Ler não gera
+# trabalho nenhum no processo de aquisição: o escritor só copia cada quadro
+# para o segmento, haja ou não leitores.
+#
+# Layout do segmento (little-endian, tudo alinhado em 8 bytes)
+# ------------------------------------------------------------
+#   0  '8s'  magic b'ODOMSHM\0'
+#   8  'I'   versão do layout (LAYOUT_VERSION)
+#  12  'I'   tamanho do cabeçalho (64)
+#  16  'I'   offset do esquema      20  'I'  tamanho do esquema
+#  24  'I'   offset do anel         28  'I'  tamanho de cada registro
+#  32  'I'   capacidade do anel     36  'I'  número de campos
+#  40  'Q'   count: total de quadros já escritos (o último é count - 1)
+#  48  'I'   pid do escritor        52  'I'  flags (bit 0: escritor encerrado)
+#  56  '8x'  reservado
+#
+# Esquema: JSON UTF-8 {"robot", "fields": [[nome, "int"|"float"], ...],
+# "format"}, onde format é o struct de um registro inteiro. Campos 'str' não
+# são publicados.
+#
+# Anel: `capacidade` registros; o quadro n (0, 1, 2...) fica no registro
+# n % capacidade, com '<QQd' (versão, seq do snapshot, timestamp monotônico do
+# processamento) seguido dos campos, 'q' para 'int' e 'd' para 'float'.
+#
+# Seqlock por registro: o escritor (único) grava versão = 2n + 1 antes de
+# escrever o quadro n, 2n + 2 depois, e só então atualiza count. Um leitor do
+# quadro n lê a versão, copia os campos e lê a versão de novo: a leitura é
+# consistente se as duas forem 2n + 2. Outro valor quer dizer quadro ainda não
+# escrito ou já sobrescrito por n + capacidade.
+
+import argparse
+import json
+import os
+import re
+import struct
+import time
+from multiprocessing import shared_memory
+from operator import itemgetter
+
+MAGIC = b'ODOMSHM\0'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<8sIIIIIIIIQII8x')
+COUNT = struct.Struct('<Q')
+COUNT_OFFSET = 40
+FLAGS_OFFSET = 52
+FLAG_CLOSED = 1
+VERSION = struct.Struct('<Q')
+RECORD_HEADER = '<QQd'
+
+# Tipo do campo -> código do struct (campos de outros tipos não entram)
+STRUCT_CODES = {'int': 'q', 'float': 'd'}
+
+
+def segment_name(name, robot=None):
+    """Nome do segmento de um robô; nomes de porta ('/dev/ttyUSB0', 'COM23') viram só letras e números"""
+    if robot is None:
+        return name
+    return f"{name}_{re.sub(r'[^A-Za-z0-9]+', '_', robot).strip('_')}"
+
+
+class SharedSnapshotPublisher:
+    """Escritor do segmento: copia cada snapshot publicado para o anel.
+
+    Chamado na thread de processamento do DataManager (via listeners), então
+    faz só empacotamentos em memória: sem lock, sem alocação por leitor.
+    """
+
+    def __init__(self, name, fields, capacity=4096, robot=''):
+        self.name = name
+        self.fields = [(field, kind) for field, kind in fields if kind in STRUCT_CODES]
+        self.names = [field for field, _ in self.fields]
+        self.capacity = capacity
+        self.record = struct.Struct(RECORD_HEADER + ''.join(STRUCT_CODES[kind] for _, kind in self.fields))
+        # Corpo do registro (sem a versão), escrito depois da versão ímpar
+        self.body = struct.Struct('<' + self.record.format[2:])
+        self.getter = itemgetter(*self.names) if len(self.names) > 1 else None
+        schema = json.dumps({'robot': robot, 'fields': self.fields, 'format': self.record.format}).encode('utf-8')
+        self.schema_offset = HEADER.size
+        self.ring_offset = self.schema_offset + (len(schema) + 7) // 8 * 8
+        size = self.ring_offset + capacity * self.record.size
+        self.shm = self._create(name, size)
+        self.buffer = self.shm.buf
+        self.buffer[self.schema_offset:self.schema_offset + len(schema)] = schema
+        HEADER.pack_into(self.buffer, 0, MAGIC, LAYOUT_VERSION, HEADER.size, self.schema_offset, len(schema),
+                         self.ring_offset, self.record.size, capacity, len(self.fields), 0, os.getpid(), 0)
+        self.count = 0
+        self.data_manager = None
+
+    @staticmethod
+    def _create(name, size):
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Sobra de uma execução que não terminou direito: recriar
+            print(f"Segmento de memória compartilhada {name} já existia; recriando.")
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    def attach(self, data_manager):
+        """Publicar os quadros deste DataManager (listener da thread de processamento)"""
+        self.data_manager = data_manager
+        data_manager.listeners.append(self.publish)
+
+    def values(self, data):
+        if self.getter is not None:
+            try:
+                return self.getter(data)
+            except KeyError:
+                pass
+        # Campos ausentes (outro layout do protocolo) viram 0
+        return [data.get(name) or 0 for name in self.names]
+
+    def publish(self, snapshots, lines=None):
+        buffer = self.buffer
+        pack_version = VERSION.pack_into
+        pack_body = self.body.pack_into
+        record_size = self.record.size
+        n = self.count
+        for snapshot in snapshots:
+            offset = self.ring_offset + (n % self.capacity) * record_size
+            pack_version(buffer, offset, 2 * n + 1)
+            try:
+                pack_body(buffer, offset + 8, snapshot.seq, snapshot.timestamp, *self.values(snapshot.data))
+            except struct.error:
+                # Valor fora do tipo declarado: gravar o que der e zerar o resto
+                values = [value if isinstance(value, (int, float)) else 0 for value in self.values(snapshot.data)]
+                pack_body(buffer, offset + 8, snapshot.seq, snapshot.timestamp, *values)
+            pack_version(buffer, offset, 2 * n + 2)
+            n += 1
+        self.count = n
+        COUNT.pack_into(buffer, COUNT_OFFSET, n)
+
+    def close(self):
+        """Marca o escritor como encerrado e remove o segmento"""
+        if self.data_manager is not None and self.publish in self.data_manager.listeners:
+            self.data_manager.listeners.remove(self.publish)
+        try:
+            struct.pack_into('<I', self.buffer, FLAGS_OFFSET, FLAG_CLOSED)
+            self.buffer = None
+            self.shm.close()
+            self.shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+class SharedSnapshotReader:
+    """Leitor do segmento, para uso em outro processo.
+
+    latest() e read() devolvem apenas quadros consistentes (conferidos pelo
+    seqlock). array() dá uma view NumPy sem cópia do anel inteiro, sem
+    conferência: use valid_from() depois de ler, como no TelemetryStore.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.buffer = self.shm.buf
+        (magic, layout, _, schema_offset, schema_size, self.ring_offset, self.record_size, self.capacity,
+         _, _, self.writer_pid, _) = HEADER.unpack_from(self.buffer, 0)
+        if os.name == 'posix' and self.writer_pid != os.getpid():
+            # O resource_tracker deste processo apagaria o segmento do escritor ao sair
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            self.close()
+            raise ValueError(f"Segmento {name} não é um snapshot compartilhado (versão {LAYOUT_VERSION})")
+        self.schema = json.loads(bytes(self.buffer[schema_offset:schema_offset + schema_size]))
+        self.robot = self.schema['robot']
+        self.fields = [tuple(field) for field in self.schema['fields']]
+        self.names = ('seq', 'timestamp', *(name for name, _ in self.fields))
+        self.record = struct.Struct(self.schema['format'])
+
+    @property
+    def count(self):
+        return COUNT.unpack_from(self.buffer, COUNT_OFFSET)[0]
+
+    @property
+    def closed(self):
+        """Verdadeiro quando o escritor encerrou"""
+        return bool(struct.unpack_from('<I', self.buffer, FLAGS_OFFSET)[0] & FLAG_CLOSED)
+
+    def first_index(self):
+        return max(0, self.count - self.capacity)
+
+    def valid_from(self, start):
+        """Indica se o quadro start ainda não começou a ser sobrescrito"""
+        return start > self.count - self.capacity
+
+    def read_record(self, n):
+        """Tupla (seq, timestamp, campos...) do quadro n, ou None se não estiver disponível"""
+        offset = self.ring_offset + (n % self.capacity) * self.record_size
+        expected = 2 * n + 2
+        values = self.record.unpack_from(self.buffer, offset)
+        if values[0] != expected or VERSION.unpack_from(self.buffer, offset)[0] != expected:
+            return None
+        return values[1:]
+
+    def latest(self, retries=3):
+        """Dicionário do quadro mais recente (com seq e timestamp), ou None se ainda não houver"""
+        for _ in range(retries):
+            count = self.count
+            if count == 0:
+                return None
+            values = self.read_record(count - 1)
+            if values is not None:
+                return dict(zip(self.names, values))
+        return None
+
+    def read(self, start=None, stop=None):
+        """Tuplas (seq, timestamp, campos...) dos quadros [start, stop) ainda disponíveis"""
+        count = self.count
+        start = self.first_index() if start is None else max(start, self.first_index())
+        stop = count if stop is None else min(stop, count)
+        records = []
+        for n in range(start, stop):
+            values = self.read_record(n)
+            if values is not None:
+                records.append(values)
+        return records
+
+    def wait(self, after, timeout=1.0, period=0.0005):
+        """Espera count passar de `after`; retorna o count atual"""
+        deadline = time.monotonic() + timeout
+        count = self.count
+        while count <= after and time.monotonic() < deadline:
+            time.sleep(period)
+            count = self.count
+        return count
+
+    def array(self):
+        """View NumPy estruturada (sem cópia) de todos os registros do anel"""
+        import numpy as np
+        codes = {'q': '<i8', 'd': '<f8'}
+        dtype = np.dtype([('version', '<u8'), ('seq', '<u8'), ('timestamp', '<f8')] +
+                         [(name, codes[STRUCT_CODES[kind]]) for name, kind in self.fields])
+        return np.ndarray((self.capacity,), dtype=dtype, buffer=self.buffer, offset=self.ring_offset)
+
+    def close(self):
+        self.buffer = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Ainda há views (ex.: array()) em uso
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leitor do snapshot compartilhado: imprime o quadro mais recente")
+    parser.add_argument('name', help="nome do segmento (opção --shm do main.py; com vários robôs, NOME_robô)")
+    parser.add_argument('--field', action='append', dest='fields', help="campo a mostrar (repetir; padrão: todos)")
+    parser.add_argument('--rate', type=float, default=10.0, help="linhas impressas por segundo")
+    parser.add_argument('--json', action='store_true', help="imprimir uma linha JSON por quadro")
+    args = parser.parse_args()
+
+    reader = SharedSnapshotReader(args.name)
+    print(f"Robô {reader.robot}: {len(reader.fields)} campos, anel de {reader.capacity} quadros")
+    try:
+        last = 0
+        while not reader.closed:
+            count = reader.wait(last)
+            if count == last:
+                continue
+            last = count
+            frame = reader.latest()
+            if frame is None:
+                continue
+            if args.fields:
+                frame = {key: frame[key] for key in ('seq', 'timestamp', *args.fields) if key in frame}
+            # Mesmo relógio monotônico do sistema nos dois processos
+            age = (time.monotonic() - frame['timestamp']) * 1000
+            if args.json:
+                print(json.dumps(frame))
+            else:
+                print(f"[{age:6.2f} ms] " + ' '.join(f'{key}={value}' for key, value in frame.items()))
+            time.sleep(1.0 / args.rate)
+        print("Escritor encerrado.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
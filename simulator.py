@@ -0,0 +1,379 @@
+# simulator.py
+#
+# Robô simulado num pseudo-terminal (POSIX): o programa abre o lado escravo
+# como se fosse a porta serial do robô, ex.:
+#
+#   python simulator.py --rate 200 --profile circle --link /tmp/robot1
+#   python main.py --port /tmp/robot1
+#
+# Os quadros seguem o layout padrão do DataManager. getEllapsedTime é o
+# relógio monotônico do simulador (s desde o início) no momento da escrita,
+# o que permite medir a latência fio → snapshot no mesmo computador.
+
+import argparse
+import math
+import os
+import random
+import select
+import threading
+import time
+import traceback
+import tty
+from data_manager import DataManager
+
+# Perfis de movimento: nome -> função (simulador, t) -> (v em m/s, w em rad/s)
+MOTION_PROFILES = {
+    'stop': lambda sim, t: (0.0, 0.0),
+    'line': lambda sim, t: (0.5, 0.0),
+    'circle': lambda sim, t: (0.5, 0.5),
+    # 4 s em frente e um giro de 90 graus no lugar
+    'square': lambda sim, t: (0.5, 0.0) if t % (4 + math.pi / 2) < 4 else (0.0, 1.0),
+    'random': lambda sim, t: sim.random_motion(t),
+}
+
+# Tipos de corrupção sorteados com probabilidade `corrupt` por quadro
+CORRUPTIONS = ('garbage', 'truncate', 'value', 'fields')
+
+# Valores fixos dos campos que o simulador não modela
+STATIC_VALUES = {
+    'PROTOCOL_VERSION': '3',
+    'BMS_ChargeDischargeCycle': 12.0,
+    'FixedValue1': 1,
+    'FixedValue2': 2,
+    'FixedValue3': 3,
+    'BMS_Pressure': 1.5,
+    'BMS_SOC': 80.0,
+    'adVoltageInt': 25000,
+    'BMS_Current_mA': -1500,
+    'inputCurrent': 0.0,
+    'ChargerConnected': 0,
+    'FixedValue4': 4,
+    'BMS_EXT_SOC': 80.0,
+    'externalAdVoltageInt': 25000,
+}
+
+
+class RobotSimulator(threading.Thread):
+    """Gera quadros 'BEGIN;...;END' num pseudo-terminal e atende comandos.
+
+    rate é a taxa de quadros (Hz); 0 envia o máximo possível. Com baud > 0 a
+    saída é limitada a baud / 10 bytes/s (8N1), como numa UART real; baud=0 não
+    limita. Quadros que não cabem no buffer do pseudo-terminal (leitor atrasado)
+    são perdidos, como num estouro da UART, e contados em overrun_frames.
+
+    Comandos 'speed:esq:dir@' (m/s por roda) e 'twist:v:w@' (m/s, rad/s)
+    substituem o perfil de movimento; NumberOfReceivedConfigs conta os
+    comandos recebidos.
+    """
+
+    def __init__(self, rate=100.0, baud=921600, profile='circle', corrupt=0.0, split=0,
+                 counter_bits=None, seed=None, link=None):
+        super().__init__(name='RobotSimulator', daemon=True)
+        if profile not in MOTION_PROFILES:
+            raise ValueError(f"Perfil de movimento desconhecido: {profile}")
+        self.rate = rate
+        self.baud = baud
+        self.profile = profile
+        self.corrupt = corrupt
+        self.split = split  # Tamanho máximo de cada escrita (quadros partidos); 0 = quadro inteiro
+        self.counter_bits = counter_bits
+        self.random = random.Random(seed)
+        self.link = link
+
+        # Layout e dimensões do robô iguais aos do DataManager
+        data_manager = DataManager(history_capacity=0)
+        self.fields = data_manager.protocols.default.fields
+        self.counts_per_meter = data_manager.COUNTS_PER_METER
+        self.wheel_base = data_manager.WHEEL_BASE
+
+        # Estado do robô: pose verdadeira e distância de cada roda
+        self.x = self.y = self.th = 0.0
+        self.left_distance = self.right_distance = 0.0
+        self.wheel_speeds = (0.0, 0.0)
+        self.command_speeds = None  # Velocidades pedidas por comando (substituem o perfil)
+        self.random_target = (0.0, 0.0, -1.0)  # (v, w, até quando) do perfil 'random'
+        self.reported_ms = 0
+        self.last_t = 0.0
+
+        self.start_time = None
+        self.master = None
+        self.slave = None
+        self.port = None
+        self.command_buffer = bytearray()
+        self.stop_event = threading.Event()
+        self.paused = False  # Pausado: não gera quadros, mas continua atendendo comandos
+        self.ready = threading.Event()
+
+        # Contadores (lidos pelo benchmark)
+        self.frames_sent = 0       # Quadros válidos gerados
+        self.corrupted_frames = 0  # Quadros corrompidos de propósito (não devem ser aceitos)
+        self.overrun_frames = 0    # Quadros perdidos com o buffer do pseudo-terminal cheio
+        self.bytes_sent = 0
+        self.commands_received = 0
+        self.unknown_commands = 0
+
+    def open(self):
+        """Cria o par de pseudo-terminais; retorna o caminho do lado escravo"""
+        self.master, self.slave = os.openpty()
+        # Modo raw: sem eco dos comandos e sem conversão de fim de linha
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        if self.link:
+            if os.path.islink(self.link):
+                os.unlink(self.link)
+            os.symlink(self.port, self.link)
+        return self.link or self.port
+
+    def run(self):
+        if self.master is None:
+            self.open()
+        self.start_time = time.monotonic()
+        self.ready.set()
+        try:
+            while not self.stop_event.is_set():
+                timeout = self.send_due_frames()
+                readable, _, _ = select.select([self.master], [], [], timeout)
+                if readable:
+                    self.read_commands()
+        except Exception:
+            if not self.stop_event.is_set():
+                print("Erro no simulador:")
+                traceback.print_exc()
+        finally:
+            self.close()
+
+    def send_due_frames(self):
+        """Escreve os quadros devidos até agora; retorna quanto esperar pelo próximo"""
+        elapsed = time.monotonic() - self.start_time
+        if self.paused:
+            return 0.05
+        if self.rate > 0:
+            due = int(elapsed * self.rate) + 1 - self.frames_sent - self.corrupted_frames
+        else:
+            due = 64
+        budget = elapsed * self.baud / 10 - self.bytes_sent if self.baud else None
+        while due > 0 and (budget is None or budget >= 0):
+            data = self.next_frame()
+            self.write(data)
+            due -= 1
+            if budget is not None:
+                budget -= len(data)
+        if self.rate <= 0 and (budget is None or budget >= 0):
+            return 0
+        waits = []
+        if self.rate > 0:
+            waits.append((self.frames_sent + self.corrupted_frames) / self.rate - elapsed)
+        if budget is not None and budget < 0:
+            waits.append(-budget * 10 / self.baud)
+        return min(max(max(waits), 0.0), 0.05)
+
+    def next_frame(self, t=None):
+        """Avança o robô até t (padrão: agora) e codifica o quadro (bytes)"""
+        if t is None:
+            t = time.monotonic() - self.start_time
+        self.step(t)
+        values = self.frame_values(t)
+        parts = []
+        for name, kind in self.fields:
+            value = values.get(name, 0)
+            if kind == 'float':
+                parts.append(f'{value:.6f}' if name == 'getEllapsedTime' else f'{value:.4f}')
+            elif kind == 'int':
+                parts.append(str(int(value)))
+            else:
+                parts.append(str(value))
+        if self.corrupt and self.random.random() < self.corrupt:
+            return self.corrupt_frame(parts)
+        self.frames_sent += 1
+        return ('BEGIN;' + ';'.join(parts) + ';END\r\n').encode('ascii')
+
+    def corrupt_frame(self, parts):
+        kind = self.random.choice(CORRUPTIONS)
+        frame = ('BEGIN;' + ';'.join(parts) + ';END\r\n').encode('ascii')
+        if kind == 'garbage':
+            # Lixo entre quadros: o quadro em si continua válido
+            self.frames_sent += 1
+            return bytes(self.random.randrange(32, 127) for _ in range(self.random.randint(1, 32))) + frame
+        self.corrupted_frames += 1
+        if kind == 'truncate':
+            return frame[:self.random.randint(len('BEGIN;'), len(frame) - len(';END\r\n'))]
+        if kind == 'value':
+            parts[self.random.randrange(1, len(parts))] = '#?'
+        else:
+            del parts[self.random.randrange(1, len(parts))]
+        return ('BEGIN;' + ';'.join(parts) + ';END\r\n').encode('ascii')
+
+    def write(self, data):
+        if self.split:
+            pieces = []
+            while data:
+                size = self.random.randint(1, self.split)
+                pieces.append(data[:size])
+                data = data[size:]
+        else:
+            pieces = [data]
+        for piece in pieces:
+            try:
+                written = os.write(self.master, piece)
+            except BlockingIOError:
+                written = 0
+            self.bytes_sent += written
+            if written < len(piece):
+                # Buffer cheio: o resto do quadro se perde (o leitor ressincroniza no próximo BEGIN)
+                self.overrun_frames += 1
+                return
+
+    def motion(self, t):
+        if self.command_speeds is not None:
+            return self.command_speeds
+        v, w = MOTION_PROFILES[self.profile](self, t)
+        return v - w * self.wheel_base / 2, v + w * self.wheel_base / 2
+
+    def random_motion(self, t):
+        v, w, until = self.random_target
+        if t >= until:
+            v, w = self.random.uniform(-0.2, 0.8), self.random.uniform(-1.0, 1.0)
+            self.random_target = (v, w, t + self.random.uniform(0.5, 2.0))
+        return v, w
+
+    def step(self, t):
+        dt = t - self.last_t
+        self.last_t = t
+        left, right = self.wheel_speeds = self.motion(t)
+        self.left_distance += left * dt
+        self.right_distance += right * dt
+        delta_s = (left + right) / 2 * dt
+        delta_theta = (right - left) / self.wheel_base * dt
+        self.x += delta_s * math.cos(self.th + delta_theta / 2)
+        self.y += delta_s * math.sin(self.th + delta_theta / 2)
+        self.th = math.atan2(math.sin(self.th + delta_theta), math.cos(self.th + delta_theta))
+
+    def encoder(self, distance):
+        count = round(distance * self.counts_per_meter)
+        if self.counter_bits:
+            count %= 1 << self.counter_bits
+        return count
+
+    def frame_values(self, t):
+        left, right = self.wheel_speeds
+        # DeltaTimeOdometry em ms inteiros, sem perder a fração acumulada
+        total_ms = round(t * 1000)
+        delta_ms = total_ms - self.reported_ms
+        self.reported_ms = total_ms
+        left_count = self.encoder(self.left_distance)
+        right_count = self.encoder(self.right_distance)
+        values = dict(STATIC_VALUES)
+        values.update({
+            'getEllapsedTime': t,
+            'PositionActual1': left_count,
+            'PositionActual2': right_count,
+            'DeltaTimeOdometry': delta_ms,
+            'leftEncoderSensor1NbPulsesNow': left_count,
+            'rightEncoderSensor1NbPulsesNow': right_count,
+            'shortLeftEncoderNbPulsesNow': left_count,
+            'shortRightEncoderNbPulsesNow': right_count,
+            'leftSpeed_act': left,
+            'rightSpeed_act': right,
+            'currentSensorMotorLeftAverage': 0.2 + abs(left),
+            'currentSensorMotorRightAverage': 0.2 + abs(right),
+            'odom_x2': self.x,
+            'odom_y2': self.y,
+            'odom_th2': self.th,
+            'odom_vx2': (left + right) / 2,
+            'odom_vth2': (right - left) / self.wheel_base,
+            'NumberOfReceivedConfigs': self.commands_received,
+            'odom_x3': self.x,
+            'odom_y3': self.y,
+            'odom_th3': self.th,
+        })
+        return values
+
+    def read_commands(self):
+        try:
+            data = os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        self.command_buffer += data
+        *commands, rest = self.command_buffer.split(b'@')
+        self.command_buffer = bytearray(rest)
+        for command in commands:
+            self.handle_command(command.decode('ascii', errors='replace').strip())
+
+    def handle_command(self, command):
+        kind, _, args = command.partition(':')
+        try:
+            values = [float(value) for value in args.split(':')] if args else []
+        except ValueError:
+            values = []
+        if kind == 'speed' and len(values) == 2:
+            self.command_speeds = (values[0], values[1])
+        elif kind == 'twist' and len(values) == 2:
+            v, w = values
+            self.command_speeds = (v - w * self.wheel_base / 2, v + w * self.wheel_base / 2)
+        else:
+            self.unknown_commands += 1
+            return
+        self.commands_received += 1
+
+    def stats(self):
+        return {
+            'frames_sent': self.frames_sent,
+            'corrupted_frames': self.corrupted_frames,
+            'overrun_frames': self.overrun_frames,
+            'bytes_sent': self.bytes_sent,
+            'commands_received': self.commands_received,
+            'unknown_commands': self.unknown_commands,
+        }
+
+    def pause(self):
+        self.paused = True
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=2)
+        else:
+            self.close()
+
+    def close(self):
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master = self.slave = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Robô simulado num pseudo-terminal")
+    parser.add_argument('--rate', type=float, default=100.0, help="quadros por segundo (0 = o máximo possível)")
+    parser.add_argument('--baud', type=int, default=921600, help="limitar a saída a este baud rate (0 = sem limite)")
+    parser.add_argument('--profile', choices=sorted(MOTION_PROFILES), default='circle', help="perfil de movimento")
+    parser.add_argument('--corrupt', type=float, default=0.0, help="probabilidade de corromper cada quadro")
+    parser.add_argument('--split', type=int, default=0, help="partir as escritas em pedaços de até N bytes")
+    parser.add_argument('--counter-bits', type=int, help="largura dos contadores dos encoders (estouro)")
+    parser.add_argument('--seed', type=int, help="semente do gerador aleatório")
+    parser.add_argument('--link', help="criar este link simbólico para a porta (ex.: /tmp/robot1)")
+    parser.add_argument('--status-interval', type=float, default=5.0, help="segundos entre resumos")
+    args = parser.parse_args()
+
+    simulator = RobotSimulator(args.rate, args.baud, args.profile, args.corrupt, args.split,
+                               args.counter_bits, args.seed, args.link)
+    print(f"Robô simulado em {simulator.open()}")
+    simulator.start()
+    try:
+        while simulator.is_alive():
+            time.sleep(args.status_interval)
+            print(', '.join(f'{key}={value}' for key, value in simulator.stats().items()))
+    except KeyboardInterrupt:
+        print("Encerrando o simulador...")
+    finally:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
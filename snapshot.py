@@ -0,0 +1,54 @@
+# snapshot.py
+
+import time
+from types import MappingProxyType
+
+
+class Snapshot:
+    """Quadro processado imutável, com número de sequência monotônico"""
+
+    __slots__ = ('seq', 'timestamp', 'data')
+
+    def __init__(self, seq, timestamp, data):
+        self.seq = seq
+        self.timestamp = timestamp  # time.monotonic() do processamento
+        self.data = MappingProxyType(data)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+
+EMPTY_SNAPSHOT = Snapshot(0, 0.0, {})
+
+
+class SnapshotPublisher:
+    """Publica snapshots por troca atômica de referência.
+
+    Há um único escritor (a thread que processa os quadros). Leitores apenas leem
+    o atributo `current`, o que é atômico no CPython, então não há lock nem cópia:
+    quem publica nunca altera o dicionário depois de publicá-lo.
+    """
+
+    def __init__(self):
+        self.current = EMPTY_SNAPSHOT
+
+    def publish(self, data, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        snapshot = Snapshot(self.current.seq + 1, timestamp, data)
+        self.current = snapshot
+        return snapshot
+
+    def latest(self):
+        return self.current
+
+    def get_if_newer(self, seq):
+        """Retorna o snapshot atual se for mais novo que seq, senão None"""
+        snapshot = self.current
+        if snapshot.seq > seq:
+            return snapshot
+        return None
+
+    def reset(self):
+        # Um snapshot vazio novo mantém a sequência crescente para os leitores
+        self.publish({})
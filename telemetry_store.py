@@ -0,0 +1,146 @@
+# telemetry_store.py
+
+from array import array
+
+# Colunas numéricas usam array tipado; 'str' fica em lista comum
+TYPECODES = {
+    'int': 'q',
+    'float': 'd',
+}
+
+
+class TelemetryStore:
+    """Histórico colunar de quadros com buffer circular de capacidade fixa por campo.
+
+    Um único escritor (a thread que processa os quadros) chama append(). Leitores
+    obtêm views sem cópia das colunas; como o buffer é circular, um intervalo pode
+    vir em até dois segmentos. Dados antigos podem ser sobrescritos enquanto um
+    leitor os percorre, por isso leitores devem conferir valid_from() depois de ler.
+    """
+
+    def __init__(self, fields, capacity=65536):
+        self.capacity = capacity
+        self.count = 0  # Total de quadros já adicionados (índice lógico do próximo)
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.columns = {}
+        self.types = {}
+        for name, field_type in fields:
+            if name in self.columns:
+                continue
+            self.types[name] = field_type
+            if field_type in TYPECODES:
+                column = array(TYPECODES[field_type], bytes(8 * capacity))
+            else:
+                column = [None] * capacity
+            self.columns[name] = column
+        self._names = tuple(self.columns)
+        self._column_list = tuple(self.columns.values())
+        self._defaults = tuple(
+            (name, column, 0 if self.types[name] in TYPECODES else None)
+            for name, column in self.columns.items()
+        )
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, frame, timestamp):
+        """Adiciona um quadro (dicionário) em O(1); campos ausentes viram 0/None"""
+        i = self.count % self.capacity
+        self.timestamps[i] = timestamp
+        try:
+            if tuple(frame) == self._names:
+                # Caminho rápido: quadro com exatamente as colunas, na mesma ordem
+                for column, value in zip(self._column_list, frame.values()):
+                    column[i] = value
+            else:
+                get = frame.get
+                for name, column, default in self._defaults:
+                    column[i] = get(name, default)
+        except (TypeError, ValueError, OverflowError):
+            # Outro layout do protocolo com tipo diferente no mesmo campo
+            self._append_coerced(frame, i)
+        self.count += 1
+
+    def _append_coerced(self, frame, i):
+        """Grava a linha i convertendo cada valor para o tipo da coluna; o que não converter vira 0/None"""
+        get = frame.get
+        for name, column, default in self._defaults:
+            value = get(name, default)
+            try:
+                column[i] = value
+            except (TypeError, ValueError, OverflowError):
+                try:
+                    column[i] = int(value) if self.types[name] == 'int' else float(value)
+                except (TypeError, ValueError, OverflowError):
+                    column[i] = default
+
+    def clear(self):
+        self.count = 0
+
+    def first_index(self):
+        """Índice lógico do quadro mais antigo ainda disponível"""
+        return max(0, self.count - self.capacity)
+
+    def valid_from(self, start):
+        """Indica se o índice lógico start ainda não foi sobrescrito"""
+        return start >= self.first_index()
+
+    def _bounds(self, start, stop):
+        first = self.first_index()
+        start = first if start is None else max(start, first)
+        stop = self.count if stop is None else min(stop, self.count)
+        return start, max(start, stop)
+
+    def segments(self, start=None, stop=None):
+        """Faixas físicas (início, fim) que cobrem o intervalo lógico [start, stop)"""
+        start, stop = self._bounds(start, stop)
+        if start == stop:
+            return []
+        begin = start % self.capacity
+        end = begin + (stop - start)
+        if end <= self.capacity:
+            return [(begin, end)]
+        return [(begin, self.capacity), (0, end - self.capacity)]
+
+    def view(self, name, start=None, stop=None):
+        """Lista de memoryviews (sem cópia) da coluna no intervalo lógico [start, stop)"""
+        column = self.timestamps if name == 'timestamp' else self.columns[name]
+        if isinstance(column, list):
+            return [column[a:b] for a, b in self.segments(start, stop)]
+        buffer = memoryview(column)
+        return [buffer[a:b] for a, b in self.segments(start, stop)]
+
+    def values(self, name, start=None, stop=None):
+        """Cópia do intervalo como lista, para quem não precisa de zero-copy"""
+        result = []
+        for segment in self.view(name, start, stop):
+            result.extend(segment)
+        return result
+
+    def timestamp_at(self, index):
+        return self.timestamps[index % self.capacity]
+
+    def index_at_time(self, t):
+        """Primeiro índice lógico com timestamp >= t (busca binária no buffer circular)"""
+        low, high = self.first_index(), self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.timestamps[mid % self.capacity] < t:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def time_range(self, t0=None, t1=None):
+        """Intervalo lógico [start, stop) com timestamps em [t0, t1)"""
+        start = self.first_index() if t0 is None else self.index_at_time(t0)
+        stop = self.count if t1 is None else self.index_at_time(t1)
+        return start, max(start, stop)
+
+    def view_time(self, name, t0=None, t1=None):
+        return self.view(name, *self.time_range(t0, t1))
+
+    def latest(self, name):
+        if self.count == 0:
+            return None
+        return self.columns[name][(self.count - 1) % self.capacity]
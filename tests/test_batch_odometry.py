@@ -0,0 +1,91 @@
+# tests/test_batch_odometry.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_odometry import (BATCH_ESTIMATORS, compute_odometry_like, load_session_columns, normalize_angles,
+                            session_fields)
+from data_manager import DataManager
+from frame_parser import DEFAULT_SCHEMA_PATH
+from recorder import SessionRecorder
+from simulator import RobotSimulator
+
+# O lote deve reproduzir o cálculo por amostra até o arredondamento da normalização do ângulo
+TOLERANCE = 1e-9
+COUNTER_BITS = 12
+
+
+def other_version(line):
+    """Mesmo quadro no layout da versão 4 de teste: campos depois de PROTOCOL_VERSION invertidos"""
+    values = line[len('BEGIN;'):-len(';END')].split(';')
+    return 'BEGIN;' + ';'.join(['4'] + values[1:][::-1]) + ';END'
+
+
+class BatchOdometryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.session = os.path.join(self.directory, 'sessao.rec')
+        self.schema = os.path.join(self.directory, 'schemas.json')
+        with open(DEFAULT_SCHEMA_PATH, encoding='utf-8') as f:
+            default = json.load(f)['default']
+        with open(self.schema, 'w', encoding='utf-8') as f:
+            json.dump({'default': default, 'versions': {'4': default[:1] + default[1:][::-1]}}, f)
+        # Contadores de 12 bits estouram várias vezes; quadros inválidos e de outra versão no meio
+        simulator = RobotSimulator(rate=50.0, baud=0, profile='random', seed=2, counter_bits=COUNTER_BITS)
+        self.lines = []
+        for i in range(3000):
+            line = simulator.next_frame(i / 50.0).decode('ascii').strip()
+            if i % 7 == 3:
+                line = other_version(line)
+            elif i % 101 == 50:
+                line = line.replace(';END', ';1;END')  # Campo a mais: ignorado pelos dois caminhos
+            elif i % 131 == 60:
+                line = line.replace('BEGIN;3;', 'BEGIN;3;#?')  # Valor inválido
+            self.lines.append(line)
+        recorder = SessionRecorder(self.session, source=None, chunk_bytes=16 * 1024)
+        for i, line in enumerate(self.lines):
+            recorder.add_record(i * 20_000_000, line)
+        recorder.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def data_manager(self):
+        data_manager = DataManager(schema_path=self.schema, history_capacity=0)
+        data_manager.ENCODER_COUNTER_BITS = COUNTER_BITS
+        return data_manager
+
+    def test_batch_matches_streaming(self):
+        streaming = self.data_manager()
+        trajectories = {name: [] for name in BATCH_ESTIMATORS}
+        for data in streaming.process_lines(self.lines):
+            for name in trajectories:
+                trajectories[name].append((data[f'{name}_x'], data[f'{name}_y'], data[f'{name}_th']))
+
+        data_manager = self.data_manager()
+        columns = load_session_columns(self.session, session_fields(), data_manager.protocols,
+                                       data_manager.diff_sources)
+        results = compute_odometry_like(data_manager, columns)
+
+        self.assertEqual(len(columns['timestamp_ns']), len(trajectories['odom4']))
+        self.assertLess(len(columns['timestamp_ns']), len(self.lines))
+        for name, (x, y, th) in results.items():
+            expected = np.asarray(trajectories[name])
+            np.testing.assert_allclose(x, expected[:, 0], rtol=0, atol=TOLERANCE)
+            np.testing.assert_allclose(y, expected[:, 1], rtol=0, atol=TOLERANCE)
+            # Ângulos perto de +-pi podem cair em lados opostos do corte
+            self.assertLess(np.abs(normalize_angles(th - expected[:, 2])).max(), TOLERANCE)
+            # A sessão andou de verdade (a comparação não é entre zeros)
+            self.assertGreater(np.abs(expected[:, :2]).max(), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
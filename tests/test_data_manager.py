@@ -0,0 +1,36 @@
+# tests/test_data_manager.py
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+from simulator import RobotSimulator
+
+
+def simulated_lines(count, rate=50.0, **options):
+    simulator = RobotSimulator(rate=rate, baud=0, profile='random', seed=1, **options)
+    return [simulator.next_frame(i / rate).decode('ascii').strip() for i in range(count)]
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_returned_frame_does_not_alias_snapshot(self):
+        data_manager = DataManager(history_capacity=0)
+        results = data_manager.process_lines(simulated_lines(3))
+        snapshot = data_manager.get_snapshot()
+        before = dict(snapshot.data)
+        results[-1]['odom4_x'] = 'alterado'
+        results[-1]['novo'] = 1
+        self.assertEqual(dict(data_manager.get_snapshot().data), before)
+
+    def test_snapshot_is_read_only(self):
+        data_manager = DataManager(history_capacity=0)
+        data_manager.process_lines(simulated_lines(1))
+        with self.assertRaises(TypeError):
+            data_manager.get_snapshot().data['odom4_x'] = 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# tests/test_fanout_server.py
+
+import os
+import struct
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fanout_server import FrameEncoder
+
+
+def snapshot(**data):
+    return SimpleNamespace(seq=1, timestamp=0.0, data=data)
+
+
+class FrameEncoderTest(unittest.TestCase):
+    def setUp(self):
+        self.encoder = FrameEncoder([('a', 'int'), ('b', 'float'), ('s', 'str')])
+
+    def decode(self, body):
+        a, b = self.encoder.struct.unpack_from(body)
+        (length,) = struct.unpack_from('<H', body, self.encoder.struct.size)
+        start = self.encoder.struct.size + 2
+        return a, b, body[start:start + length].decode('utf-8')
+
+    def test_encode(self):
+        self.assertEqual(self.decode(self.encoder.encode(snapshot(a=3, b=1.5, s='ok'))), (3, 1.5, 'ok'))
+
+    def test_missing_fields_are_zero(self):
+        self.assertEqual(self.decode(self.encoder.encode(snapshot())), (0, 0.0, ''))
+
+    def test_value_of_other_type_is_coerced(self):
+        # Outro PROTOCOL_VERSION com float num campo int, texto num campo float
+        body = self.encoder.encode(snapshot(a=-1500.7, b='x', s='ok'))
+        self.assertEqual(self.decode(body), (-1500, 0.0, 'ok'))
+        body = self.encoder.encode(snapshot(a=float('inf'), b=2 ** 70, s=''))
+        self.assertEqual(self.decode(body), (0, float(2 ** 70), ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
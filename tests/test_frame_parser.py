@@ -0,0 +1,89 @@
+# tests/test_frame_parser.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+from frame_parser import FieldCountError, FrameParser, ProtocolRegistry, infer_field_type
+from simulator import RobotSimulator
+
+FIELDS = [('PROTOCOL_VERSION', 'str'), ('count', 'int'), ('speed', 'float')]
+
+
+class FrameParserTest(unittest.TestCase):
+    def test_parse_converts_types(self):
+        parser = FrameParser(FIELDS)
+        self.assertEqual(parser.parse(['3', '42', '1.5']), {'PROTOCOL_VERSION': '3', 'count': 42, 'speed': 1.5})
+
+    def test_empty_values_tolerated(self):
+        parser = FrameParser(FIELDS)
+        self.assertEqual(parser.parse(['3', '', '42', '1.5', '']), {'PROTOCOL_VERSION': '3', 'count': 42,
+                                                                      'speed': 1.5})
+
+    def test_wrong_field_count(self):
+        with self.assertRaises(FieldCountError) as context:
+            FrameParser(FIELDS).parse(['3', '42'])
+        self.assertEqual((context.exception.expected, context.exception.received), (3, 2))
+
+    def test_invalid_value(self):
+        with self.assertRaises(ValueError):
+            FrameParser(FIELDS).parse(['3', '4.2', '1.5'])
+
+    def test_field_types_inferred_from_names(self):
+        self.assertEqual(FrameParser(['PROTOCOL_VERSION', 'BMS_Current_mA', 'odom_x2']).types,
+                         ('str', 'int', 'float'))
+        self.assertEqual(infer_field_type('shortLeftEncoderNbPulsesNow'), 'int')
+
+    def test_unknown_type_rejected(self):
+        with self.assertRaises(ValueError):
+            FrameParser([('x', 'double')])
+
+
+class ProtocolRegistryTest(unittest.TestCase):
+    def test_parser_chosen_by_version(self):
+        registry = ProtocolRegistry(FIELDS, {'4': [('PROTOCOL_VERSION', 'str'), ('speed', 'float')]})
+        self.assertEqual(registry.parse_line('BEGIN;4;2.5;END'), {'PROTOCOL_VERSION': '4', 'speed': 2.5})
+        # Versão sem layout próprio usa o padrão
+        self.assertEqual(registry.parse_line('BEGIN;9;1;2.0;END'), {'PROTOCOL_VERSION': '9', 'count': 1,
+                                                                    'speed': 2.0})
+
+    def test_from_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'schemas.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'default': FIELDS, 'versions': {'4': ['PROTOCOL_VERSION', 'BMS_Current_mA']}}, f)
+            registry = ProtocolRegistry.from_file([('ignorado', 'int')], path)
+            self.assertEqual(registry.default.names, ('PROTOCOL_VERSION', 'count', 'speed'))
+            self.assertEqual(registry.parser_for('4').types, ('str', 'int'))
+            # Sem arquivo: layout passado pelo chamador
+            self.assertEqual(ProtocolRegistry.from_file(FIELDS, os.path.join(directory, 'nao_existe.json'))
+                             .default.names, ('PROTOCOL_VERSION', 'count', 'speed'))
+        finally:
+            shutil.rmtree(directory)
+
+
+class InvalidFrameCountingTest(unittest.TestCase):
+    def test_invalid_frames_counted_and_skipped(self):
+        data_manager = DataManager(history_capacity=0)
+        simulator = RobotSimulator(rate=50.0, baud=0, profile='random', seed=1)
+        good = [simulator.next_frame(i / 50.0).decode('ascii').strip() for i in range(3)]
+        values = good[1][len('BEGIN;'):-len(';END')].split(';')
+        missing = 'BEGIN;' + ';'.join(values[:-1]) + ';END'
+        invalid = 'BEGIN;' + ';'.join(values[:5] + ['#?'] + values[6:]) + ';END'
+        wrong_count = data_manager.wrong_count_counter.value
+        invalid_values = data_manager.invalid_values_counter.value
+        results = data_manager.process_lines([good[0], missing, invalid, good[2]])
+        self.assertEqual(len(results), 2)
+        self.assertEqual(data_manager.wrong_count_counter.value - wrong_count, 1)
+        self.assertEqual(data_manager.invalid_values_counter.value - invalid_values, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# tests/test_pipeline.py
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import BoundedQueue
+
+
+class BoundedQueueTest(unittest.TestCase):
+    def test_unknown_policy_rejected(self):
+        with self.assertRaises(ValueError):
+            BoundedQueue('fila', policy='lifo')
+
+    def test_drop_oldest_keeps_newest(self):
+        queue = BoundedQueue('fila', maxsize=4, policy='drop_oldest')
+        queue.put_many(range(10))
+        self.assertEqual(queue.get_batch(100), [6, 7, 8, 9])
+        self.assertEqual((queue.accepted, queue.dropped), (10, 6))
+
+    def test_decimate_above_half(self):
+        queue = BoundedQueue('fila', maxsize=10, policy='decimate', decimate=3)
+        queue.put_many(range(5))
+        # Acima da metade só 1 a cada 3 entra
+        queue.put_many(range(5, 11))
+        self.assertEqual(queue.get_batch(100), [0, 1, 2, 3, 4, 7, 10])
+        self.assertEqual(queue.dropped, 4)
+
+    def test_block_times_out_and_counts_drop(self):
+        queue = BoundedQueue('fila', maxsize=2, policy='block')
+        queue.put_many([1, 2])
+        queue.put(3, timeout=0.01)
+        self.assertEqual(queue.get_batch(100), [1, 2])
+        self.assertEqual(queue.dropped, 1)
+
+    def test_block_waits_for_consumer(self):
+        queue = BoundedQueue('fila', maxsize=2, policy='block')
+        received = []
+
+        def consume():
+            while len(received) < 100:
+                received.extend(queue.get_batch(10, timeout=1.0))
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        queue.put_many(range(100))
+        consumer.join(5)
+        self.assertEqual(received, list(range(100)))
+        self.assertEqual(queue.dropped, 0)
+        self.assertLessEqual(queue.max_depth, 2)
+
+    def test_get_batch_after_close(self):
+        queue = BoundedQueue('fila')
+        queue.close()
+        self.assertEqual(queue.get_batch(10, timeout=1.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# tests/test_recorder.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+from recorder import SessionReader, SessionRecorder
+from replay import ReplayEngine
+from simulator import RobotSimulator
+
+ODOMETRY_KEYS = ('odom4_x', 'odom4_y', 'odom4_th', 'odom5_x', 'odom5_y', 'odom5_th')
+
+
+def simulated_lines(count, rate=50.0):
+    simulator = RobotSimulator(rate=rate, baud=0, profile='random', seed=1)
+    return [simulator.next_frame(i / rate).decode('ascii').strip() for i in range(count)]
+
+
+def write_session(path, records, chunk_bytes=256 * 1024):
+    # Sem a thread: add_record/close direto, como a thread faria com a fila
+    recorder = SessionRecorder(path, source=None, chunk_bytes=chunk_bytes)
+    for t_ns, line in records:
+        recorder.add_record(t_ns, line)
+    recorder.close()
+
+
+class RecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'sessao.rec')
+        # Quatro quadros por leitura da serial, todos com o mesmo timestamp
+        lines = simulated_lines(400)
+        self.records = [(1_000_000_000 + (i // 4) * 80_000_000, line) for i, line in enumerate(lines)]
+        write_session(self.path, self.records, chunk_bytes=4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        reader = SessionReader(self.path)
+        try:
+            self.assertGreater(len(reader.chunks), 1)
+            self.assertEqual(len(reader), len(self.records))
+            self.assertEqual(list(reader.iter_frames()), self.records)
+            self.assertEqual(reader.time_range(), (self.records[0][0], self.records[-1][0]))
+        finally:
+            reader.close()
+
+    def test_time_range_query(self):
+        reader = SessionReader(self.path)
+        try:
+            t0, t1 = self.records[40][0], self.records[200][0]
+            expected = [record for record in self.records if t0 <= record[0] < t1]
+            self.assertEqual(list(reader.iter_frames(t0, t1)), expected)
+        finally:
+            reader.close()
+
+    def test_index_rebuilt_without_idx(self):
+        os.remove(self.path + '.idx')
+        reader = SessionReader(self.path)
+        try:
+            self.assertEqual(list(reader.iter_frames()), self.records)
+        finally:
+            reader.close()
+
+    def test_truncated_chunk_ignored(self):
+        size = os.path.getsize(self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(size - 10)
+        reader = SessionReader(self.path)
+        try:
+            frames = list(reader.iter_frames())
+            self.assertLess(len(frames), len(self.records))
+            self.assertEqual(frames, self.records[:len(frames)])
+        finally:
+            reader.close()
+
+    def test_records_by_index_with_equal_timestamps(self):
+        reader = SessionReader(self.path)
+        try:
+            self.assertEqual(reader.index_at_time(self.records[41][0]), 40)
+            self.assertEqual(reader.index_at_time(self.records[-1][0] + 1), len(self.records))
+            self.assertEqual(list(reader.iter_records(41, 203)), self.records[41:203])
+        finally:
+            reader.close()
+
+    def test_replay_seek_does_not_repeat_frames(self):
+        full = DataManager(history_capacity=0)
+        full.process_lines([line for _, line in self.records])
+        data_manager = DataManager(history_capacity=0)
+        replay = ReplayEngine(self.path, data_manager, speed=None, batch_size=7)
+        try:
+            # Parada no meio de uma leitura, como play() faz ao receber um controle
+            replay.process([line for _, line in self.records[:6]], self.records[6][0])
+            replay.seek(1.0)
+            next_frame = replay.apply_seek(replay.seek_target_ns)
+            replay.seek(2.5)
+            next_frame = replay.apply_seek(replay.seek_target_ns)
+            self.assertIsNone(replay.play(next_frame))
+        finally:
+            replay.reader.close()
+        self.assertEqual(replay.frames_processed, len(self.records))
+        for key in ODOMETRY_KEYS:
+            self.assertAlmostEqual(data_manager.get_snapshot().get(key), full.get_snapshot().get(key), places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# tests/test_scheduler.py
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import NOTHING_DUE, CommandScheduler, ProfileStream, interpolate_command
+
+
+def profile_stream(profile, **options):
+    return ProfileStream('teste', 0.02, lambda command: None, profile, **options)
+
+
+class InterpolateCommandTest(unittest.TestCase):
+    def test_midpoint(self):
+        self.assertEqual(interpolate_command('speed:0:10@', 'speed:10:-10@', 0.5), 'speed:5:0@')
+
+    def test_endpoints(self):
+        self.assertEqual(interpolate_command('speed:0:0@', 'speed:10:20@', 0.0), 'speed:0:0@')
+        self.assertEqual(interpolate_command('speed:0:0@', 'speed:10:20@', 1.0), 'speed:10:20@')
+
+    def test_different_kinds_keep_first(self):
+        self.assertEqual(interpolate_command('speed:0:0@', 'twist:0.2:0.5@', 0.5), 'speed:0:0@')
+
+    def test_non_numeric_or_mismatched_keep_first(self):
+        self.assertEqual(interpolate_command('mode:auto@', 'mode:manual@', 0.5), 'mode:auto@')
+        self.assertEqual(interpolate_command('speed:0@', 'speed:1:1@', 0.5), 'speed:0@')
+        self.assertEqual(interpolate_command('stop@', 'stop@', 0.5), 'stop@')
+
+
+class ProfileStreamTest(unittest.TestCase):
+    def test_interpolates_between_points(self):
+        stream = profile_stream([(0.0, 'speed:0:0@'), (1.0, 'speed:10:10@')])
+        self.assertEqual(stream.command_at(0.25), 'speed:2.5:2.5@')
+
+    def test_without_interpolation_holds_point(self):
+        stream = profile_stream([(0.0, 'speed:0:0@'), (1.0, 'speed:10:10@')], interpolate=False)
+        self.assertEqual(stream.command_at(0.9), 'speed:0:0@')
+
+    def test_nothing_due_before_first_point(self):
+        stream = profile_stream([(0.5, 'speed:0:0@'), (1.0, 'speed:10:10@')])
+        self.assertIs(stream.command_at(0.0), NOTHING_DUE)
+        self.assertIs(stream.command_at(0.49), NOTHING_DUE)
+        self.assertEqual(stream.command_at(0.5), 'speed:0:0@')
+
+    def test_last_point_sent_once_then_ends(self):
+        stream = profile_stream([(0.0, 'speed:10:10@'), (1.0, 'speed:0:0@')])
+        self.assertEqual(stream.command_at(1.0), 'speed:0:0@')
+        self.assertIsNone(stream.command_at(1.02))
+
+    def test_loop_wraps_and_skips_gap_before_first_point(self):
+        stream = profile_stream([(0.5, 'speed:0:0@'), (1.0, 'speed:10:10@')], loop=True)
+        self.assertEqual(stream.command_at(1.75), 'speed:5:5@')
+        self.assertIs(stream.command_at(2.25), NOTHING_DUE)
+
+    def test_empty_profile_rejected(self):
+        with self.assertRaises(ValueError):
+            profile_stream([])
+
+
+class CommandSchedulerTest(unittest.TestCase):
+    def test_profile_starting_after_zero_is_sent(self):
+        sent = []
+        scheduler = CommandScheduler()
+        scheduler.start()
+        try:
+            scheduler.add_stream(ProfileStream('perfil', 0.02, sent.append,
+                                               [(0.1, 'speed:0:0@'), (0.2, 'speed:10:10@')]))
+            deadline = time.monotonic() + 2.0
+            while scheduler.active('perfil') and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+        self.assertFalse(scheduler.active('perfil'))
+        # O primeiro prazo em 0.1 s pode cair um pouco antes ou depois do ponto
+        self.assertGreater(len(sent), 1)
+        self.assertEqual(sent[-1], 'speed:10:10@')
+
+    def test_switch_interval_only_while_active_and_restored(self):
+        original = sys.getswitchinterval()
+        scheduler = CommandScheduler(switch_interval=0.0005)
+        scheduler.start()
+        try:
+            time.sleep(0.05)
+            self.assertEqual(sys.getswitchinterval(), original)
+            scheduler.add_stream(ProfileStream('perfil', 0.01, lambda command: None,
+                                               [(0.0, 'speed:0:0@'), (0.1, 'speed:0:0@')]))
+            time.sleep(0.05)
+            self.assertAlmostEqual(sys.getswitchinterval(), 0.0005)
+        finally:
+            scheduler.stop()
+        self.assertEqual(sys.getswitchinterval(), original)
+
+    def test_default_leaves_switch_interval_alone(self):
+        original = sys.getswitchinterval()
+        scheduler = CommandScheduler()
+        scheduler.start()
+        try:
+            scheduler.add_stream(ProfileStream('perfil', 0.01, lambda command: None, [(0.0, 'speed:0:0@')]))
+            time.sleep(0.05)
+            self.assertEqual(sys.getswitchinterval(), original)
+        finally:
+            scheduler.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# tests/test_serial_reader.py
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_reader import FrameExtractor
+
+FRAME = 'BEGIN;3;1.5;10;END'
+
+
+class FrameExtractorTest(unittest.TestCase):
+    def setUp(self):
+        self.extractor = FrameExtractor(max_frame_size=64)
+
+    def test_frames_in_one_chunk(self):
+        frames = self.extractor.feed(f'{FRAME}\r\n{FRAME}\r\n'.encode())
+        self.assertEqual(frames, [FRAME, FRAME])
+        self.assertEqual(self.extractor.discarded_bytes, 0)
+        self.assertEqual(len(self.extractor.buffer), 2)  # Só o '\r\n' final
+
+    def test_frame_split_across_reads(self):
+        data = f'{FRAME}\r\n'.encode()
+        frames = []
+        for i in range(len(data)):
+            frames += self.extractor.feed(data[i:i + 1])
+        self.assertEqual(frames, [FRAME])
+        self.assertEqual(self.extractor.invalid_frames, 0)
+
+    def test_start_marker_split_across_reads(self):
+        self.assertEqual(self.extractor.feed(b'lixoBEG'), [])
+        self.assertEqual(self.extractor.feed(b'IN;3;1.5;10;END'), [FRAME])
+        self.assertEqual(self.extractor.discarded_bytes, len('lixo'))
+
+    def test_resync_after_garbage(self):
+        frames = self.extractor.feed(f'@#!{FRAME}xyz{FRAME}'.encode())
+        self.assertEqual(frames, [FRAME, FRAME])
+        self.assertEqual(self.extractor.discarded_bytes, 6)
+        self.assertEqual(self.extractor.invalid_frames, 0)
+
+    def test_truncated_frame_counted_and_skipped(self):
+        frames = self.extractor.feed(f'BEGIN;3;1.{FRAME}'.encode())
+        self.assertEqual(frames, [FRAME])
+        self.assertEqual(self.extractor.invalid_frames, 1)
+
+    def test_frame_without_end_resyncs(self):
+        self.assertEqual(self.extractor.feed(b'BEGIN;' + b'9' * 100), [])
+        self.assertEqual(self.extractor.invalid_frames, 1)
+        self.assertEqual(self.extractor.feed(FRAME.encode()), [FRAME])
+        self.assertLessEqual(len(self.extractor.buffer), 64)
+
+    def test_reset_drops_partial_frame(self):
+        self.extractor.feed(b'BEGIN;3;1.5')
+        self.extractor.reset()
+        self.assertEqual(self.extractor.feed(b';10;END'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# tests/test_telemetry_store.py
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry_store import TelemetryStore
+
+FIELDS = [('a', 'int'), ('b', 'float'), ('s', 'str')]
+
+
+def filled_store(count, capacity=4):
+    store = TelemetryStore(FIELDS, capacity)
+    for n in range(count):
+        store.append({'a': n, 'b': n / 2, 's': str(n)}, float(n))
+    return store
+
+
+class RingTest(unittest.TestCase):
+    def test_before_wrap(self):
+        store = filled_store(3)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.values('a'), [0, 1, 2])
+        self.assertEqual(store.segments(), [(0, 3)])
+
+    def test_wraparound_keeps_newest_in_order(self):
+        store = filled_store(10)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.first_index(), 6)
+        self.assertEqual(store.segments(), [(2, 4), (0, 2)])
+        self.assertEqual(store.values('a'), [6, 7, 8, 9])
+        self.assertEqual(store.values('s'), ['6', '7', '8', '9'])
+        self.assertEqual(store.values('timestamp'), [6.0, 7.0, 8.0, 9.0])
+
+    def test_valid_from_after_overwrite(self):
+        store = filled_store(10)
+        self.assertFalse(store.valid_from(5))
+        self.assertTrue(store.valid_from(6))
+        # Intervalo pedido antes do mais antigo é cortado no primeiro disponível
+        self.assertEqual(store.values('a', 0, 8), [6, 7])
+
+    def test_index_at_time_across_wrap(self):
+        store = filled_store(10)
+        self.assertEqual(store.index_at_time(0.0), 6)
+        self.assertEqual(store.index_at_time(7.5), 8)
+        self.assertEqual(store.index_at_time(100.0), 10)
+        self.assertEqual(store.time_range(7.0, 9.0), (7, 9))
+
+    def test_clear(self):
+        store = filled_store(10)
+        store.clear()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.values('a'), [])
+
+
+class AppendTest(unittest.TestCase):
+    def test_missing_fields_default(self):
+        store = TelemetryStore(FIELDS, 4)
+        store.append({'b': 1.5}, 0.0)
+        self.assertEqual(store.values('a'), [0])
+        self.assertEqual(store.values('b'), [1.5])
+        self.assertEqual(store.values('s'), [None])
+
+    def test_value_of_other_type_is_coerced(self):
+        # Outro PROTOCOL_VERSION declarando o campo com outro tipo
+        store = TelemetryStore(FIELDS, 4)
+        store.append({'a': -1500.7, 'b': 2, 's': 'x'}, 0.0)
+        store.append({'a': 'texto', 'b': None, 's': 'y'}, 1.0)
+        self.assertEqual(store.values('a'), [-1500, 0])
+        self.assertEqual(store.values('b'), [2.0, 0.0])
+        self.assertEqual(store.count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()